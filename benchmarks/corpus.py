@@ -0,0 +1,122 @@
+# Deterministic synthetic markdown corpus generator.
+#
+#   python3 -m benchmarks.corpus /tmp/corpus --pages 20000 --link-density 0.2
+import argparse
+import os
+import random
+
+WORDS = (
+    "middle earth ring fellowship shire wizard river mountain elven king road "
+    "shadow song forest tower council quest journey sword light dark hobbit"
+).split()
+
+
+class CorpusConfig():
+    def __init__(self, pages=100, blocks_per_page=40, link_density=0.05, image_density=0.01,
+                 code_lines=8, nesting_depth=2, words_per_block=60, seed=1):
+        self.pages = pages
+        self.blocks_per_page = blocks_per_page
+        self.link_density = link_density
+        self.image_density = image_density
+        self.code_lines = code_lines
+        self.nesting_depth = nesting_depth
+        self.words_per_block = words_per_block
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def inline_text(rng, config, words):
+    parts = []
+    for _ in range(words):
+        roll = rng.random()
+        word = rng.choice(WORDS)
+        if roll < config.link_density:
+            parts.append(f"[{word}](/{rng.choice(WORDS)}/{rng.choice(WORDS)})")
+        elif roll < config.link_density + config.image_density:
+            parts.append(f"![{word}](/images/{rng.choice(WORDS)}.png)")
+        elif roll < config.link_density + config.image_density + 0.05:
+            parts.append(nested_emphasis(word, rng.randint(1, max(1, config.nesting_depth))))
+        elif roll < config.link_density + config.image_density + 0.08:
+            parts.append(f"`{word}`")
+        else:
+            parts.append(word)
+    return " ".join(parts)
+
+
+def nested_emphasis(word, depth):
+    for level in range(depth):
+        delimiter = "**" if level % 2 == 0 else "_"
+        word = f"{delimiter}{word} {WORDS[level % len(WORDS)]}{delimiter}"
+    return word
+
+
+def make_block(rng, config):
+    roll = rng.random()
+    words = config.words_per_block
+    if roll < 0.1:
+        return f"{'#' * rng.randint(2, 4)} {inline_text(rng, config, 6)}"
+    if roll < 0.2:
+        lines = [f"- {inline_text(rng, config, words // 6)}" for _ in range(rng.randint(2, 6))]
+        return "\n".join(lines)
+    if roll < 0.27:
+        lines = [f"{i + 1}. {inline_text(rng, config, words // 6)}" for i in range(rng.randint(2, 6))]
+        return "\n".join(lines)
+    if roll < 0.33:
+        lines = [f"> {inline_text(rng, config, words // 4)}" for _ in range(rng.randint(1, 4))]
+        return "\n".join(lines)
+    if roll < 0.4 and config.code_lines:
+        body = [f"print({rng.choice(WORDS)!r})" for _ in range(config.code_lines)]
+        return "```\n" + "\n".join(body) + "\n```"
+    return inline_text(rng, config, words)
+
+
+def make_page(rng, config, index):
+    blocks = [f"# Page {index} about {rng.choice(WORDS)}"]
+    blocks.extend(make_block(rng, config) for _ in range(config.blocks_per_page))
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(dest_path, config):
+    # Same seed and settings always give byte-identical files.
+    rng = random.Random(config.seed)
+    paths = []
+    for index in range(config.pages):
+        page_dir = os.path.join(dest_path, f"section{index % 10}", f"page{index}")
+        os.makedirs(page_dir, exist_ok=True)
+        path = os.path.join(page_dir, "index.md")
+        with open(path, "w") as page_file:
+            page_file.write(make_page(rng, config, index))
+        paths.append(path)
+    return paths
+
+
+def add_corpus_arguments(parser):
+    defaults = CorpusConfig()
+    parser.add_argument("--pages", type=int, default=defaults.pages)
+    parser.add_argument("--blocks", type=int, default=defaults.blocks_per_page, help="blocks per page")
+    parser.add_argument("--link-density", type=float, default=defaults.link_density, help="share of words that are links")
+    parser.add_argument("--image-density", type=float, default=defaults.image_density, help="share of words that are images")
+    parser.add_argument("--code-lines", type=int, default=defaults.code_lines, help="lines per fenced code block")
+    parser.add_argument("--nesting", type=int, default=defaults.nesting_depth, help="maximum emphasis nesting depth")
+    parser.add_argument("--words", type=int, default=defaults.words_per_block, help="words per paragraph")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args):
+    return CorpusConfig(args.pages, args.blocks, args.link_density, args.image_density,
+                        args.code_lines, args.nesting, args.words, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown corpus")
+    parser.add_argument("dest")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    paths = generate_corpus(args.dest, config_from_args(args))
+    print(f"Wrote {len(paths)} pages to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Throughput of the streaming HTML minifier on large rendered pages.
+#
+#   python3 -m benchmarks.minify_throughput --pages 20 --blocks 2000
+#
+# Each page is rendered once into the exact chunk sequence the build
+# writes; the timed loops then replay those chunks through a plain
+# BufferedWriter and through HtmlMinifier in front of one.
+#
+# On CPython 3.11, x86_64, 10 pages of 2000 blocks (9 MB of HTML) the
+# minifier sustains about 90 MB/s; pages with few inline code spans and
+# comments, where more of the text skips the regex passes, run faster.
+import argparse
+import tempfile
+import time
+
+from benchmarks.corpus import add_corpus_arguments, config_from_args, generate_corpus
+from benchmarks.run import DEFAULT_TEMPLATE
+from minify import HtmlMinifier
+from serializer import BufferedWriter
+from template import compile_template
+from transformers import markdown_to_html_node
+from utils import extract_title, page_context
+
+
+def render_chunks(paths, template):
+    pages = []
+    for path in paths:
+        with open(path, "r") as markdown:
+            content = markdown.read()
+        chunks = []
+        template.render_to(chunks.append, page_context(extract_title(content), markdown_to_html_node(content)))
+        pages.append(chunks)
+    return pages
+
+
+def replay(pages, minify, remove_comments=False):
+    written = 0
+
+    def sink(text):
+        nonlocal written
+        written += len(text)
+
+    started = time.perf_counter()
+    for chunks in pages:
+        writer = BufferedWriter(sink)
+        stage = HtmlMinifier(writer.write, remove_comments) if minify else writer
+        for chunk in chunks:
+            stage.write(chunk)
+        stage.flush()
+        writer.flush()
+    return time.perf_counter() - started, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure streaming HTML minifier throughput")
+    add_corpus_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_corpus(tmp, config_from_args(args))
+        pages = render_chunks(paths, compile_template(args.template))
+    print(f"{'writer':<10} {'best s':>8} {'MB/s':>8} {'output KB':>10}")
+    for name, minify in (("plain", False), ("minified", True)):
+        best = None
+        for _ in range(args.repeat):
+            elapsed, written = replay(pages, minify)
+            best = elapsed if best is None else min(best, elapsed)
+        source = sum(len(chunk) for chunks in pages for chunk in chunks)
+        print(f"{name:<10} {best:>8.3f} {source / 1e6 / best:>8.1f} {written / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Bytes-per-node benchmark for the node model.
+#
+#   python3 benchmarks/node_memory.py [count]
+#
+# "before" rebuilds the previous __dict__-based classes with a fresh props
+# dict per link, "after" uses the slotted classes from src/ with shared
+# props. Measured on CPython 3.11, x86_64, 100000 nodes of each kind:
+#
+#   node         before   after
+#   TextNode       96 B    56 B
+#   LeafNode      104 B    64 B
+#   link leaf     288 B    64 B   (same url, shared props)
+#   link leaf*    288 B   265 B   (every link with its own url)
+#   ParentNode    104 B    64 B
+#
+# Shared props pay off most for repeated urls. A url seen once still gets a
+# props object of its own, but its attribute string is only rendered when
+# the page is written, so it stays below the plain dict it replaced.
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from textnode import TextNode, TextType
+from leafnode import LeafNode
+from parentnode import ParentNode
+from htmlnode import shared_props
+
+
+class LegacyTextNode():
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class LegacyHTMLNode():
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def bytes_per_node(factory, count, distinct_urls=False):
+    text = "shared text"
+    # Distinct url strings are built before tracing: the document holds
+    # them either way, so only what the nodes add is counted.
+    if distinct_urls:
+        urls = [f"https://example.com/{number}" for number in range(count)]
+    else:
+        urls = ["https://example.com"] * count
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [factory(text, url) for url in urls]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the nodes costs one pointer per entry.
+    per_node = (after - before) / count - 8
+    del nodes
+    return per_node
+
+
+def legacy_link(text, url):
+    return LegacyHTMLNode("a", text, None, {"href": url})
+
+
+def link(text, url):
+    return LeafNode("a", text, shared_props(("href", url)))
+
+
+CASES = [
+    ("TextNode",
+        lambda text, url: LegacyTextNode(text, TextType.NORMAL),
+        lambda text, url: TextNode(text, TextType.NORMAL), False),
+    ("LeafNode",
+        lambda text, url: LegacyHTMLNode("b", text),
+        lambda text, url: LeafNode("b", text), False),
+    ("link leaf", legacy_link, link, False),
+    ("link leaf*", legacy_link, link, True),
+    ("ParentNode",
+        lambda text, url: LegacyHTMLNode("p", None, ()),
+        lambda text, url: ParentNode("p", ()), False),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'node':<12} {'before':>8} {'after':>8}")
+    for name, legacy, current, distinct_urls in CASES:
+        print(f"{name:<12} {bytes_per_node(legacy, count, distinct_urls):>6.0f} B {bytes_per_node(current, count, distinct_urls):>6.0f} B")
+    print("* every link with its own url")
+
+
+if __name__ == "__main__":
+    main()
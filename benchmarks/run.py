@@ -0,0 +1,203 @@
+# Per-stage build benchmark over a synthetic (or existing) markdown corpus.
+#
+#   python3 -m benchmarks.run --pages 500 --output before.json
+#   python3 -m benchmarks.run --pages 500 --compare before.json
+#
+# Every stage is timed separately for each page; the report holds total
+# time, p50/p99 per page, throughput and the peak traced memory of one page.
+#
+# The block cache is off unless --block-cache is given: cached blocks are
+# serialized inside markdown_to_html_node, and a cache kept across --repeat
+# passes would turn every pass after the first into lookups. With it on, each
+# pass starts from an empty cache and its hits are reported.
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import SRC_PATH
+from benchmarks.corpus import add_corpus_arguments, config_from_args, generate_corpus
+import transformers
+from transformers import markdown_to_blocks, block_to_block_type, text_to_textnodes, markdown_to_html_node, BlockType
+from template import compile_template
+from utils import extract_title, page_context
+
+STAGES = ["read", "markdown_to_blocks", "block_to_block_type", "text_to_textnodes", "markdown_to_html_node", "to_html", "template", "write"]
+INLINE_BLOCKS = (BlockType.PARAGRAPH, BlockType.HEADING, BlockType.QUOTE)
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(SRC_PATH), "template.html")
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_page(path, template, dest_path, timings):
+    clock = time.perf_counter_ns
+    start = clock()
+    with open(path, "r") as markdown:
+        content = markdown.read()
+    timings["read"].append(clock() - start)
+
+    start = clock()
+    blocks = markdown_to_blocks(content)
+    timings["markdown_to_blocks"].append(clock() - start)
+
+    start = clock()
+    block_types = [block_to_block_type(block) for block in blocks]
+    timings["block_to_block_type"].append(clock() - start)
+
+    start = clock()
+    for block, block_type in zip(blocks, block_types):
+        if block_type in INLINE_BLOCKS:
+            text_to_textnodes(block)
+    timings["text_to_textnodes"].append(clock() - start)
+
+    start = clock()
+    html_node = markdown_to_html_node(content)
+    timings["markdown_to_html_node"].append(clock() - start)
+
+    start = clock()
+    html_node.to_html()
+    timings["to_html"].append(clock() - start)
+
+    start = clock()
+    html_page = template.render(page_context(extract_title(content), html_node))
+    timings["template"].append(clock() - start)
+
+    start = clock()
+    with open(dest_path, "w") as dest_file:
+        dest_file.write(html_page)
+    timings["write"].append(clock() - start)
+    return len(content), len(html_page)
+
+
+def peak_memory(paths, template, dest_path, block_cache=0):
+    # Separate pass: tracemalloc slows everything down, so it never runs
+    # while timings are being taken.
+    transformers.configure_block_cache(block_cache)
+    tracemalloc.start()
+    peak = 0
+    for path in paths:
+        tracemalloc.reset_peak()
+        time_page(path, template, dest_path, {stage: [] for stage in STAGES})
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return peak
+
+
+def summarize(samples, pages, source_bytes):
+    total = sum(samples)
+    seconds = total / 1e9
+    return {
+        "total_ms": total / 1e6,
+        "p50_us": percentile(samples, 0.5) / 1e3,
+        "p99_us": percentile(samples, 0.99) / 1e3,
+        "pages_per_second": pages / seconds if seconds else None,
+        "mb_per_second": source_bytes / 1e6 / seconds if seconds else None,
+    }
+
+
+def run_benchmark(paths, template_path, repeat=3, block_cache=0):
+    template = compile_template(template_path, "/base/")
+    timings = {stage: [] for stage in STAGES}
+    source_bytes = 0
+    output_bytes = 0
+    cache_hits = 0
+    cache_misses = 0
+    previous_cache = transformers.block_cache
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dest_path = os.path.join(tmp, "page.html")
+            started = time.perf_counter()
+            for _ in range(repeat):
+                cache = transformers.configure_block_cache(block_cache)
+                for path in paths:
+                    size_in, size_out = time_page(path, template, dest_path, timings)
+                    source_bytes += size_in
+                    output_bytes += size_out
+                cache_hits += cache.hits
+                cache_misses += cache.misses
+            elapsed = time.perf_counter() - started
+            peak = peak_memory(paths, template, dest_path, block_cache)
+    finally:
+        transformers.block_cache = previous_cache
+    pages = len(paths) * repeat
+    return {
+        "block_cache": {"size": block_cache, "hits": cache_hits, "misses": cache_misses},
+        "pages": pages,
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "wall_seconds": elapsed,
+        "pages_per_second": pages / elapsed,
+        "peak_page_memory_bytes": peak,
+        "stages": {stage: summarize(timings[stage], pages, source_bytes) for stage in STAGES},
+    }
+
+
+def compare(previous, current):
+    print(f"{'stage':<24} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for stage in STAGES:
+        before = previous["results"]["stages"].get(stage, {}).get("total_ms")
+        after = current["results"]["stages"][stage]["total_ms"]
+        if not before:
+            print(f"{stage:<24} {'-':>10} {after:>10.1f}")
+            continue
+        print(f"{stage:<24} {before:>10.1f} {after:>10.1f} {(after - before) / before * 100:>+7.1f}%")
+
+
+def print_report(report):
+    results = report["results"]
+    print(f"{results['pages']} pages in {results['wall_seconds']:.2f}s ({results['pages_per_second']:.0f} pages/s), "
+          f"peak {results['peak_page_memory_bytes'] / 1e6:.1f} MB per page")
+    block_cache = results.get("block_cache")
+    if block_cache and block_cache["size"]:
+        print(f"Block cache of {block_cache['size']}: {block_cache['hits']} hits, {block_cache['misses']} misses")
+    print(f"{'stage':<24} {'total ms':>10} {'p50 us':>10} {'p99 us':>10} {'MB/s':>8}")
+    for stage in STAGES:
+        summary = results["stages"][stage]
+        print(f"{stage:<24} {summary['total_ms']:>10.1f} {summary['p50_us']:>10.1f} {summary['p99_us']:>10.1f} {summary['mb_per_second'] or 0:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each build stage over a synthetic corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE)
+    parser.add_argument("--corpus", help="reuse markdown files from this directory instead of generating one")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report from an earlier run to compare against")
+    parser.add_argument("--block-cache", type=int, default=0, metavar="N", help="time with a block cache of N entries, emptied before each pass (default off)")
+    args = parser.parse_args()
+    config = config_from_args(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(os.path.join(root, name) for root, _, names in os.walk(args.corpus) for name in names if name.endswith(".md"))
+        else:
+            paths = generate_corpus(tmp, config)
+        results = run_benchmark(paths, args.template, args.repeat, args.block_cache)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "corpus": config.to_dict() if not args.corpus else {"path": args.corpus},
+        "repeat": args.repeat,
+        "results": results,
+    }
+    print_report(report)
+    if args.compare:
+        with open(args.compare, "r") as previous_file:
+            compare(json.load(previous_file), report)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+from manifest import file_fingerprint, remove_output, load_json_manifest, save_json_manifest
+from sync import copy_file, list_files
+
+# Kept outside docs/, which a full build wipes along with the manifest.
+ASSET_MANIFEST_DIR = ".cache"
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+HASH_LENGTH = 10
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def hashed_name(relative_path, file_hash):
+    root, extension = os.path.splitext(relative_path)
+    return f"{root}.{file_hash[:HASH_LENGTH]}{extension}"
+
+
+def url_path(relative_path):
+    return "/" + relative_path.replace(os.sep, "/")
+
+
+def publish_asset(src_file_path, stable_path, hashed_path):
+    # The stable copy synced from static/ has the same bytes, so a hardlink
+    # to it is enough; fall back to a copy across filesystems.
+    if os.path.exists(hashed_path):
+        return
+    try:
+        os.link(stable_path, hashed_path)
+    except OSError:
+        copy_file(src_file_path, hashed_path)
+
+
+def fingerprint_assets(src_path, dst_path, manifest_dir=ASSET_MANIFEST_DIR):
+    # Publishes a content-hashed copy of every static file next to its
+    # stable name and returns {"/stable/url": "/hashed/url"} for the URL
+    # rewriter. Hashes are reused while a file's size and mtime match the
+    # previous manifest.
+    if not os.path.isdir(src_path):
+        raise ValueError("Source path doesn't exists or isn't a directory")
+    previous_files = load_json_manifest(manifest_dir, ASSET_MANIFEST_NAME)
+    files = {}
+    assets = {}
+    stats = {"hashed": 0, "reused": 0, "removed": 0}
+    for relative_path in list_files(src_path):
+        src_file_path = os.path.join(src_path, relative_path)
+        previous = previous_files.get(relative_path)
+        fingerprint = file_fingerprint(src_file_path, previous)
+        if previous is not None and previous["signature"] == fingerprint["signature"]:
+            stats["reused"] += 1
+        else:
+            stats["hashed"] += 1
+        output = hashed_name(relative_path, fingerprint["hash"])
+        publish_asset(src_file_path, os.path.join(dst_path, relative_path), os.path.join(dst_path, output))
+        files[relative_path] = {"signature": fingerprint["signature"], "hash": fingerprint["hash"], "output": output}
+        assets[url_path(relative_path)] = url_path(output)
+    live_outputs = set(entry["output"] for entry in files.values())
+    for relative_path, entry in previous_files.items():
+        if entry["output"] in live_outputs:
+            continue
+        remove_output(os.path.join(dst_path, entry["output"]), dst_path)
+        stats["removed"] += 1
+    save_json_manifest(manifest_dir, ASSET_MANIFEST_NAME, files)
+    return assets, stats
+
+
+def immutable_headers(assets, basepath='/'):
+    # _headers rules (Netlify / Cloudflare Pages syntax) marking every
+    # fingerprinted URL as cacheable forever.
+    lines = []
+    for published in sorted(assets.values()):
+        lines.append(basepath + published[1:])
+        lines.append(f"  Cache-Control: {IMMUTABLE_CACHE_CONTROL}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,291 @@
+import json
+import os
+import profiling
+import parse_cache
+import transformers
+import minify
+import css
+import search
+import linkcheck
+import pipeline
+from concurrent.futures import ProcessPoolExecutor
+from utils import discover_pages, generate_page
+from template import load_template, clear_template_cache
+from urls import url_rewriter
+from layouts import LayoutResolver, page_templates, read_page_layout
+from site_index import SiteIndex
+from page_index import page_context
+from manifest import combine_hashes, load_manifest, save_manifest, file_fingerprint, page_is_fresh, page_entry, remove_output
+
+BATCHES_PER_WORKER = 4
+
+
+class BuildError(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        lines = [f"{from_path}: {message}" for from_path, message in failures]
+        super().__init__(f"{len(failures)} page(s) failed to render:\n" + "\n".join(lines))
+
+
+def resolve_jobs(jobs):
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def batch_pages(pages, jobs):
+    # A few batches per worker keeps the pool balanced while paying the
+    # pickling and scheduling overhead once per batch instead of per page.
+    batch_size = max(1, -(-len(pages) // (jobs * BATCHES_PER_WORKER)))
+    return [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+
+
+def render_batch(batch, basepath, urls=None):
+    # Returns the rendered pages' metadata and the failures.
+    if pipeline.engine is not None:
+        return pipeline.engine.run(batch, basepath, urls)
+    rendered = []
+    failures = []
+    for from_path, dest_path, template_path, context in batch:
+        try:
+            rendered.append(generate_page(from_path, template_path, dest_path, basepath, urls, context))
+        except Exception as error:
+            failures.append((from_path, f"{type(error).__name__}: {error}"))
+    return rendered, failures
+
+
+def cache_counters():
+    counters = {"block_hits": transformers.block_cache.hits, "block_misses": transformers.block_cache.misses}
+    if parse_cache.cache is not None:
+        counters["parse_hits"] = parse_cache.cache.hits
+        counters["parse_misses"] = parse_cache.cache.misses
+    return counters
+
+
+def add_cache_counters(counters):
+    transformers.block_cache.hits += counters["block_hits"]
+    transformers.block_cache.misses += counters["block_misses"]
+    if parse_cache.cache is not None and "parse_hits" in counters:
+        parse_cache.cache.hits += counters["parse_hits"]
+        parse_cache.cache.misses += counters["parse_misses"]
+
+
+def worker_settings():
+    # Module-level build settings a worker must mirror; forked workers
+    # inherit them but spawned ones start from the defaults.
+    return {
+        "profile": profiling.profiler is not None,
+        "parse_cache": parse_cache.current_config(),
+        "block_cache": transformers.block_cache.maxsize,
+        "minify": minify.current_config(),
+        "css": css.current_config(),
+        "search": search.current_config(),
+        "linkcheck": linkcheck.current_config(),
+        "pipeline": pipeline.current_config(),
+    }
+
+
+def apply_worker_settings(settings):
+    cache_config = settings["parse_cache"]
+    if cache_config is None:
+        parse_cache.disable()
+    elif parse_cache.current_config() != tuple(cache_config):
+        parse_cache.configure(*cache_config)
+    if transformers.block_cache.maxsize != settings["block_cache"]:
+        transformers.configure_block_cache(settings["block_cache"])
+    if settings["minify"] is None:
+        minify.disable()
+    else:
+        minify.configure(**settings["minify"])
+    if settings["css"] is None:
+        css.disable()
+    elif css.current_config() != settings["css"]:
+        css.configure(*settings["css"])
+    if settings["search"]:
+        search.configure()
+    else:
+        search.disable()
+    if settings["linkcheck"]:
+        linkcheck.configure()
+    else:
+        linkcheck.disable()
+    if settings["pipeline"] is None:
+        pipeline.disable()
+    elif pipeline.current_config() != tuple(settings["pipeline"]):
+        pipeline.configure(*settings["pipeline"])
+
+
+def render_batch_in_worker(batch, basepath, urls, settings):
+    # Workers profile into a fresh Profiler (a forked one would inherit the
+    # parent's) and ship the page records, cache counter deltas and pipeline
+    # stage times back with the results.
+    apply_worker_settings(settings)
+    if pipeline.engine is not None:
+        pipeline.engine.reset_stats()
+    profile = settings["profile"]
+    before = cache_counters()
+    if profile:
+        profiling.enable_profiling()
+    try:
+        rendered, failures = render_batch(batch, basepath, urls)
+        profiled_pages = profiling.profiler.pages if profile else []
+    finally:
+        if profile:
+            profiling.disable_profiling()
+    counters = {name: value - before[name] for name, value in cache_counters().items()}
+    stage_stats = pipeline.engine.stats if pipeline.engine is not None else None
+    return rendered, failures, profiled_pages, counters, stage_stats
+
+
+def render_pages(pages, basepath, jobs=1, urls=None, index=None):
+    # pages are (from_path, dest_path, template_path, context) tuples, context
+    # being the page's header variables. Each rendered page's metadata is
+    # added to index when one is given.
+    settings = worker_settings()
+    if jobs == 1 or len(pages) < 2:
+        rendered, failures = render_batch(pages, basepath, urls)
+    else:
+        rendered = []
+        failures = []
+        batches = batch_pages(pages, jobs)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(batches))) as pool:
+            futures = [pool.submit(render_batch_in_worker, batch, basepath, urls, settings) for batch in batches]
+            for future in futures:
+                batch_rendered, batch_failures, profiled_pages, counters, stage_stats = future.result()
+                rendered.extend(batch_rendered)
+                failures.extend(batch_failures)
+                add_cache_counters(counters)
+                if stage_stats is not None:
+                    pipeline.engine.add_stats(stage_stats)
+                if settings["profile"]:
+                    profiling.profiler.add_pages(profiled_pages)
+    if index is not None:
+        for metadata in rendered:
+            index.add(metadata)
+    if failures:
+        raise BuildError(failures)
+    return len(rendered)
+
+
+def generate_pages_parallel(dir_path_content, template_path, dest_dir_path, basepath, jobs=None, urls=None, index=None):
+    if urls is None:
+        urls = url_rewriter(basepath)
+    pages = [
+        (from_path, dest_path, page_template, page_context(from_path, dir_path_content, dest_dir_path, urls))
+        for from_path, dest_path, page_template in page_templates(discover_pages(dir_path_content, dest_dir_path), LayoutResolver(dir_path_content, template_path))
+    ]
+    return render_pages(pages, basepath, resolve_jobs(jobs), urls, index)
+
+
+def layout_state(template_path, basepath, urls, previous_templates, template_fingerprints, output_options):
+    # The hash a page's output depends on through its layout: every
+    # template and partial the layout compiles from, the published form of
+    # their static URLs, plus the output options. A layout that fails to load gets no hash, so its pages are
+    # rendered and report the error.
+    try:
+        template = load_template(template_path, basepath, urls)
+    except (OSError, ValueError):
+        return None, [template_path]
+    hashes = []
+    for path in template.dependencies:
+        if path not in template_fingerprints:
+            template_fingerprints[path] = file_fingerprint(path, previous_templates.get(path))
+        hashes.append(f"{path}\0{template_fingerprints[path]['hash']}")
+    hashes.append(urls.references_key(template.references))
+    return combine_hashes(hashes + [output_options]), list(template.dependencies)
+
+
+def page_url_key(metadata, urls):
+    # Pages depend only on the URLs and images they reference, so the
+    # manifest keys them on those rather than on the whole rewriter.
+    if not metadata or metadata.get("references") is None:
+        return None
+    return urls.references_key(metadata["references"])
+
+
+def metadata_complete(metadata):
+    # Pages rendered before search or link checking was turned on have no
+    # terms or links to reuse.
+    if not metadata:
+        return False
+    if search.recording and not search.has_terms(metadata):
+        return False
+    return not linkcheck.recording or linkcheck.has_links(metadata)
+
+
+def generate_pages_incremental(dir_path_content, template_path, dest_dir_path, basepath, jobs=1, urls=None, index=None):
+    # Skipped pages contribute the metadata stored with their manifest
+    # entries, so index covers the whole site.
+    if urls is None:
+        urls = url_rewriter(basepath)
+    if index is None:
+        index = SiteIndex(dest_dir_path)
+    manifest = load_manifest(dest_dir_path)
+    # Layouts are compiled afresh so their dependency lists match the files
+    # being fingerprinted.
+    clear_template_cache()
+    layouts = LayoutResolver(dir_path_content, template_path)
+    previous_templates = manifest["templates"]
+    template_fingerprints = {}
+    layout_states = {}
+    # Output options that change every page's bytes count as part of each
+    # layout.
+    output_options = repr((minify.current_config(), css.config_key()))
+    previous_pages = manifest["pages"]
+    pages = {}
+    dirty = []
+    stats = {"rendered": 0, "skipped": 0, "removed": 0}
+    for from_path, dest_path in discover_pages(dir_path_content, dest_dir_path):
+        entry = previous_pages.get(from_path)
+        fingerprint = file_fingerprint(from_path, entry)
+        if entry is not None and entry["hash"] == fingerprint["hash"]:
+            page_layout = entry["layout"]
+        else:
+            page_layout = read_page_layout(from_path)
+        page_template = layouts.template_for(from_path, page_layout)
+        if page_template not in layout_states:
+            layout_states[page_template] = layout_state(page_template, basepath, urls, previous_templates, template_fingerprints, output_options)
+        layout_hash, dependencies = layout_states[page_template]
+        # Header variables such as related pages change with other pages'
+        # front matter, so they are part of what a page was rendered from.
+        context = page_context(from_path, dir_path_content, dest_dir_path, urls)
+        template_hash = combine_hashes([layout_hash, json.dumps(context, sort_keys=True)]) if layout_hash is not None else None
+        url_key = page_url_key(entry["metadata"], urls) if entry is not None else None
+        fresh = template_hash is not None and url_key is not None and page_is_fresh(entry, fingerprint, template_hash, url_key, dest_path)
+        if fresh and metadata_complete(entry["metadata"]):
+            stats["skipped"] += 1
+            index.add(entry["metadata"])
+        else:
+            dirty.append((from_path, dest_path, page_template, context))
+        # The URL key is filled in with the metadata once rendered.
+        pages[from_path] = page_entry(fingerprint, template_hash, None, dest_path, page_layout, dependencies)
+    try:
+        stats["rendered"] = render_pages(dirty, basepath, resolve_jobs(jobs), urls, index)
+    except BuildError as error:
+        # Keep the rendered pages' entries but force the failed ones to be
+        # retried on the next build.
+        for from_path, _ in error.failures:
+            pages.pop(from_path, None)
+        add_page_metadata(pages, index, urls)
+        manifest["templates"] = template_fingerprints
+        manifest["pages"] = pages
+        save_manifest(dest_dir_path, manifest)
+        raise
+    live_outputs = set(page["output"] for page in pages.values())
+    for from_path, entry in previous_pages.items():
+        if from_path in pages or entry["output"] in live_outputs:
+            continue
+        print(f"Removing stale page {entry['output']}")
+        remove_output(entry["output"], dest_dir_path)
+        stats["removed"] += 1
+    add_page_metadata(pages, index, urls)
+    manifest["templates"] = template_fingerprints
+    manifest["pages"] = pages
+    save_manifest(dest_dir_path, manifest)
+    return stats
+
+
+def add_page_metadata(pages, index, urls):
+    for from_path, entry in pages.items():
+        entry["metadata"] = index.pages.get(from_path)
+        entry["urls"] = page_url_key(entry["metadata"], urls)
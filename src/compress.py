@@ -0,0 +1,117 @@
+import gzip
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from manifest import file_fingerprint, remove_output, load_json_manifest, save_json_manifest
+from sync import list_files
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Kept outside the output folder, which a full build wipes.
+COMPRESS_MANIFEST_DIR = ".cache"
+COMPRESS_MANIFEST_NAME = "compress-manifest.json"
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".mjs", ".svg", ".xml", ".json", ".txt", ".map")
+# Below this the compressed file plus its headers is rarely any smaller.
+MIN_SIZE = 256
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as output:
+        output.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_file(path, gzip_level, brotli_quality):
+    # zlib and brotli release the GIL while compressing, so a thread pool
+    # keeps every core busy without pickling file contents to processes.
+    with open(path, "rb") as source:
+        data = source.read()
+    sizes = {"original": len(data)}
+    # mtime=0 keeps the .gz bytes stable across builds.
+    write_atomic(f"{path}.gz", gzip.compress(data, gzip_level, mtime=0))
+    sizes["gzip"] = os.path.getsize(f"{path}.gz")
+    if brotli is not None and brotli_quality is not None:
+        write_atomic(f"{path}.br", brotli.compress(data, quality=brotli_quality))
+        sizes["brotli"] = os.path.getsize(f"{path}.br")
+    return sizes
+
+
+def compressed_outputs(dst_path, relative_path):
+    path = os.path.join(dst_path, relative_path)
+    return [f"{path}.gz", f"{path}.br"]
+
+
+def precompress_tree(dst_path, gzip_level=9, brotli_quality=11, workers=None, manifest_dir=COMPRESS_MANIFEST_DIR):
+    # Writes .gz (and .br when the brotli module is installed) next to every
+    # compressible file under dst_path. A file is skipped when its content
+    # hash and the levels match the previous run and its outputs still exist.
+    if brotli is None:
+        brotli_quality = None
+    previous_files = load_json_manifest(manifest_dir, COMPRESS_MANIFEST_NAME)
+    files = {}
+    pending = []
+    stats = {"compressed": 0, "skipped": 0, "removed": 0}
+    for relative_path in list_files(dst_path):
+        if not relative_path.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.basename(relative_path).startswith("."):
+            continue
+        path = os.path.join(dst_path, relative_path)
+        if os.path.getsize(path) < MIN_SIZE:
+            continue
+        previous = previous_files.get(relative_path)
+        fingerprint = file_fingerprint(path, previous)
+        entry = {
+            "signature": fingerprint["signature"],
+            "hash": fingerprint["hash"],
+            "gzip_level": gzip_level,
+            "brotli_quality": brotli_quality,
+        }
+        outputs = [f"{path}.gz"] + ([f"{path}.br"] if brotli_quality is not None else [])
+        if (
+            previous is not None
+            and all(previous.get(name) == entry[name] for name in ("hash", "gzip_level", "brotli_quality"))
+            and all(os.path.isfile(output) for output in outputs)
+        ):
+            entry["sizes"] = previous["sizes"]
+            stats["skipped"] += 1
+        else:
+            pending.append(relative_path)
+        files[relative_path] = entry
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda relative_path: compress_file(os.path.join(dst_path, relative_path), gzip_level, brotli_quality), pending)
+        for relative_path, sizes in zip(pending, results):
+            files[relative_path]["sizes"] = sizes
+    stats["compressed"] = len(pending)
+    for relative_path in previous_files:
+        if relative_path in files:
+            continue
+        for output in compressed_outputs(dst_path, relative_path):
+            remove_output(output, dst_path)
+        stats["removed"] += 1
+    save_json_manifest(manifest_dir, COMPRESS_MANIFEST_NAME, files)
+    return stats, savings_by_type(files)
+
+
+def savings_by_type(files):
+    report = {}
+    for relative_path, entry in files.items():
+        extension = os.path.splitext(relative_path)[1]
+        totals = report.setdefault(extension, {"files": 0, "original": 0, "gzip": 0, "brotli": 0})
+        totals["files"] += 1
+        for name, size in entry["sizes"].items():
+            totals[name] += size
+    return report
+
+
+def print_savings(report, file=sys.stdout):
+    print("Precompressed output:", file=file)
+    for extension, totals in sorted(report.items()):
+        line = f"  {extension:6} {totals['files']:>5} files {totals['original'] / 1024:9.1f} KiB"
+        for name in ("gzip", "brotli"):
+            if totals[name]:
+                saved = 100 - totals[name] / totals["original"] * 100
+                line += f"  {name} {totals[name] / 1024:9.1f} KiB (-{saved:.1f}%)"
+        print(line, file=file)
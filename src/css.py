@@ -0,0 +1,272 @@
+import hashlib
+import os
+import re
+from sync import list_files
+from assets import hashed_name
+from transformers import block_tree
+
+COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+STRING = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')")
+SPACE = re.compile(r"\s+")
+PUNCTUATION_SPACE = re.compile(r" ?([{};,>]) ?")
+DECLARATION_COLON = re.compile(r"([{;][-\w]+): ")
+PSEUDO = re.compile(r"::?[-\w]+(?:\([^)]*\))?")
+ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+COMBINATOR = re.compile(r"[\s>+~]+")
+SIMPLE_SELECTOR = re.compile(r"([.#]?)(-?[_a-zA-Z][\w-]*)")
+TAG = re.compile(r"<([a-zA-Z][\w-]*)([^>]*)>")
+ATTRIBUTE_VALUE = re.compile(r"\b(class|id)=\"([^\"]*)\"")
+# At-rules whose blocks hold ordinary rules; the critical subset filters
+# inside them. Every other at-rule (@font-face, @keyframes, ...) is kept.
+GROUPING_RULES = ("@media", "@supports", "@layer", "@container")
+BUNDLE_NAME = "bundle.css"
+
+
+def minify_css(text):
+    text = COMMENT.sub("", text)
+    parts = STRING.split(text)
+    for index in range(0, len(parts), 2):
+        part = SPACE.sub(" ", parts[index])
+        part = PUNCTUATION_SPACE.sub(r"\1", part)
+        part = DECLARATION_COLON.sub(r"\1:", part)
+        parts[index] = part.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def matching_brace(css, start):
+    depth = 0
+    quote = None
+    escaped = False
+    for index in range(start, len(css)):
+        char = css[index]
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError(f"Unbalanced braces in stylesheet at {start}")
+
+
+def parse_rules(css):
+    # [(prelude, body)] from minified CSS. body is None for statement
+    # at-rules such as @import, a nested list for grouping at-rules and the
+    # declaration string otherwise.
+    rules = []
+    position = 0
+    while position < len(css):
+        brace = css.find("{", position)
+        semicolon = css.find(";", position)
+        if semicolon != -1 and (brace == -1 or semicolon < brace):
+            rules.append((css[position:semicolon], None))
+            position = semicolon + 1
+            continue
+        if brace == -1:
+            break
+        end = matching_brace(css, brace)
+        prelude = css[position:brace]
+        body = css[brace + 1:end]
+        if prelude.startswith(GROUPING_RULES):
+            body = parse_rules(body)
+        rules.append((prelude, body))
+        position = end + 1
+    return rules
+
+
+def serialize_rules(rules):
+    parts = []
+    for prelude, body in rules:
+        if body is None:
+            parts.append(f"{prelude};")
+        elif isinstance(body, list):
+            parts.append(f"{prelude}{{{serialize_rules(body)}}}")
+        else:
+            parts.append(f"{prelude}{{{body}}}")
+    return "".join(parts)
+
+
+def selector_matches(selector, used):
+    # Conservative: pseudo-classes, pseudo-elements and attribute selectors
+    # are ignored, so a rule is only dropped when a tag, class or id it
+    # needs never appears on the page.
+    selector = ATTRIBUTE.sub("", PSEUDO.sub("", selector))
+    for compound in COMBINATOR.split(selector):
+        for prefix, name in SIMPLE_SELECTOR.findall(compound):
+            if prefix == ".":
+                if name not in used["classes"]:
+                    return False
+            elif prefix == "#":
+                if name not in used["ids"]:
+                    return False
+            elif name.lower() not in used["tags"]:
+                return False
+    return True
+
+
+def critical_rules(rules, used):
+    kept = []
+    for prelude, body in rules:
+        if body is None or (prelude.startswith("@") and not isinstance(body, list)):
+            kept.append((prelude, body))
+        elif isinstance(body, list):
+            inner = critical_rules(body, used)
+            if inner:
+                kept.append((prelude, inner))
+        else:
+            selectors = [selector for selector in prelude.split(",") if selector_matches(selector, used)]
+            if selectors:
+                kept.append((",".join(selectors), body))
+    return kept
+
+
+def empty_used():
+    return {"tags": set(), "classes": set(), "ids": set()}
+
+
+def add_attributes(used, props):
+    if not props:
+        return
+    classes = props.get("class")
+    if classes:
+        used["classes"].update(classes.split())
+    element_id = props.get("id")
+    if element_id:
+        used["ids"].add(element_id)
+
+
+def collect_node_selectors(node, used):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        node = block_tree(node)
+        if node.tag:
+            used["tags"].add(node.tag.lower())
+        add_attributes(used, node.props)
+        if node.children:
+            stack.extend(node.children)
+    return used
+
+
+def collect_markup_selectors(html, used):
+    for match in TAG.finditer(html):
+        used["tags"].add(match.group(1).lower())
+        add_attributes(used, dict(ATTRIBUTE_VALUE.findall(match.group(2))))
+    return used
+
+
+def template_markup(ops):
+    for op in ops:
+        if op.__class__ is str:
+            yield op
+        elif op[0] == "if":
+            for _, body in op[1]:
+                yield from template_markup(body)
+        elif op[0] == "for":
+            yield from template_markup(op[3])
+        elif op[0] == "block":
+            yield from template_markup(op[2])
+
+
+class Stylesheet():
+    # The minified bundle plus what is needed to inline each page's critical
+    # subset. Pages using the same tags, classes and ids share one computed
+    # subset.
+    def __init__(self, css, href, critical=True):
+        self.css = css
+        self.href = href
+        self.critical = critical
+        self.rules = parse_rules(css)
+        self.key = hashlib.sha256(f"{href}\0{critical}\0{css}".encode()).hexdigest()
+        self.template_used = {}
+        self.subsets = {}
+
+    def config(self):
+        return self.css, self.href, self.critical
+
+    def used_by_template(self, template):
+        used = self.template_used.get(template)
+        if used is None:
+            used = empty_used()
+            for markup in template_markup(template.ops):
+                collect_markup_selectors(markup, used)
+            self.template_used[template] = used
+        return used
+
+    def page_styles(self, template, html_node):
+        if not self.critical:
+            return {"href": self.href, "critical": None}
+        used = empty_used()
+        for name, values in self.used_by_template(template).items():
+            used[name].update(values)
+        collect_node_selectors(html_node, used)
+        key = tuple(frozenset(used[name]) for name in ("tags", "classes", "ids"))
+        subset = self.subsets.get(key)
+        if subset is None:
+            subset = serialize_rules(critical_rules(self.rules, used))
+            self.subsets[key] = subset
+        return {"href": self.href, "critical": subset}
+
+
+def bundle_stylesheets(static_path):
+    # Every .css file under static/, in path order, minified into one.
+    parts = []
+    for relative_path in list_files(static_path):
+        if relative_path.endswith(".css"):
+            with open(os.path.join(static_path, relative_path), "r") as css_file:
+                parts.append(minify_css(css_file.read()))
+    return "".join(parts)
+
+
+def write_bundle(css, dest_path, fingerprint=False):
+    # Writes the bundle into dest_path and returns its site path. A
+    # fingerprinted bundle replaces the previous build's bundle.<hash>.css.
+    name = BUNDLE_NAME
+    if fingerprint:
+        name = hashed_name(BUNDLE_NAME, hashlib.sha256(css.encode()).hexdigest())
+    stem, extension = os.path.splitext(BUNDLE_NAME)
+    for entry in os.listdir(dest_path):
+        if entry not in (name, BUNDLE_NAME) and entry.startswith(f"{stem}.") and entry.endswith(extension):
+            os.remove(os.path.join(dest_path, entry))
+    path = os.path.join(dest_path, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as bundle_file:
+        bundle_file.write(css)
+    os.replace(tmp_path, path)
+    return "/" + name
+
+
+stylesheet = None
+
+
+def configure(css, href, critical=True):
+    global stylesheet
+    stylesheet = Stylesheet(css, href, critical)
+    return stylesheet
+
+
+def disable():
+    global stylesheet
+    stylesheet = None
+
+
+def current_config():
+    return stylesheet.config() if stylesheet is not None else None
+
+
+def config_key():
+    return stylesheet.key if stylesheet is not None else None
+
+
+def page_styles(template, html_node):
+    if stylesheet is None:
+        return None
+    return stylesheet.page_styles(template, html_node)
@@ -0,0 +1,213 @@
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+from serializer import BufferedWriter
+from leafnode import LeafNode
+from parentnode import ParentNode
+from htmlnode import shared_props
+from template import load_template
+from manifest import remove_output
+from utils import write_page
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+FEED_SIZE = 20
+DEFAULT_SECTION = "blog"
+TAGS_URL = "/tags/"
+TAG_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+def absolute_url(site_url, basepath, url):
+    return site_url.rstrip("/") + basepath + url[1:]
+
+
+def section_url(section):
+    return f"/{section.strip('/')}/"
+
+
+def section_title(section):
+    return section.strip("/").replace("-", " ").replace("/", " / ").title()
+
+
+def published_at(metadata):
+    # The front matter date when it is a YYYY-MM-DD date, else the source
+    # modification time, in seconds.
+    date = metadata.get("date")
+    if date:
+        try:
+            return datetime.strptime(date[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    return metadata["mtime"] / 1e9
+
+
+def write_chunks(path, chunks):
+    # XML is streamed out entry by entry instead of being built in memory.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as output:
+        writer = BufferedWriter(output.write)
+        for chunk in chunks:
+            writer.write(chunk)
+        writer.flush()
+    os.replace(tmp_path, path)
+
+
+def sitemap_entry(site_url, basepath, url, mtime_ns):
+    loc = f"<loc>{escape(absolute_url(site_url, basepath, url))}</loc>"
+    if mtime_ns is None:
+        return f"<url>{loc}</url>\n"
+    lastmod = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).strftime("%Y-%m-%d")
+    return f"<url>{loc}<lastmod>{lastmod}</lastmod></url>\n"
+
+
+def sitemap_chunks(index, site_url, basepath, generated=()):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for url, metadata in index.entries():
+        yield sitemap_entry(site_url, basepath, url, metadata["mtime"])
+    for url, mtime_ns in generated:
+        yield sitemap_entry(site_url, basepath, url, mtime_ns)
+    yield "</urlset>\n"
+
+
+def write_sitemap(index, dest_dir_path, site_url, basepath='/', generated=()):
+    # generated holds (url, mtime_ns) for pages written without a source,
+    # as returned by write_listings and write_tag_pages.
+    path = os.path.join(dest_dir_path, SITEMAP_NAME)
+    write_chunks(path, sitemap_chunks(index, site_url, basepath, generated))
+    return path
+
+
+def newest_mtime(entries):
+    # A generated page changes with the newest page it lists.
+    return max((metadata["mtime"] for _, metadata in entries), default=None)
+
+
+def feed_chunks(entries, title, link, site_url, basepath):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>'
+    yield f"<title>{escape(title)}</title><link>{escape(link)}</link><description>{escape(title)}</description>"
+    if entries:
+        yield f"<lastBuildDate>{formatdate(published_at(entries[0][1]), usegmt=True)}</lastBuildDate>"
+    yield "\n"
+    for url, metadata in entries:
+        item_link = escape(absolute_url(site_url, basepath, url))
+        yield (
+            f"<item><title>{escape(metadata['title'])}</title><link>{item_link}</link>"
+            f"<guid>{item_link}</guid><pubDate>{formatdate(published_at(metadata), usegmt=True)}</pubDate>"
+            f"<description>{escape(metadata['summary'])}</description></item>\n"
+        )
+    yield "</channel></rss>\n"
+
+
+def write_feed(index, dest_dir_path, section, site_url, basepath='/', size=FEED_SIZE):
+    # An RSS 2.0 feed of the section's newest pages.
+    url = section_url(section)
+    entries = index.section(url)[:size]
+    path = os.path.join(dest_dir_path, *url.strip("/").split("/"), FEED_NAME)
+    write_chunks(path, feed_chunks(entries, section_title(section), absolute_url(site_url, basepath, url), site_url, basepath))
+    return path
+
+
+def listing_urls(index, dest_dir_path, url, count):
+    # Page 1 sits at the section root unless a content page already owns it.
+    first = os.path.normpath(os.path.join(dest_dir_path, *url.strip("/").split("/"), "index.html"))
+    urls = [f"{url}page/{number}/" for number in range(1, count + 1)]
+    if first not in index.outputs():
+        urls[0] = url
+    return urls
+
+
+def listing_node(title, entries, urls, page_urls, number):
+    items = []
+    for url, metadata in entries:
+        children = [LeafNode("a", metadata["title"], shared_props(("href", urls.rewrite(url))))]
+        if metadata["summary"]:
+            children.append(LeafNode("p", metadata["summary"]))
+        items.append(ParentNode("li", children))
+    children = [LeafNode("h1", title), ParentNode("ul", items, shared_props(("class", "listing")))]
+    links = []
+    if number > 1:
+        links.append(LeafNode("a", "Newer", shared_props(("href", urls.rewrite(page_urls[number - 2])), ("rel", "prev"))))
+    if number < len(page_urls):
+        links.append(LeafNode("a", "Older", shared_props(("href", urls.rewrite(page_urls[number])), ("rel", "next"))))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children)
+
+
+def write_listings(index, dest_dir_path, section, template_path, basepath, urls, page_size):
+    # Paginated listings of the section, newest first, rendered with the
+    # default template. Returns each listing page's (url, mtime_ns).
+    url = section_url(section)
+    entries = index.section(url)
+    count = max(1, -(-len(entries) // page_size))
+    page_urls = listing_urls(index, dest_dir_path, url, count)
+    template = load_template(template_path, basepath, urls)
+    title = section_title(section)
+    written = []
+    for number, page_url in enumerate(page_urls, 1):
+        page_title = title if number == 1 else f"{title} (page {number})"
+        page_entries = entries[(number - 1) * page_size:number * page_size]
+        dest_path = os.path.join(dest_dir_path, *page_url.strip("/").split("/"), "index.html")
+        write_page(template, page_title, listing_node(page_title, page_entries, urls, page_urls, number), dest_path)
+        written.append((page_url, newest_mtime(page_entries)))
+    pages_path = os.path.join(dest_dir_path, *url.strip("/").split("/"), "page")
+    if os.path.isdir(pages_path):
+        live = set(page_urls)
+        for name in os.listdir(pages_path):
+            if name.isdigit() and f"{url}page/{name}/" not in live:
+                remove_output(os.path.join(pages_path, name, "index.html"), dest_dir_path)
+    return written
+
+
+def tag_slug(tag):
+    return TAG_SLUG.sub("-", tag.lower()).strip("-") or "tag"
+
+
+def tag_slugs(tags):
+    # {tag: slug}. Tags whose slugs collide, such as C and C++, are
+    # numbered in tag order so neither page overwrites the other.
+    slugs = {}
+    taken = set()
+    for tag in tags:
+        slug = base = tag_slug(tag)
+        number = 2
+        while slug in taken:
+            slug = f"{base}-{number}"
+            number += 1
+        taken.add(slug)
+        slugs[tag] = slug
+    return slugs
+
+
+def write_tag_pages(index, page_index, dest_dir_path, template_path, basepath, urls):
+    # One page per front matter tag listing its rendered pages, plus a
+    # tags/ overview, all answered from the page index's tag table.
+    # Returns each page's (url, mtime_ns), the overview last.
+    template = load_template(template_path, basepath, urls)
+    tags_path = os.path.join(dest_dir_path, *TAGS_URL.strip("/").split("/"))
+    tags = [tag for tag, _ in page_index.tags()]
+    slugs = tag_slugs(tags)
+    links = []
+    live = set()
+    written = []
+    for tag in tags:
+        entries = [(index.url_of(index.pages[source]), index.pages[source]) for source in page_index.sources_with_tag(tag) if source in index.pages]
+        if not entries:
+            continue
+        slug = slugs[tag]
+        live.add(slug)
+        url = f"{TAGS_URL}{slug}/"
+        title = f"Tagged {tag}"
+        write_page(template, title, listing_node(title, entries, urls, [url], 1), os.path.join(tags_path, slug, "index.html"))
+        written.append((url, newest_mtime(entries)))
+        links.append(ParentNode("li", [LeafNode("a", tag, shared_props(("href", urls.rewrite(url)))), LeafNode(None, f" ({len(entries)})")]))
+    node = ParentNode("div", [LeafNode("h1", "Tags"), ParentNode("ul", links, shared_props(("class", "tags")))])
+    write_page(template, "Tags", node, os.path.join(tags_path, "index.html"))
+    written.append((TAGS_URL, max((mtime_ns for _, mtime_ns in written), default=None)))
+    for name in os.listdir(tags_path):
+        if name not in live and os.path.isdir(os.path.join(tags_path, name)):
+            remove_output(os.path.join(tags_path, name, "index.html"), dest_dir_path)
+    return written
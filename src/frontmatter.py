@@ -0,0 +1,124 @@
+import io
+import re
+
+FENCE = "---"
+# Without front matter a page can still pick its layout with this comment
+# as its first line.
+LAYOUT_COMMENT = re.compile(r"^<!--\s*layout:\s*(\S+?)\s*-->\s*$")
+INTEGER = re.compile(r"^-?\d+$")
+
+
+def page_layout_from_line(line):
+    match = LAYOUT_COMMENT.match(line)
+    return match.group(1) if match else None
+
+
+def is_fence(line):
+    return line.rstrip("\r\n") == FENCE
+
+
+def parse_value(text):
+    text = text.strip()
+    if text[:1] == "[" and text[-1:] == "]":
+        return [parse_value(item) for item in text[1:-1].split(",") if item.strip()]
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    if INTEGER.match(text):
+        return int(text)
+    return text
+
+
+def parse_front_matter(lines, path="<page>"):
+    # A YAML subset: "key: value" pairs whose values are scalars or
+    # [inline, lists], and "- item" lines under an empty key. Consumes lines
+    # up to and including the closing fence; the opening one is already
+    # read.
+    meta = {}
+    key = None
+    for number, line in enumerate(lines, 2):
+        if is_fence(line):
+            return meta
+        stripped = line.strip()
+        if not stripped or stripped[0] == "#":
+            continue
+        if stripped[:2] == "- " and key is not None and isinstance(meta[key], list):
+            meta[key].append(parse_value(stripped[2:]))
+        elif ":" in stripped and line[0] not in " \t":
+            key, _, value = stripped.partition(":")
+            key = key.strip()
+            meta[key] = parse_value(value) if value.strip() else []
+        else:
+            raise ValueError(f"{path}:{number}: invalid front matter line '{stripped}'")
+    raise ValueError(f"{path}: front matter is not closed")
+
+
+def skip_page_header(lines, path="<page>", meta=None):
+    # Yields the markdown lines after the front matter, or after a layout
+    # comment; the parsed header goes into meta when given.
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    if is_fence(first_line):
+        header = parse_front_matter(lines, path)
+        first_line = None
+    else:
+        layout = page_layout_from_line(first_line)
+        header = {"layout": layout} if layout else {}
+        if layout:
+            first_line = None
+    if meta is not None:
+        meta.update(header)
+    if first_line is not None:
+        yield first_line
+    # Not "yield from": closing this generator would close a file passed
+    # in as lines.
+    for line in lines:
+        yield line
+
+
+def split_page_header(markdown, path="<page>"):
+    # (header, body) for a whole document.
+    first_line = markdown.partition("\n")[0]
+    if not is_fence(first_line) and not page_layout_from_line(first_line):
+        return {}, markdown
+    source = io.StringIO(markdown)
+    meta = {}
+    # The generator reads the header and one body line; the rest of the
+    # body is taken as is.
+    body = skip_page_header(iter(source.readline, ""), path, meta)
+    return meta, next(body, "") + source.read()
+
+
+def read_page_header(path):
+    # (header, title) reading only up to the "# " title line.
+    meta = {}
+    title = None
+    with open(path, "r") as markdown:
+        for line in skip_page_header(markdown, path, meta):
+            if line[:2] == "# ":
+                title = line[2:].rstrip("\n")
+                break
+    return meta, title
+
+
+def page_fields(meta):
+    # The header keys the build understands, normalized.
+    tags = meta.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",")]
+    slug = meta.get("slug")
+    layout = meta.get("layout")
+    date = meta.get("date")
+    return {
+        "date": str(date) if date not in (None, []) else None,
+        "tags": sorted(set(str(tag) for tag in tags if str(tag))),
+        "draft": meta.get("draft") is True,
+        "layout": str(layout) if layout else None,
+        "slug": str(slug).strip("/") if slug else None,
+    }
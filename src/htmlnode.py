@@ -1,4 +1,61 @@
+from functools import lru_cache
+from serializer import iter_html
+
+_OPEN_TAGS = {}
+_CLOSE_TAGS = {}
+
+def open_tag(tag, props_html=''):
+    if props_html:
+        return f"<{tag}{props_html}>"
+    opening = _OPEN_TAGS.get(tag)
+    if opening is None:
+        opening = _OPEN_TAGS[tag] = f"<{tag}>"
+    return opening
+
+def close_tag(tag):
+    closing = _CLOSE_TAGS.get(tag)
+    if closing is None:
+        closing = _CLOSE_TAGS[tag] = f"</{tag}>"
+    return closing
+
+def render_props(props):
+    if not props:
+        return ''
+    props_tuples = list(props.items())
+    mapped_keys = ' '.join(map(lambda k: f"{k[0]}=\"{k[1]}\"", props_tuples))
+    return f" {mapped_keys}"
+
+class SharedProps(dict):
+    # Read-only props shared between every node with the same attributes.
+    # The attribute string is rendered on first use, so a url seen only
+    # once costs no more than the plain dict it replaces until rendered.
+    __slots__ = ("_html",)
+
+    def __init__(self, pairs):
+        super().__init__(pairs)
+        self._html = None
+
+    @property
+    def html(self):
+        if self._html is None:
+            self._html = render_props(self)
+        return self._html
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Shared props are read-only")
+
+    def __reduce__(self):
+        return (SharedProps, (tuple(self.items()),))
+
+    __setitem__ = __delitem__ = update = pop = popitem = clear = setdefault = _readonly
+
+@lru_cache(maxsize=4096)
+def shared_props(*pairs):
+    return SharedProps(pairs)
+
 class HTMLNode():
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,32 +63,33 @@ class HTMLNode():
         self.props = props
 
     def to_html(self):
+        return "".join(iter_html(self))
+
+    def html_parts(self):
         if self.tag is None:
             if self.value is None:
                 raise ValueError("Node without tag must have a value")
-            return self.value
+            return self.value, None, ""
         
         if self.value is not None and self.children is not None:
             raise ValueError("Node cannot have both a value and children")
         
-        props_html = self.props_to_html()
+        opening = open_tag(self.tag, self.props_to_html())
+        closing = close_tag(self.tag)
 
         if self.children is not None:
-            children_html = "".join(child.to_html() for child in self.children)
-            return f"<{self.tag}{props_html}>{children_html}</{self.tag}>"
+            return opening, self.children, closing
         
         if self.value is not None:
-            return f"<{self.tag}{props_html}>{self.value}</{self.tag}>"
+            return opening + self.value, None, closing
         
-        return f"<{self.tag}{props_html}></{self.tag}>"
+        return opening, None, closing
     
     def props_to_html(self):
-        if not self.props:
-            return ''
-        props_tuples = list(self.props.items())
-        mapped_keys = ' '.join(map(lambda k: f"{k[0]}=\"{k[1]}\"", props_tuples))
-        return f" {mapped_keys}"
+        props = self.props
+        if props.__class__ is SharedProps:
+            return props.html
+        return render_props(props)
     
     def __repr__(self):
         return f"HTMLNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
-     
\ No newline at end of file
@@ -0,0 +1,136 @@
+import json
+import os
+import struct
+from manifest import file_signature
+from sync import list_files
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+IMAGE_SIZE_CACHE_PATH = os.path.join(".cache", "image-sizes.json")
+HEADER_BYTES = 32
+# Start-of-frame markers carry the dimensions; C4, C8 and CC share the
+# range but are not frames.
+JPEG_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def png_size(header):
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    return None
+
+
+def gif_size(header):
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", header[6:10])
+    return None
+
+
+def webp_size(header):
+    if header[:4] != b"RIFF" or header[8:12] != b"WEBP" or len(header) < 30:
+        return None
+    chunk = header[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", header[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def jpeg_size(image_file):
+    # Walks the segment headers, seeking over their payloads, until the
+    # start-of-frame segment; EXIF thumbnails and the image data are never
+    # read.
+    image_file.seek(2)
+    while True:
+        marker = image_file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:
+            marker = marker[1:] + image_file.read(1)
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = image_file.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in JPEG_FRAME_MARKERS:
+            frame = image_file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        image_file.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def read_image_size(path):
+    with open(path, "rb") as image_file:
+        header = image_file.read(HEADER_BYTES)
+        if header[:2] == b"\xff\xd8":
+            return jpeg_size(image_file)
+    return png_size(header) or gif_size(header) or webp_size(header)
+
+
+class ImageSizeCache():
+    # Image dimensions keyed by path and revalidated by size and mtime, like
+    # the build manifest's fingerprints, so an unchanged image costs one stat
+    # per build and is never reopened.
+    def __init__(self, path=IMAGE_SIZE_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.isfile(path):
+            try:
+                with open(path, "r") as cache_file:
+                    self.entries = json.load(cache_file)
+            except ValueError:
+                self.entries = {}
+
+    def size_of(self, path):
+        signature = file_signature(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry["signature"] == signature:
+            self.hits += 1
+            return entry["size"]
+        self.misses += 1
+        size = read_image_size(path)
+        self.entries[path] = {"signature": signature, "size": list(size) if size else None}
+        return self.entries[path]["size"]
+
+    def scan(self, static_path):
+        # Returns {"/url/path.png": (width, height)} for every readable image
+        # under static_path and forgets ones that were deleted from it.
+        sizes = {}
+        seen = set()
+        if os.path.isdir(static_path):
+            for relative_path in list_files(static_path):
+                if not relative_path.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(static_path, relative_path)
+                seen.add(path)
+                size = self.size_of(path)
+                if size is not None:
+                    sizes["/" + relative_path.replace(os.sep, "/")] = tuple(size)
+        prefix = os.path.join(static_path, "")
+        for path in list(self.entries):
+            if path.startswith(prefix) and path not in seen:
+                del self.entries[path]
+        return sizes
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(self.entries, cache_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def scan_image_sizes(static_path, cache_path=IMAGE_SIZE_CACHE_PATH):
+    cache = ImageSizeCache(cache_path)
+    sizes = cache.scan(static_path)
+    cache.save()
+    return sizes
@@ -0,0 +1,50 @@
+import os
+from page_index import page_header
+
+LAYOUT_FILE = ".layout"
+
+
+def read_page_layout(from_path):
+    # The layout named in the page's front matter or layout comment.
+    return page_header(from_path)["layout"]
+
+
+class LayoutResolver():
+    # Picks each page's template: the page's own header, else the
+    # nearest .layout file from its directory up to the content root, else
+    # the default template. Layout names are paths relative to the default
+    # template's directory.
+    def __init__(self, content_root, default_template):
+        self.content_root = os.path.normpath(content_root)
+        self.default_template = default_template
+        self.directories = {}
+
+    def resolve(self, name):
+        return os.path.normpath(os.path.join(os.path.dirname(self.default_template), name))
+
+    def directory_layout(self, dir_path):
+        dir_path = os.path.normpath(dir_path)
+        if dir_path in self.directories:
+            return self.directories[dir_path]
+        layout_path = os.path.join(dir_path, LAYOUT_FILE)
+        if os.path.isfile(layout_path):
+            # An empty .layout resets a subtree to the default template.
+            with open(layout_path, "r") as layout_file:
+                name = layout_file.read().strip()
+            template_path = self.resolve(name) if name else self.default_template
+        elif dir_path == self.content_root or os.path.dirname(dir_path) == dir_path:
+            template_path = self.default_template
+        else:
+            template_path = self.directory_layout(os.path.dirname(dir_path))
+        self.directories[dir_path] = template_path
+        return template_path
+
+    def template_for(self, from_path, page_layout=None):
+        if page_layout:
+            return self.resolve(page_layout)
+        return self.directory_layout(os.path.dirname(from_path))
+
+
+def page_templates(pages, resolver):
+    # (from_path, dest_path) pairs to (from_path, dest_path, template_path).
+    return [(from_path, dest_path, resolver.template_for(from_path, read_page_layout(from_path))) for from_path, dest_path in pages]
@@ -1,17 +1,14 @@
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, open_tag, close_tag
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self,  tag=None, value=None, props=None):
         super().__init__(tag=tag,value=value, props=props)
     
-    def to_html(self):
+    def html_parts(self):
         if self.value == None:
-            print(self)
             raise ValueError('All leaf nodes must have a value')
         if self.tag == None:
-            return f"{self.value}"
-        props = self.props_to_html()
-        tagged = f"<{self.tag}{props}>{self.value}</{self.tag}>"
-        return tagged
-        
-        
\ No newline at end of file
+            return self.value, None, ""
+        return open_tag(self.tag, self.props_to_html()) + self.value, None, close_tag(self.tag)
@@ -0,0 +1,147 @@
+import os
+import posixpath
+import re
+from urllib.parse import unquote, urljoin, urlsplit
+from transformers import block_tree
+
+# Tag and attribute holding each kind of reference.
+REFERENCES = {"a": ("link", "href"), "img": ("image", "src")}
+SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+recording = False
+
+
+class BrokenLinksError(Exception):
+    def __init__(self, broken):
+        self.broken = broken
+        lines = [f"{from_path}: broken {kind} {url}" for from_path, kind, url in broken]
+        super().__init__(f"{len(broken)} broken reference(s):\n" + "\n".join(lines))
+
+
+def configure():
+    global recording
+    recording = True
+
+
+def disable():
+    global recording
+    recording = False
+
+
+def current_config():
+    return recording
+
+
+def add_links(node, links, seen):
+    tag = node.tag
+    if tag in REFERENCES:
+        kind, attribute = REFERENCES[tag]
+        url = node.props.get(attribute) if node.props else None
+        # Tuples of strings drop out of the garbage collector's tracking,
+        # which matters with every page's links held until the check.
+        if url and (kind, url) not in seen:
+            seen.add((kind, url))
+            links.append((kind, url))
+    if node.children:
+        for child in node.children:
+            add_links(child, links, seen)
+
+
+def page_links(nodes):
+    # [(kind, url)] for the page's links and images, in document order
+    # without repeats. The urls are the published ones, after rewriting.
+    links = []
+    seen = set()
+    for node in nodes:
+        add_links(block_tree(node), links, seen)
+    return links
+
+
+class LinkRecorder():
+    # page_links for a streamed page, collected as its blocks go by.
+    def __init__(self):
+        self.links = []
+        self.seen = set()
+
+    def watch(self, nodes):
+        for node in nodes:
+            add_links(block_tree(node), self.links, self.seen)
+            yield node
+
+
+def has_links(metadata):
+    return metadata.get("links") is not None
+
+
+def is_internal(url):
+    return bool(url) and url[0] != "#" and url[:2] != "//" and not SCHEME.match(url)
+
+
+def output_files(dest_dir_path):
+    # Every file under the output directory as a site path without the
+    # leading slash: rendered pages, copied static files and generated
+    # extras alike.
+    files = set()
+    for root, _, names in os.walk(dest_dir_path):
+        relative = os.path.relpath(root, dest_dir_path).replace(os.sep, "/")
+        prefix = "" if relative == "." else f"{relative}/"
+        for name in names:
+            files.add(prefix + name)
+    return files
+
+
+def site_path(url, page_url, basepath):
+    # The target's path below the site root, or None for an absolute url
+    # outside the basepath.
+    if url[:1] == "/":
+        if not url.startswith(basepath):
+            return None
+        url = "/" + url[len(basepath):]
+    else:
+        url = urljoin(page_url, url)
+    path = unquote(urlsplit(url).path)
+    normalized = posixpath.normpath(path)
+    if path.endswith("/") and normalized != "/":
+        normalized += "/"
+    return normalized.lstrip("/")
+
+
+def target_exists(path, files):
+    # A directory url needs its index.html; a bare name may also be served
+    # from name/index.html or name.html.
+    if path == "" or path.endswith("/"):
+        return f"{path}index.html" in files
+    return path in files or f"{path}/index.html" in files or f"{path}.html" in files
+
+
+def reference_exists(url, page_url, basepath, files):
+    # None for external urls, which aren't checked.
+    if not is_internal(url):
+        return None
+    path = site_path(url, page_url, basepath)
+    return path is not None and target_exists(path, files)
+
+
+def check_links(index, dest_dir_path, basepath='/'):
+    # Returns the number of internal references checked and the broken ones
+    # as (source, kind, url). Each distinct target is resolved once and
+    # then costs a dict lookup, so the check is linear in the references.
+    files = output_files(dest_dir_path)
+    resolved = {}
+    checked = 0
+    broken = []
+    for page_url, metadata in index.entries():
+        if not has_links(metadata):
+            raise ValueError(f"{metadata['source']} was rendered without collecting its links")
+        for kind, url in metadata["links"]:
+            # Relative urls depend on the page they appear on.
+            key = url if url[:1] == "/" else (page_url, url)
+            if key not in resolved:
+                resolved[key] = reference_exists(url, page_url, basepath, files)
+            exists = resolved[key]
+            if exists is None:
+                continue
+            checked += 1
+            if not exists:
+                broken.append((metadata["source"], kind, url))
+    return checked, broken
@@ -1,15 +1,218 @@
+import argparse
 import sys
+import profiling
+import parse_cache
+import transformers
+import minify
+import css
+import search
+import linkcheck
+import pipeline
 from utils import copy_contents_to_folder, generate_pages_recursive
+from sync import sync_tree
+from watch import DEFAULT_HOST, watch
+from urls import UrlRewriter
+from assets import fingerprint_assets, immutable_headers
+from images import scan_image_sizes
+from compress import precompress_tree, print_savings
+from build import BuildError, generate_pages_incremental, generate_pages_parallel
+from site_index import SiteIndex
+from feeds import DEFAULT_SECTION, write_feed, write_listings, write_sitemap, write_tag_pages
+import page_index
 
-basepath = '/'
+def parse_watch_args(argv):
+    parser = argparse.ArgumentParser(prog="main.py watch", description="Serve the site from memory and rebuild on change")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to serve on (default 127.0.0.1; 0.0.0.0 for every interface)")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between polls of content/, static/ and the template")
+    parser.add_argument("--drafts", action="store_true", help="also serve pages whose front matter sets draft: true")
+    parser.add_argument("--no-page-index", action="store_true", help="read every page's front matter instead of using the SQLite page index")
+    return parser.parse_args(argv)
 
-args = sys.argv
+def parse_cache_args(argv):
+    parser = argparse.ArgumentParser(prog="main.py cache", description="Manage the on-disk parse cache")
+    parser.add_argument("action", choices=["clean"])
+    parser.add_argument("--cache-dir", default=parse_cache.DEFAULT_CACHE_DIR)
+    return parser.parse_args(argv)
 
-if len(args) > 1:
-    basepath = args[1]
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site from content/ into docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--incremental", action="store_true", help="only re-render pages whose inputs changed")
+    parser.add_argument("--checksum", action="store_true", help="compare static files by content hash when size or mtime differ")
+    parser.add_argument("--hardlink", action="store_true", help="hardlink static files into the output instead of copying")
+    parser.add_argument("--fingerprint", action="store_true", help="publish static files under content-hashed names and point pages and the template at them")
+    parser.add_argument("--no-image-sizes", action="store_true", help="don't add width, height and lazy-loading attributes to images")
+    parser.add_argument("--minify", action="store_true", help="collapse whitespace in pages as they are written, keeping pre and code intact")
+    parser.add_argument("--strip-comments", action="store_true", help="with --minify, also drop HTML comments")
+    parser.add_argument("--css", action="store_true", help="bundle and minify static/*.css and inline the rules each page uses into its head")
+    parser.add_argument("--no-critical-css", action="store_true", help="with --css, only link the bundle")
+    parser.add_argument("--drafts", action="store_true", help="also build pages whose front matter sets draft: true")
+    parser.add_argument("--no-page-index", action="store_true", help="read every page's front matter instead of using the SQLite page index")
+    parser.add_argument("--tag-pages", action="store_true", help="write a listing page per front matter tag under tags/")
+    parser.add_argument("--site-url", default=None, metavar="URL", help="write sitemap.xml and an RSS feed of --section with absolute links under URL")
+    parser.add_argument("--section", default=DEFAULT_SECTION, help="content directory the feed and listing pages cover (default blog)")
+    parser.add_argument("--listing-size", type=int, default=0, metavar="N", help="write paginated listing pages of --section with N entries each")
+    parser.add_argument("--search", action="store_true", help="write a sharded search index of the pages' text under search/")
+    parser.add_argument("--check-links", action="store_true", help="fail the build when a link or image points at a file the site doesn't publish")
+    parser.add_argument("--precompress", action="store_true", help="write .gz (and .br when brotli is installed) next to compressible output files")
+    parser.add_argument("--gzip-level", type=int, default=9, choices=range(1, 10), metavar="1-9")
+    parser.add_argument("--brotli-quality", type=int, default=11, choices=range(0, 12), metavar="0-11")
+    parser.add_argument("--profile", nargs="?", const="build-profile.json", default=None, metavar="REPORT", help="record per-page and per-stage time and memory and write a JSON report (default build-profile.json)")
+    parser.add_argument("--no-cache", action="store_true", help="always re-parse markdown instead of using the parse cache")
+    parser.add_argument("--cache-dir", default=parse_cache.DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache-size", type=int, default=parse_cache.DEFAULT_MAX_BYTES // (1024 * 1024), metavar="MB", help="evict least recently used parse cache entries above this size")
+    parser.add_argument("--block-cache", type=int, default=transformers.DEFAULT_BLOCK_CACHE_SIZE, metavar="N", help="keep up to N rendered blocks in memory for reuse across pages (0 disables)")
+    parser.add_argument("--pipeline", action="store_true", help="overlap reading, rendering and writing pages in threads joined by bounded queues")
+    parser.add_argument("--pipeline-readers", type=int, default=pipeline.DEFAULT_READERS, metavar="N", help="with --pipeline, threads reading sources")
+    parser.add_argument("--pipeline-queue", type=int, default=pipeline.DEFAULT_QUEUE_SIZE, metavar="N", help="with --pipeline, pages each queue holds before the stage feeding it waits")
+    parser.add_argument("--jobs", "-j", type=int, default=None, metavar="N", help="render pages in N worker processes (0 uses every core)")
+    args = parser.parse_args(argv)
+    if args.tag_pages and args.no_page_index:
+        parser.error("--tag-pages needs the page index; drop --no-page-index")
+    return args
 
 def main():
-    copy_contents_to_folder("static", "docs")
-    generate_pages_recursive('content', 'template.html', 'docs', basepath)
+    if sys.argv[1:2] == ["watch"]:
+        args = parse_watch_args(sys.argv[2:])
+        if not args.no_page_index:
+            page_index.configure(page_index.PAGE_INDEX_PATH, args.drafts)
+        try:
+            watch('content', 'template.html', 'static', args.port, args.interval, args.basepath, args.host)
+        finally:
+            page_index.disable()
+        return
+    if sys.argv[1:2] == ["cache"]:
+        args = parse_cache_args(sys.argv[2:])
+        parse_cache.ParseCache(args.cache_dir).clean()
+        print(f"Removed parse cache {args.cache_dir}")
+        return
+    args = parse_args()
+    if not args.no_cache:
+        parse_cache.configure(args.cache_dir, args.cache_size * 1024 * 1024)
+    transformers.configure_block_cache(args.block_cache)
+    if args.minify:
+        minify.configure(args.strip_comments)
+    if args.search:
+        search.configure()
+    if args.check_links:
+        linkcheck.configure()
+    if args.pipeline:
+        pipeline.configure(args.pipeline_readers, args.pipeline_queue)
+    if args.profile:
+        profiling.enable_profiling()
+        try:
+            build(args)
+        finally:
+            report = profiling.profiler.report()
+            profiling.disable_profiling()
+            profiling.print_summary(report)
+            profiling.write_report(report, args.profile)
+            print(f"Wrote profile report to {args.profile}")
+        return
+    build(args)
 
-main()
\ No newline at end of file
+def build(args):
+    if not args.no_page_index:
+        stats = page_index.configure(page_index.PAGE_INDEX_PATH, args.drafts).refresh("content")
+        print(f"Page index: read {stats['read']}, reused {stats['reused']}, removed {stats['removed']} pages")
+    try:
+        index = build_site(args)
+    finally:
+        if parse_cache.cache is not None:
+            parse_cache.cache.prune()
+        page_index.disable()
+    print_cache_stats()
+    if pipeline.engine is not None:
+        pipeline.print_stats(pipeline.engine.stats)
+    if args.precompress:
+        workers = None if args.jobs is None or args.jobs < 1 else args.jobs
+        stats, savings = precompress_tree("docs", args.gzip_level, args.brotli_quality, workers)
+        print(f"Compressed {stats['compressed']}, skipped {stats['skipped']}, removed {stats['removed']} files")
+        print_savings(savings)
+    if args.check_links:
+        checked, broken = linkcheck.check_links(index, "docs", args.basepath)
+        print(f"Checked {checked} internal references in {len(index.pages)} pages, {len(broken)} broken")
+        if broken:
+            raise linkcheck.BrokenLinksError(broken)
+
+def print_cache_stats():
+    blocks = transformers.block_cache.stats()
+    print(f"Block cache: {blocks['hits']} hits, {blocks['misses']} misses")
+    if parse_cache.cache is not None:
+        print(f"Parse cache: {parse_cache.cache.hits} hits, {parse_cache.cache.misses} misses")
+
+def publish_stylesheets(args):
+    if not args.css:
+        return None
+    bundle = css.bundle_stylesheets("static")
+    path = css.write_bundle(bundle, "docs", args.fingerprint)
+    print(f"Bundled stylesheets into {path} ({len(bundle)} bytes)")
+    return bundle, path
+
+def publish_assets(args, stylesheets=None):
+    if not args.fingerprint:
+        return None
+    assets, stats = fingerprint_assets("static", "docs")
+    print(f"Hashed {stats['hashed']}, reused {stats['reused']}, removed {stats['removed']} fingerprinted assets")
+    immutable = dict(assets)
+    if stylesheets is not None:
+        immutable[stylesheets[1]] = stylesheets[1]
+    with open("docs/_headers", "w") as headers_file:
+        headers_file.write(immutable_headers(immutable, args.basepath))
+    return assets
+
+def url_rewriter_for(args):
+    stylesheets = publish_stylesheets(args)
+    assets = publish_assets(args, stylesheets)
+    image_sizes = None if args.no_image_sizes else scan_image_sizes("static")
+    urls = UrlRewriter(args.basepath, assets, image_sizes)
+    if stylesheets is not None:
+        bundle, path = stylesheets
+        css.configure(bundle, urls.rewrite(path), not args.no_critical_css)
+    return urls
+
+def build_site(args):
+    index = SiteIndex("docs")
+    if args.incremental:
+        synced = sync_tree("static", "docs", checksum=args.checksum, hardlink=args.hardlink)
+        print(f"Copied {synced['copied']}, skipped {synced['skipped']}, removed {synced['removed']} static files")
+        urls = url_rewriter_for(args)
+        stats = generate_pages_incremental('content', 'template.html', 'docs', args.basepath, 1 if args.jobs is None else args.jobs, urls, index)
+        print(f"Rendered {stats['rendered']}, skipped {stats['skipped']}, removed {stats['removed']} pages")
+    else:
+        copy_contents_to_folder("static", "docs")
+        urls = url_rewriter_for(args)
+        if args.jobs is not None or args.pipeline:
+            generate_pages_parallel('content', 'template.html', 'docs', args.basepath, 1 if args.jobs is None else args.jobs, urls, index)
+        else:
+            generate_pages_recursive('content', 'template.html', 'docs', args.basepath, urls, index=index)
+    publish_site_index(args, index, urls)
+    return index
+
+def publish_site_index(args, index, urls):
+    # Listing and tag pages go first so the sitemap can include them.
+    generated = []
+    if args.listing_size > 0:
+        listings = write_listings(index, "docs", args.section, 'template.html', args.basepath, urls, args.listing_size)
+        generated.extend(listings)
+        print(f"Wrote {len(listings)} listing page(s) for {args.section}")
+    if args.tag_pages:
+        tag_pages = write_tag_pages(index, page_index.index, "docs", 'template.html', args.basepath, urls)
+        generated.extend(tag_pages)
+        print(f"Wrote {len(tag_pages) - 1} tag page(s) and the tags index")
+    if args.site_url:
+        sitemap = write_sitemap(index, "docs", args.site_url, args.basepath, generated)
+        feed = write_feed(index, "docs", args.section, args.site_url, args.basepath)
+        print(f"Wrote {sitemap} and {feed}")
+    if args.search:
+        stats = search.write_search_index(index, "docs", urls)
+        print(f"Search index: wrote {stats['written']}, kept {stats['unchanged']}, removed {stats['removed']} shards")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (BuildError, linkcheck.BrokenLinksError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
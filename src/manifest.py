@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 5
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def combine_hashes(hashes):
+    digest = hashlib.sha256()
+    for value in hashes:
+        digest.update(value.encode())
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def empty_manifest():
+    return {"version": MANIFEST_VERSION, "templates": {}, "pages": {}}
+
+
+def load_manifest(dest_dir_path):
+    manifest_path = os.path.join(dest_dir_path, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return empty_manifest()
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except ValueError:
+        return empty_manifest()
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(dest_dir_path, manifest):
+    os.makedirs(dest_dir_path, exist_ok=True)
+    manifest_path = os.path.join(dest_dir_path, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_json_manifest(dir_path, name):
+    manifest_path = os.path.join(dir_path, name)
+    if not os.path.isfile(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            return json.load(manifest_file)
+    except ValueError:
+        return {}
+
+
+def save_json_manifest(dir_path, name, data):
+    os.makedirs(dir_path, exist_ok=True)
+    manifest_path = os.path.join(dir_path, name)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(data, manifest_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def file_fingerprint(path, previous):
+    # Reuse the stored hash while size and mtime are untouched, so an
+    # unchanged tree costs one stat per file instead of a full read.
+    signature = file_signature(path)
+    if previous and previous.get("signature") == signature:
+        return {"signature": signature, "hash": previous["hash"]}
+    return {"signature": signature, "hash": hash_file(path)}
+
+
+def page_is_fresh(entry, fingerprint, template_hash, url_key, dest_path):
+    if entry is None:
+        return False
+    return (
+        entry["hash"] == fingerprint["hash"]
+        and entry["template_hash"] == template_hash
+        and entry["urls"] == url_key
+        and entry["output"] == dest_path
+        and os.path.isfile(dest_path)
+    )
+
+
+def page_entry(fingerprint, template_hash, url_key, dest_path, layout=None, templates=(), metadata=None):
+    # templates lists every template and partial the page was rendered
+    # with, which is the page's edge set in the dependency graph. metadata
+    # is the page's site index entry.
+    return {
+        "signature": fingerprint["signature"],
+        "hash": fingerprint["hash"],
+        "template_hash": template_hash,
+        "urls": url_key,
+        "output": dest_path,
+        "layout": layout,
+        "templates": list(templates),
+        "metadata": metadata,
+    }
+
+
+def remove_output(dest_path, dest_dir_path):
+    if os.path.isfile(dest_path):
+        os.remove(dest_path)
+    parent = os.path.dirname(dest_path)
+    root = os.path.abspath(dest_dir_path)
+    while os.path.abspath(parent) != root and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
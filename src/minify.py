@@ -0,0 +1,146 @@
+import re
+
+# Elements whose text is written exactly as it came in.
+RAW_ELEMENTS = ("pre", "code", "textarea", "script", "style")
+RAW_CLOSING = {name: re.compile(f"</{name}", re.IGNORECASE) for name in RAW_ELEMENTS}
+SPECIAL = re.compile(r"<!--|<(" + "|".join(RAW_ELEMENTS) + r")\b", re.IGNORECASE)
+# Splits markup at its angle brackets, so the text between tags is every
+# other part; whitespace is only touched in text that a "<" (or the end)
+# follows, which keeps it out of tags and their attribute values.
+ANGLE_BRACKETS = re.compile(r"([<>])")
+# Runs that collapse to one space. Only ASCII whitespace counts, so &nbsp;
+# characters survive.
+WHITESPACE_RUN = re.compile(r"[ \t\n\r\f]{2,}|[\t\n\r\f]")
+WHITESPACE = " \t\n\r\f"
+WINDOW_SIZE = 1 << 16
+
+
+def minify_markup(html):
+    # Rendered markdown rarely holds anything to collapse; a few substring
+    # checks run at memchr speed and skip the regex passes for it.
+    if "\n" not in html and "  " not in html and "\t" not in html and "\r" not in html and "\f" not in html:
+        return html
+    # One split keeps this linear however far apart the tags are.
+    parts = ANGLE_BRACKETS.split(html)
+    last = len(parts) - 1
+    for i in range(0, len(parts), 2):
+        text = parts[i]
+        if not text or (i < last and parts[i + 1] == ">"):
+            continue
+        if "\n" in text and not text.strip(WHITESPACE) and (i == 0 or parts[i - 1] == ">"):
+            # Whitespace-only text holding a newline is template indentation.
+            parts[i] = ""
+        else:
+            parts[i] = WHITESPACE_RUN.sub(" ", text)
+    return "".join(parts)
+
+
+class HtmlMinifier():
+    # A streaming stage with the BufferedWriter interface: chunks go in as
+    # the serializer produces them and minified text comes out, so the page
+    # is never held or rescanned as a whole. Input is collected into windows
+    # of about WINDOW_SIZE characters, each minified with a couple of regex
+    # passes; only a trailing unfinished tag, comment or text run carries
+    # over to the next window.
+    #
+    # Whitespace-only text containing a newline is dropped and other
+    # whitespace runs collapse to one space. pre, code, textarea, script and
+    # style bodies pass through untouched.
+    def __init__(self, write, remove_comments=False, window_size=WINDOW_SIZE):
+        self.sink_write = write
+        self.remove_comments = remove_comments
+        self.window_size = window_size
+        self.chunks = []
+        self.size = 0
+        self.raw_element = None
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size >= self.window_size:
+            self.process_window(final=False)
+
+    def flush(self):
+        if self.chunks:
+            self.process_window(final=True)
+
+    def process_window(self, final):
+        leftover = self.process("".join(self.chunks), final)
+        self.chunks = [leftover] if leftover else []
+        self.size = len(leftover)
+
+    def process(self, text, final):
+        write = self.sink_write
+        position = 0
+        length = len(text)
+        while position < length:
+            if self.raw_element is not None:
+                match = RAW_CLOSING[self.raw_element].search(text, position)
+                if match is None:
+                    # Keep just enough for a closing tag split across windows.
+                    keep = 0 if final else len(self.raw_element) + 1
+                    cut = max(position, length - keep)
+                    if cut > position:
+                        write(text[position:cut])
+                    return text[cut:]
+                end = match.start()
+                if end > position:
+                    write(text[position:end])
+                self.raw_element = None
+                position = end
+                continue
+            match = SPECIAL.search(text, position)
+            if match is None:
+                end = length if final else text.rfind("<", position)
+                if end == -1:
+                    return text[position:]
+                if end > position:
+                    write(minify_markup(text[position:end]))
+                return text[end:]
+            start = match.start()
+            if match.group(1) is None:
+                end = text.find("-->", start + 4)
+            else:
+                end = text.find(">", start)
+            if end == -1 and not final:
+                if start > position:
+                    write(minify_markup(text[position:start]))
+                return text[start:]
+            end = length if end == -1 else end + (3 if match.group(1) is None else 1)
+            if start > position:
+                write(minify_markup(text[position:start]))
+            if match.group(1) is None:
+                comment = text[start:end]
+                if not self.remove_comments or comment.startswith("<!--["):
+                    write(comment)
+            else:
+                write(text[start:end])
+                if text[end - 2:end] != "/>":
+                    self.raw_element = match.group(1).lower()
+            position = end
+        return ""
+
+
+options = None
+
+
+def configure(remove_comments=False):
+    global options
+    options = {"remove_comments": remove_comments}
+    return options
+
+
+def disable():
+    global options
+    options = None
+
+
+def current_config():
+    return options
+
+
+def page_writer(writer):
+    # Puts the minifier in front of a page's BufferedWriter when enabled.
+    if options is None:
+        return writer
+    return HtmlMinifier(writer.write, options["remove_comments"])
@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+from frontmatter import page_fields, read_page_header
+from manifest import file_signature
+from site_index import output_url
+
+PAGE_INDEX_PATH = os.path.join(".cache", "pages.sqlite")
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    title TEXT,
+    date TEXT,
+    draft INTEGER NOT NULL,
+    layout TEXT,
+    slug TEXT,
+    meta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    source TEXT NOT NULL REFERENCES pages (source) ON DELETE CASCADE,
+    PRIMARY KEY (tag, source)
+);
+CREATE INDEX IF NOT EXISTS tags_by_source ON tags (source);
+CREATE INDEX IF NOT EXISTS pages_by_date ON pages (draft, date);
+"""
+RELATED_LIMIT = 5
+
+
+def header_fields(from_path):
+    meta, title = read_page_header(from_path)
+    fields = page_fields(meta)
+    fields["title"] = title
+    fields["meta"] = meta
+    return fields
+
+
+class PageIndex():
+    # Every page's front matter in SQLite, revalidated by size and mtime like
+    # the build manifest, so an unchanged page costs one stat and is never
+    # reopened. Tags are a separate indexed table, which keeps tag listings
+    # and related-page lookups to a query each.
+    def __init__(self, path=PAGE_INDEX_PATH, include_drafts=False):
+        self.path = path
+        self.include_drafts = include_drafts
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript(f"DROP TABLE IF EXISTS tags; DROP TABLE IF EXISTS pages; PRAGMA user_version = {SCHEMA_VERSION};")
+        self.connection.executescript(SCHEMA)
+        self.reads = 0
+        self.reuses = 0
+
+    def page(self, from_path):
+        size, mtime_ns = file_signature(from_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, title, meta FROM pages WHERE source = ?", (from_path,)
+        ).fetchone()
+        if row is not None and row[0] == size and row[1] == mtime_ns:
+            self.reuses += 1
+            meta = json.loads(row[3])
+            fields = page_fields(meta)
+            fields["title"] = row[2]
+            fields["meta"] = meta
+            return fields
+        self.reads += 1
+        fields = header_fields(from_path)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pages (source, size, mtime_ns, title, date, draft, layout, slug, meta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (from_path, size, mtime_ns, fields["title"], fields["date"], fields["draft"], fields["layout"], fields["slug"], json.dumps(fields["meta"])),
+        )
+        self.connection.execute("DELETE FROM tags WHERE source = ?", (from_path,))
+        self.connection.executemany("INSERT INTO tags (tag, source) VALUES (?, ?)", [(tag, from_path) for tag in fields["tags"]])
+        return fields
+
+    def refresh(self, content_root):
+        # Brings the index in line with content_root and returns what it
+        # took.
+        before = (self.reads, self.reuses)
+        seen = set()
+        for root, dirs, files in os.walk(content_root):
+            for item in files:
+                if item[-3:] == '.md':
+                    from_path = os.path.join(root, item)
+                    seen.add(from_path)
+                    self.page(from_path)
+        prefix = os.path.join(content_root, "")
+        stale = [
+            (source,) for (source,) in self.connection.execute("SELECT source FROM pages")
+            if source.startswith(prefix) and source not in seen
+        ]
+        self.connection.executemany("DELETE FROM pages WHERE source = ?", stale)
+        self.connection.commit()
+        return {"read": self.reads - before[0], "reused": self.reuses - before[1], "removed": len(stale)}
+
+    def published(self):
+        return "1" if self.include_drafts else "draft = 0"
+
+    def tags(self):
+        # [(tag, page count)] in tag order.
+        return self.connection.execute(
+            f"SELECT tag, COUNT(*) FROM tags JOIN pages USING (source) WHERE {self.published()} GROUP BY tag ORDER BY tag"
+        ).fetchall()
+
+    def sources_with_tag(self, tag):
+        # Newest first by front matter date.
+        rows = self.connection.execute(
+            f"SELECT source FROM tags JOIN pages USING (source) WHERE tag = ? AND {self.published()} ORDER BY date DESC, source",
+            (tag,),
+        )
+        return [source for (source,) in rows]
+
+    def related(self, from_path, limit=RELATED_LIMIT):
+        # Pages sharing the most tags with from_path, then the newest.
+        rows = self.connection.execute(
+            f"""SELECT other.source, pages.title, COUNT(*) AS shared
+            FROM tags AS own JOIN tags AS other ON other.tag = own.tag AND other.source != own.source
+            JOIN pages ON pages.source = other.source
+            WHERE own.source = ? AND {self.published()}
+            GROUP BY other.source ORDER BY shared DESC, pages.date DESC, other.source LIMIT ?""",
+            (from_path, limit),
+        )
+        return [(source, title) for source, title, _ in rows]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+index = None
+
+
+def configure(path=PAGE_INDEX_PATH, include_drafts=False):
+    global index
+    disable()
+    index = PageIndex(path, include_drafts)
+    return index
+
+
+def disable():
+    global index
+    if index is not None:
+        index.close()
+    index = None
+
+
+def current_config():
+    return (index.path, index.include_drafts) if index is not None else None
+
+
+def page_header(from_path):
+    # Indexed when an index is configured, read from the file otherwise.
+    if index is not None:
+        return index.page(from_path)
+    return header_fields(from_path)
+
+
+def include_drafts():
+    return index is not None and index.include_drafts
+
+
+def slugged_output(dest_path, slug):
+    directory, name = os.path.split(dest_path)
+    if name == "index.html":
+        return os.path.join(os.path.dirname(directory), slug, name)
+    return os.path.join(directory, f"{slug}.html")
+
+
+def page_destination(from_path, content_root, dest_dir_path):
+    # The page's output path, with its slug applied, or None for a draft
+    # left out of the build.
+    header = page_header(from_path)
+    if header["draft"] and not include_drafts():
+        return None
+    relative = os.path.relpath(from_path, content_root)
+    dest_path = os.path.normpath(os.path.join(dest_dir_path, f"{relative[:-3]}.html"))
+    # The site root's index page has no name to replace.
+    if header["slug"] and relative != "index.md":
+        dest_path = slugged_output(dest_path, header["slug"])
+    return dest_path
+
+
+def page_context(from_path, content_root, dest_dir_path, urls):
+    # Template variables from the header: Page (date, tags, slug) and
+    # Related, the pages sharing the most tags when an index is configured.
+    header = page_header(from_path)
+    related = []
+    if index is not None:
+        for source, title in index.related(from_path):
+            dest_path = page_destination(source, content_root, dest_dir_path)
+            if dest_path is not None:
+                related.append({"title": title, "url": urls.rewrite(output_url(dest_path, dest_dir_path))})
+    return {
+        "Page": {"date": header["date"], "tags": header["tags"], "slug": header["slug"]},
+        "Related": related,
+    }
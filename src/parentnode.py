@@ -1,13 +1,14 @@
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, open_tag, close_tag
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag=tag, children=children, props=props)
 
-    def to_html(self):
+    def html_parts(self):
         if self.tag == None:
             raise ValueError("The node doesn't have a tag")
         if self.children == None:
             raise ValueError("The node doesn't have a children")
-        mapped_children = ''.join(list(map( lambda node: node.to_html() , self.children)))
-        return f"<{self.tag}{self.props_to_html()}>{mapped_children}</{self.tag}>"
\ No newline at end of file
+        return open_tag(self.tag, self.props_to_html()), self.children, close_tag(self.tag)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import hashlib
+import marshal
+import os
+import shutil
+import tempfile
+import zlib
+from htmlnode import HTMLNode, SharedProps, shared_props
+from leafnode import LeafNode
+from parentnode import ParentNode
+from transformers import PARSER_VERSION, RenderedBlock
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "parse")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Bigger sources skip the cache and are streamed, keeping memory bounded.
+MAX_SOURCE_BYTES = 4 * 1024 * 1024
+
+NODE_KINDS = {HTMLNode: 0, LeafNode: 1, ParentNode: 2}
+NODE_CLASSES = {kind: cls for cls, kind in NODE_KINDS.items()}
+
+
+def node_to_tuple(node):
+    if node.__class__ is RenderedBlock:
+        node = node.source
+    props = node.props
+    if props is not None:
+        props = (props.__class__ is SharedProps, tuple(props.items()))
+    children = node.children
+    if children is not None:
+        children = tuple(node_to_tuple(child) for child in children)
+    return (NODE_KINDS[node.__class__], node.tag, node.value, props, children)
+
+
+def tuple_to_node(data):
+    kind, tag, value, props, children = data
+    if props is not None:
+        shared, pairs = props
+        props = shared_props(*pairs) if shared else dict(pairs)
+    if children is not None:
+        children = [tuple_to_node(child) for child in children]
+    node = NODE_CLASSES[kind].__new__(NODE_CLASSES[kind])
+    HTMLNode.__init__(node, tag, value, children, props)
+    return node
+
+
+def dumps(title, node):
+    return zlib.compress(marshal.dumps((title, node_to_tuple(node))), 1)
+
+
+def loads(data):
+    title, tree = marshal.loads(zlib.decompress(data))
+    return title, tuple_to_node(tree)
+
+
+class ParseCache():
+    # Parsed node trees on disk, one file per source hash. Writes go through
+    # a temporary file and os.replace, so parallel workers sharing the
+    # directory only ever see complete entries; a hit bumps the file's mtime,
+    # which is what the LRU eviction in prune() orders by.
+    def __init__(self, path=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def config(self):
+        return self.path, self.max_bytes
+
+    def key_for(self, content):
+        # Cached trees keep their source URLs (see transformers.bind_node),
+        # so the key doesn't depend on the basepath, assets or images.
+        digest = hashlib.sha256(f"{PARSER_VERSION}:{marshal.version}:".encode())
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+            result = loads(data)
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, title, node):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as entry:
+                entry.write(dumps(title, node))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def entries(self):
+        found = []
+        if not os.path.isdir(self.path):
+            return found
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, stat.st_size, path))
+        return found
+
+    def prune(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clean(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+
+cache = None
+
+
+def configure(path=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    global cache
+    cache = ParseCache(path, max_bytes)
+    return cache
+
+
+def disable():
+    global cache
+    cache = None
+
+
+def current_config():
+    return cache.config() if cache is not None else None
@@ -0,0 +1,231 @@
+import os
+import queue
+import threading
+import time
+import parse_cache
+from utils import generate_page, render_page
+
+DEFAULT_READERS = 4
+DEFAULT_QUEUE_SIZE = 16
+WRITE_BATCH = 8
+STAGES = ("read", "render", "write")
+# Marks the end of a stage's output.
+DONE = None
+
+
+def empty_stats():
+    return {name: {"work": 0.0, "wait": 0.0, "pages": 0} for name in STAGES}
+
+
+class StageClock():
+    # Splits one thread's time in a stage between waiting on a queue and
+    # doing the stage's work.
+    def __init__(self):
+        self.work = 0.0
+        self.wait = 0.0
+        self.pages = 0
+        self.last = time.perf_counter()
+
+    def lap(self):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        return elapsed
+
+    def worked(self):
+        self.work += self.lap()
+
+    def waited(self):
+        self.wait += self.lap()
+
+    def add_to(self, stats):
+        stats["work"] += self.work
+        stats["wait"] += self.wait
+        stats["pages"] += self.pages
+
+
+class Pipeline():
+    # Reads, renders and writes pages in overlapping stages: reader threads
+    # load sources into a bounded queue, the calling thread parses and
+    # renders them to strings, and a writer thread saves them in batches.
+    # The bounded queues are the backpressure: a stage that gets ahead
+    # blocks until the next one catches up, so at most about
+    # 2 * queue_size pages are held in memory. Rendering stays on one
+    # thread; the overlap hides the I/O behind it, and -j still adds
+    # processes, each running its own pipeline. Only sources the parse
+    # cache would take are read whole; without the cache, or for bigger
+    # sources, the render stage streams the page to its file as
+    # generate_page does, which keeps memory constant per page.
+    def __init__(self, readers=DEFAULT_READERS, queue_size=DEFAULT_QUEUE_SIZE, write_batch=WRITE_BATCH):
+        if readers < 1 or queue_size < 1 or write_batch < 1:
+            raise ValueError("Pipeline readers, queue size and write batch must be positive")
+        self.readers = readers
+        self.queue_size = queue_size
+        self.write_batch = write_batch
+        self.stats = empty_stats()
+
+    def config(self):
+        return self.readers, self.queue_size, self.write_batch
+
+    def reset_stats(self):
+        self.stats = empty_stats()
+
+    def add_stats(self, stats):
+        for name in STAGES:
+            for key in ("work", "wait", "pages"):
+                self.stats[name][key] += stats[name][key]
+
+    def read_pages(self, pending, read_queue, stop, clocks, lock):
+        clock = StageClock()
+        while not stop.is_set():
+            try:
+                page = pending.get_nowait()
+            except queue.Empty:
+                break
+            from_path = page[0]
+            try:
+                stat = os.stat(from_path)
+                text = None
+                # Without the parse cache, or for big sources, the render
+                # stage streams the page like generate_page does.
+                if parse_cache.cache is not None and stat.st_size <= parse_cache.MAX_SOURCE_BYTES:
+                    with open(from_path, "r") as markdown:
+                        text = markdown.read()
+                item = (page, stat.st_mtime_ns, text, None)
+            except OSError as error:
+                item = (page, None, None, f"{type(error).__name__}: {error}")
+            clock.worked()
+            clock.pages += 1
+            read_queue.put(item)
+            clock.waited()
+        read_queue.put(DONE)
+        with lock:
+            clocks.append(clock)
+
+    def write_pages(self, write_queue, failures, clocks, lock):
+        clock = StageClock()
+        directories = set()
+        done = False
+        while not done:
+            batch = [write_queue.get()]
+            clock.waited()
+            while len(batch) < self.write_batch:
+                try:
+                    batch.append(write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is DONE:
+                    done = True
+                    break
+                from_path, dest_path, html = item
+                tmp_path = f"{dest_path}.tmp"
+                try:
+                    directory = os.path.dirname(dest_path)
+                    if directory not in directories:
+                        os.makedirs(directory, exist_ok=True)
+                        directories.add(directory)
+                    with open(tmp_path, "w") as dest_file:
+                        dest_file.write(html)
+                    os.replace(tmp_path, dest_path)
+                    clock.pages += 1
+                except Exception as error:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    with lock:
+                        failures.append((from_path, f"{type(error).__name__}: {error}"))
+            clock.worked()
+        with lock:
+            clocks.append(clock)
+
+    def run(self, pages, basepath, urls=None):
+        # pages are (from_path, dest_path, template_path, context) tuples, as
+        # for build.render_batch; returns the same (metadata, failures).
+        pending = queue.Queue()
+        for page in pages:
+            pending.put(page)
+        read_queue = queue.Queue(self.queue_size)
+        write_queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_clocks = []
+        write_clocks = []
+        rendered = []
+        failures = []
+        readers = [
+            threading.Thread(target=self.read_pages, args=(pending, read_queue, stop, read_clocks, lock), daemon=True)
+            for _ in range(min(self.readers, max(1, len(pages))))
+        ]
+        writer = threading.Thread(target=self.write_pages, args=(write_queue, failures, write_clocks, lock), daemon=True)
+        for thread in readers:
+            thread.start()
+        writer.start()
+        clock = StageClock()
+        finished = 0
+        try:
+            while finished < len(readers):
+                item = read_queue.get()
+                clock.waited()
+                if item is DONE:
+                    finished += 1
+                    continue
+                (from_path, dest_path, template_path, context), mtime_ns, text, error = item
+                if error is not None:
+                    with lock:
+                        failures.append((from_path, error))
+                    continue
+                try:
+                    if text is None:
+                        rendered.append(generate_page(from_path, template_path, dest_path, basepath, urls, context))
+                        clock.pages += 1
+                        clock.worked()
+                        continue
+                    html, metadata = render_page(text, mtime_ns, from_path, template_path, dest_path, basepath, urls, context)
+                except Exception as error:
+                    with lock:
+                        failures.append((from_path, f"{type(error).__name__}: {error}"))
+                    clock.worked()
+                    continue
+                rendered.append(metadata)
+                clock.pages += 1
+                clock.worked()
+                write_queue.put((from_path, dest_path, html))
+                clock.waited()
+        finally:
+            # On an abort the readers may be blocked on a full queue.
+            stop.set()
+            while finished < len(readers):
+                if read_queue.get() is DONE:
+                    finished += 1
+            write_queue.put(DONE)
+            writer.join()
+        for name, clocks in (("read", read_clocks), ("render", [clock]), ("write", write_clocks)):
+            for stage_clock in clocks:
+                stage_clock.add_to(self.stats[name])
+        # Pages whose write failed have no output to index.
+        failed = set(from_path for from_path, _ in failures)
+        return [metadata for metadata in rendered if metadata["source"] not in failed], failures
+
+
+engine = None
+
+
+def configure(readers=DEFAULT_READERS, queue_size=DEFAULT_QUEUE_SIZE, write_batch=WRITE_BATCH):
+    global engine
+    engine = Pipeline(readers, queue_size, write_batch)
+    return engine
+
+
+def disable():
+    global engine
+    engine = None
+
+
+def current_config():
+    return engine.config() if engine is not None else None
+
+
+def print_stats(stats):
+    for name in STAGES:
+        stage = stats[name]
+        print(f"Pipeline {name}: {stage['pages']} pages, {stage['work']:.3f}s working, {stage['wait']:.3f}s waiting")
@@ -0,0 +1,168 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Instrumented code calls stage(name) and page(path); while profiling is off
+# both hand back one shared no-op context manager, so the cost is a global
+# lookup and an empty with-block per call site.
+profiler = None
+_NULL = nullcontext()
+
+
+class Profiler():
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.pages = []
+        self.frames = []
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def enter(self, name):
+        parent = self.frames[-1] if self.frames else None
+        current, peak = tracemalloc.get_traced_memory() if self.trace_memory else (0, 0)
+        if parent is not None:
+            parent["peak"] = max(parent["peak"], peak)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        path = name if parent is None or parent["name"] is None else f"{parent['path']}/{name}"
+        self.frames.append({
+            "name": name,
+            "path": path,
+            "stages": parent["stages"] if parent is not None else {},
+            "start": time.perf_counter_ns(),
+            "memory": current,
+            "blocks": sys.getallocatedblocks(),
+            "peak": current,
+        })
+
+    def exit(self):
+        frame = self.frames.pop()
+        elapsed = time.perf_counter_ns() - frame["start"]
+        blocks = sys.getallocatedblocks() - frame["blocks"]
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        else:
+            current, peak = 0, 0
+        frame["peak"] = max(frame["peak"], peak)
+        if self.frames:
+            self.frames[-1]["peak"] = max(self.frames[-1]["peak"], frame["peak"])
+        record = {
+            "wall_ns": elapsed,
+            "net_bytes": current - frame["memory"],
+            "peak_bytes": frame["peak"] - frame["memory"],
+            "net_blocks": blocks,
+        }
+        return frame, record
+
+    def page(self, path):
+        return ProfileScope(self, None, path)
+
+    def stage(self, name):
+        return ProfileScope(self, name, None)
+
+    def add_page(self, record):
+        self.pages.append(record)
+
+    def add_pages(self, records):
+        self.pages.extend(records)
+
+    def stage_totals(self):
+        totals = {}
+        for page_record in self.pages:
+            for name, stage_record in page_record["stages"].items():
+                total = totals.setdefault(name, {"wall_ns": 0, "net_bytes": 0, "peak_bytes": 0, "net_blocks": 0, "calls": 0})
+                total["wall_ns"] += stage_record["wall_ns"]
+                total["net_bytes"] += stage_record["net_bytes"]
+                total["net_blocks"] += stage_record["net_blocks"]
+                total["peak_bytes"] = max(total["peak_bytes"], stage_record["peak_bytes"])
+                total["calls"] += stage_record["calls"]
+        return totals
+
+    def report(self):
+        return {"pages": self.pages, "stages": self.stage_totals()}
+
+
+class ProfileScope():
+    __slots__ = ("profiler", "name", "page_path")
+
+    def __init__(self, profiler, name, page_path):
+        self.profiler = profiler
+        self.name = name
+        self.page_path = page_path
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        frame, record = self.profiler.exit()
+        if self.page_path is not None:
+            record["path"] = self.page_path
+            record["stages"] = frame["stages"]
+            self.profiler.add_page(record)
+            return False
+        stages = frame["stages"]
+        previous = stages.get(frame["path"])
+        if previous is None:
+            record["calls"] = 1
+            stages[frame["path"]] = record
+        else:
+            previous["wall_ns"] += record["wall_ns"]
+            previous["net_bytes"] += record["net_bytes"]
+            previous["net_blocks"] += record["net_blocks"]
+            previous["peak_bytes"] = max(previous["peak_bytes"], record["peak_bytes"])
+            previous["calls"] += 1
+        return False
+
+
+def stage(name):
+    if profiler is None:
+        return _NULL
+    return profiler.stage(name)
+
+
+def page(path):
+    if profiler is None:
+        return _NULL
+    return profiler.page(path)
+
+
+def enable_profiling(trace_memory=True):
+    global profiler
+    profiler = Profiler(trace_memory)
+    profiler.start()
+    return profiler
+
+
+def disable_profiling():
+    global profiler
+    if profiler is not None:
+        profiler.stop()
+    profiler = None
+
+
+def print_summary(report, top=10, file=sys.stdout):
+    pages = sorted(report["pages"], key=lambda record: record["wall_ns"], reverse=True)
+    print(f"Slowest {min(top, len(pages))} of {len(pages)} pages:", file=file)
+    for record in pages[:top]:
+        print(f"  {record['wall_ns'] / 1e6:9.2f} ms  {record['peak_bytes'] / 1024:9.1f} KiB peak  {record['path']}", file=file)
+    total = sum(record["wall_ns"] for record in pages) or 1
+    stages = sorted(report["stages"].items(), key=lambda item: item[1]["wall_ns"], reverse=True)
+    print("Stages:", file=file)
+    for name, record in stages:
+        share = record["wall_ns"] / total * 100
+        print(f"  {record['wall_ns'] / 1e6:9.2f} ms {share:5.1f}%  {record['net_blocks']:>9} blocks  {record['peak_bytes'] / 1024:9.1f} KiB peak  {name}", file=file)
+
+
+def write_report(report, path):
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=1)
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+from collections import Counter
+from site_index import node_text
+
+SEARCH_DIR = "search"
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+SHARD_PREFIX = 2
+MIN_TERM = 2
+MAX_TERM = 32
+TERM = re.compile(r"\w+")
+SHARD_NAME = re.compile(r"^[a-z0-9]+$")
+
+recording = False
+
+
+def configure():
+    global recording
+    recording = True
+
+
+def disable():
+    global recording
+    recording = False
+
+
+def current_config():
+    return recording
+
+
+def tokenize(text):
+    for match in TERM.finditer(text.lower()):
+        term = match.group()
+        if MIN_TERM <= len(term) <= MAX_TERM:
+            yield term
+
+
+def page_terms(nodes):
+    # {term: count} over the text leaves of the page, which carry the text
+    # of the inline TextNodes the blocks were built from.
+    counts = Counter()
+    for node in nodes:
+        counts.update(tokenize(node_text(node)))
+    return dict(counts)
+
+
+class TermRecorder():
+    # page_terms for a streamed page, counted as its blocks go by.
+    def __init__(self):
+        self.counts = Counter()
+
+    def watch(self, nodes):
+        for node in nodes:
+            self.counts.update(tokenize(node_text(node)))
+            yield node
+
+    def terms(self):
+        return dict(self.counts)
+
+
+def has_terms(metadata):
+    return metadata.get("terms") is not None
+
+
+def shard_of(term, prefix=SHARD_PREFIX):
+    # Terms whose prefix isn't plain ASCII letters and digits share the "_"
+    # shard, so shard names are always safe file names.
+    name = term[:prefix]
+    return name if SHARD_NAME.match(name) else "_"
+
+
+def load_index(search_path):
+    try:
+        with open(os.path.join(search_path, INDEX_NAME)) as index_file:
+            data = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION:
+        return None
+    return data
+
+
+def assign_ids(previous, urls):
+    # Pages keep the document ids of the previous index, so a page edit
+    # only changes the shards of the terms it gained or lost; new pages fill
+    # the ids freed by removed ones before the table grows.
+    ids = {}
+    slots = []
+    if previous is not None:
+        for doc_id, page in enumerate(previous["pages"]):
+            if page is not None and page[0] in urls:
+                ids[page[0]] = doc_id
+        slots = [None] * len(previous["pages"])
+    for url in ids:
+        slots[ids[url]] = url
+    free = iter([doc_id for doc_id, url in enumerate(slots) if url is None])
+    for url in urls:
+        if url not in ids:
+            doc_id = next(free, None)
+            if doc_id is None:
+                doc_id = len(slots)
+                slots.append(None)
+            ids[url] = doc_id
+            slots[doc_id] = url
+    return ids
+
+
+def encode_postings(postings):
+    # [gap, count, gap, count, ...] where gap is the distance from the
+    # previous document id.
+    encoded = []
+    last = 0
+    for doc_id, count in sorted(postings):
+        encoded.append(doc_id - last)
+        encoded.append(count)
+        last = doc_id
+    return encoded
+
+
+def decode_postings(encoded):
+    postings = []
+    doc_id = 0
+    for i in range(0, len(encoded), 2):
+        doc_id += encoded[i]
+        postings.append((doc_id, encoded[i + 1]))
+    return postings
+
+
+def write_if_changed(path, text):
+    try:
+        with open(path) as current:
+            if current.read() == text:
+                return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as output:
+        output.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_search_index(index, dest_dir_path, urls, prefix=SHARD_PREFIX):
+    # search/index.json lists the documents ([url, title], by id) and the
+    # shards; search/<prefix>.json maps each term starting with prefix to
+    # its delta-encoded postings. A client fetches index.json once and then
+    # only the shards of the query's terms. Shards whose bytes didn't change
+    # are left alone.
+    search_path = os.path.join(dest_dir_path, SEARCH_DIR)
+    os.makedirs(search_path, exist_ok=True)
+    pages = {}
+    for url, metadata in index.entries():
+        if not has_terms(metadata):
+            raise ValueError(f"{metadata['source']} was rendered without search terms")
+        pages[urls.rewrite(url)] = metadata
+    previous = load_index(search_path)
+    if previous is not None and previous.get("prefix") != prefix:
+        previous = None
+    ids = assign_ids(previous, pages)
+    shards = {}
+    for url, metadata in pages.items():
+        for term, count in metadata["terms"].items():
+            shards.setdefault(shard_of(term, prefix), {}).setdefault(term, []).append((ids[url], count))
+    table = [None] * (max(ids.values()) + 1 if ids else 0)
+    for url, doc_id in ids.items():
+        table[doc_id] = [url, pages[url]["title"]]
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+    for name, terms in shards.items():
+        shard = {term: encode_postings(postings) for term, postings in terms.items()}
+        if write_if_changed(os.path.join(search_path, f"{name}.json"), json.dumps(shard, sort_keys=True, separators=(",", ":"))):
+            stats["written"] += 1
+        else:
+            stats["unchanged"] += 1
+    for name in os.listdir(search_path):
+        if name != INDEX_NAME and name.endswith(".json") and name[:-5] not in shards:
+            os.remove(os.path.join(search_path, name))
+            stats["removed"] += 1
+    manifest = {"version": INDEX_VERSION, "prefix": prefix, "shards": sorted(shards), "pages": table}
+    write_if_changed(os.path.join(search_path, INDEX_NAME), json.dumps(manifest, separators=(",", ":")))
+    return stats
@@ -0,0 +1,65 @@
+import io
+
+BUFFER_SIZE = 1 << 16
+
+
+def iter_html(node):
+    # Depth-first walk with an explicit stack of child iterators, so deeply
+    # nested quotes and lists never touch the interpreter recursion limit.
+    stack = [(iter((node,)), None)]
+    while stack:
+        children, closing = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if closing:
+                yield closing
+            continue
+        opening, grandchildren, child_closing = child.html_parts()
+        if grandchildren is None:
+            yield opening + child_closing
+            continue
+        yield opening
+        stack.append((iter(grandchildren), child_closing))
+
+
+def sink_writer(sink, encoding="utf-8"):
+    if isinstance(sink, io.TextIOBase):
+        return sink.write
+    write = getattr(sink, "write", None)
+    if write is None:
+        # Sockets expose sendall rather than write and only take bytes.
+        send = sink.sendall
+        return lambda chunk: send(chunk.encode(encoding))
+    if isinstance(sink, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(sink, "mode", ""):
+        return lambda chunk: write(chunk.encode(encoding))
+    return write
+
+
+class BufferedWriter():
+    # Joins the many small chunks of a page into writes of about BUFFER_SIZE
+    # characters before they reach the sink.
+    def __init__(self, write, buffer_size=BUFFER_SIZE):
+        self.sink_write = write
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.size = 0
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.sink_write("".join(self.chunks))
+            self.chunks = []
+            self.size = 0
+
+
+def write_html(node, sink, encoding="utf-8"):
+    writer = BufferedWriter(sink_writer(sink, encoding))
+    for chunk in iter_html(node):
+        writer.write(chunk)
+    writer.flush()
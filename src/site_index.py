@@ -0,0 +1,95 @@
+import os
+from transformers import block_tree
+
+
+def node_text(node):
+    # Concatenated leaf text, in document order.
+    parts = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        node = block_tree(node)
+        if node.children:
+            stack.extend(reversed(node.children))
+        elif node.value and node.tag != "img":
+            parts.append(node.value)
+    return "".join(parts)
+
+
+def paragraph_text(node):
+    # Paragraphs made only of links or images (navigation, figures) are
+    # not summaries.
+    node = block_tree(node)
+    if node.tag != "p" or not node.children:
+        return ""
+    if not any(child.tag is None and child.value.strip() for child in node.children):
+        return ""
+    return " ".join(node_text(node).split())
+
+
+def summary_of(children):
+    for child in children:
+        summary = paragraph_text(child)
+        if summary:
+            return summary
+    return ""
+
+
+class SummaryRecorder():
+    # Picks the first paragraph out of a streamed page as its blocks go by,
+    # so pages rendered from a file iterator still get a summary.
+    def __init__(self):
+        self.summary = ""
+
+    def watch(self, nodes):
+        for node in nodes:
+            if not self.summary:
+                self.summary = paragraph_text(node)
+            yield node
+
+
+def page_metadata(from_path, dest_path, title, summary, mtime_ns, date=None, terms=None, links=None, references=()):
+    # references are the source URLs of the page's links and images, which
+    # tie the page's output to the URL rewriter; see UrlRewriter.references_key.
+    return {
+        "source": from_path, "output": dest_path, "title": title, "summary": summary, "mtime": mtime_ns, "date": date,
+        "terms": terms, "links": links, "references": list(dict.fromkeys(tuple(reference) for reference in references)),
+    }
+
+
+def output_url(dest_path, dest_dir_path):
+    relative = os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    if relative == "index.html":
+        return "/"
+    if relative.endswith("/index.html"):
+        return "/" + relative[:-len("index.html")]
+    return "/" + relative
+
+
+class SiteIndex():
+    # Metadata for every page of a build, collected while the pages render
+    # (or taken from the manifest for pages an incremental build skipped),
+    # so sitemaps, feeds and listings never re-read the sources.
+    def __init__(self, dest_dir_path):
+        self.dest_dir_path = dest_dir_path
+        self.pages = {}
+
+    def add(self, metadata):
+        self.pages[metadata["source"]] = metadata
+
+    def url_of(self, metadata):
+        return output_url(metadata["output"], self.dest_dir_path)
+
+    def entries(self):
+        # (url, metadata) for every page, in URL order.
+        return sorted(((self.url_of(metadata), metadata) for metadata in self.pages.values()), key=lambda entry: entry[0])
+
+    def section(self, section_url):
+        # The pages below section_url, newest first: by front matter date,
+        # then by modification time.
+        entries = [(url, metadata) for url, metadata in self.entries() if url.startswith(section_url) and url != section_url]
+        entries.sort(key=lambda entry: (entry[1].get("date") or "", entry[1]["mtime"]), reverse=True)
+        return entries
+
+    def outputs(self):
+        return set(metadata["output"] for metadata in self.pages.values())
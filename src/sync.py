@@ -0,0 +1,121 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_file, file_signature, remove_output, load_json_manifest, save_json_manifest
+
+SYNC_MANIFEST_NAME = ".static-manifest.json"
+COPY_CHUNK = 1 << 30
+PARALLEL_THRESHOLD = 8
+
+
+def list_files(src_path):
+    files = []
+    for root, dirs, names in os.walk(src_path):
+        dirs.sort()
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            files.append(os.path.relpath(full_path, src_path))
+    return files
+
+
+def kernel_copy(src_file, dst_file, size):
+    # copy_file_range keeps the data inside the kernel (and can reflink on
+    # filesystems that support it); sendfile is the older fallback.
+    copy_file_range = getattr(os, "copy_file_range", None)
+    offset = 0
+    if copy_file_range is not None:
+        try:
+            while offset < size:
+                copied = copy_file_range(src_file.fileno(), dst_file.fileno(), min(COPY_CHUNK, size - offset))
+                if copied == 0:
+                    break
+                offset += copied
+            return offset == size
+        except OSError:
+            if offset:
+                return False
+    try:
+        while offset < size:
+            copied = os.sendfile(dst_file.fileno(), src_file.fileno(), offset, min(COPY_CHUNK, size - offset))
+            if copied == 0:
+                break
+            offset += copied
+        return offset == size
+    except (OSError, AttributeError):
+        return False
+
+
+def copy_file(src_file_path, dst_file_path, hardlink=False):
+    os.makedirs(os.path.dirname(dst_file_path), exist_ok=True)
+    tmp_path = f"{dst_file_path}.tmp"
+    if hardlink:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            os.link(src_file_path, tmp_path)
+            os.replace(tmp_path, dst_file_path)
+            return
+        except OSError:
+            pass
+    size = os.path.getsize(src_file_path)
+    with open(src_file_path, "rb") as src_file, open(tmp_path, "wb") as dst_file:
+        copied = kernel_copy(src_file, dst_file, size)
+    if not copied:
+        shutil.copyfile(src_file_path, tmp_path)
+    shutil.copystat(src_file_path, tmp_path)
+    os.replace(tmp_path, dst_file_path)
+
+
+def needs_copy(src_file_path, dst_file_path, previous, signature, checksum):
+    if not os.path.exists(dst_file_path):
+        return True, None
+    dst_signature = file_signature(dst_file_path)
+    if dst_signature == signature:
+        return False, previous.get("hash") if previous else None
+    if not checksum or dst_signature[0] != signature[0]:
+        return True, None
+    src_hash = hash_file(src_file_path)
+    if previous and previous.get("signature") == dst_signature and previous.get("hash"):
+        dst_hash = previous["hash"]
+    else:
+        dst_hash = hash_file(dst_file_path)
+    if src_hash == dst_hash:
+        # Same bytes, only the mtime drifted: bring it back in line so the
+        # next build takes the stat-only path.
+        shutil.copystat(src_file_path, dst_file_path)
+        return False, src_hash
+    return True, src_hash
+
+
+def sync_tree(src_path, dst_path, checksum=False, hardlink=False, workers=None):
+    if not os.path.isdir(src_path):
+        raise ValueError("Source path doesn't exists or isn't a directory")
+    os.makedirs(dst_path, exist_ok=True)
+    previous_files = load_json_manifest(dst_path, SYNC_MANIFEST_NAME)
+    files = {}
+    pending = []
+    stats = {"copied": 0, "skipped": 0, "removed": 0}
+    for relative_path in list_files(src_path):
+        src_file_path = os.path.join(src_path, relative_path)
+        dst_file_path = os.path.join(dst_path, relative_path)
+        signature = file_signature(src_file_path)
+        copy, file_hash = needs_copy(src_file_path, dst_file_path, previous_files.get(relative_path), signature, checksum)
+        files[relative_path] = {"signature": signature, "hash": file_hash}
+        if copy:
+            pending.append((src_file_path, dst_file_path))
+        else:
+            stats["skipped"] += 1
+    if len(pending) >= PARALLEL_THRESHOLD and workers != 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda paths: copy_file(paths[0], paths[1], hardlink), pending))
+    else:
+        for src_file_path, dst_file_path in pending:
+            copy_file(src_file_path, dst_file_path, hardlink)
+    stats["copied"] = len(pending)
+    for relative_path in previous_files:
+        if relative_path in files:
+            continue
+        remove_output(os.path.join(dst_path, relative_path), dst_path)
+        stats["removed"] += 1
+    save_json_manifest(dst_path, SYNC_MANIFEST_NAME, files)
+    return stats
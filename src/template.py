@@ -0,0 +1,292 @@
+import os
+import re
+from serializer import iter_html
+from urls import html_references, url_rewriter
+
+TOKEN_PATTERN = re.compile(r"{{\s*(.*?)\s*}}|{%\s*(.*?)\s*%}", re.DOTALL)
+
+
+class TemplateSyntaxError(ValueError):
+    pass
+
+
+def lookup(context, name):
+    parts = name.split(".")
+    value = context.get(parts[0])
+    for part in parts[1:]:
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+    return value
+
+
+def truthy(context, expression):
+    if expression.startswith("not "):
+        return not lookup(context, expression[4:].strip())
+    return bool(lookup(context, expression))
+
+
+class Template():
+    def __init__(self, ops, dependencies, basepath, references=()):
+        self.ops = ops
+        self.dependencies = dependencies
+        self.basepath = basepath
+        # Source URLs in the static markup, before rewriting.
+        self.references = references
+
+    def render_to(self, write, context):
+        self._render_ops(self.ops, write, context)
+
+    def render(self, context):
+        chunks = []
+        self.render_to(chunks.append, context)
+        return "".join(chunks)
+
+    def _render_ops(self, ops, write, context):
+        for op in ops:
+            if op.__class__ is str:
+                write(op)
+                continue
+            kind = op[0]
+            if kind == "var":
+                value = lookup(context, op[1])
+                if value is None:
+                    continue
+                # Slot values are written as-is: node trees carry URLs that
+                # were already rewritten when their link and image nodes
+                # were built.
+                if hasattr(value, "html_parts"):
+                    for chunk in iter_html(value):
+                        write(chunk)
+                else:
+                    write(str(value))
+            elif kind == "if":
+                for expression, body in op[1]:
+                    if expression is None or truthy(context, expression):
+                        self._render_ops(body, write, context)
+                        break
+            elif kind == "for":
+                items = list(lookup(context, op[2]) or ())
+                scope = dict(context)
+                for index, item in enumerate(items):
+                    scope[op[1]] = item
+                    scope["loop"] = {"index": index + 1, "first": index == 0, "last": index == len(items) - 1}
+                    self._render_ops(op[3], write, scope)
+            elif kind == "block":
+                self._render_ops(op[2], write, context)
+
+    def __repr__(self):
+        return f"Template(dependencies={self.dependencies}, basepath={self.basepath})"
+
+
+def tokenize(source):
+    position = 0
+    for match in TOKEN_PATTERN.finditer(source):
+        if match.start() > position:
+            yield ("text", source[position:match.start()], position)
+        if match.group(1) is not None:
+            yield ("var", match.group(1), match.start())
+        else:
+            yield ("tag", match.group(2), match.start())
+        position = match.end()
+    if position < len(source):
+        yield ("text", source[position:], position)
+
+
+def parse(source, path):
+    # Returns the op tree plus the parent template named by {% extends %}.
+    # {% include %} leaves an op that load_ops replaces with the partial.
+    root = []
+    stack = [("root", root, None)]
+    parent = None
+    for kind, value, position in tokenize(source):
+        body = stack[-1][1]
+        if kind == "text":
+            body.append(value)
+            continue
+        if kind == "var":
+            body.append(("var", value))
+            continue
+        words = value.split(None, 1)
+        if not words:
+            raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: empty tag")
+        keyword = words[0]
+        argument = words[1].strip() if len(words) > 1 else ""
+        if keyword == "extends":
+            parent = argument.strip("\"'")
+        elif keyword == "include":
+            if not argument:
+                raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: include needs a template name")
+            body.append(("include", argument.strip("\"'")))
+        elif keyword == "if":
+            branches = [(argument, [])]
+            body.append(("if", branches))
+            stack.append(("if", branches[0][1], branches))
+        elif keyword in ("elif", "else"):
+            if stack[-1][0] != "if":
+                raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: {keyword} outside of if")
+            branches = stack[-1][2]
+            branches.append((argument if keyword == "elif" else None, []))
+            stack[-1] = ("if", branches[-1][1], branches)
+        elif keyword == "for":
+            match = re.match(r"^(\w+)\s+in\s+(\S+)$", argument)
+            if match is None:
+                raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: invalid for loop '{argument}'")
+            loop_body = []
+            body.append(("for", match.group(1), match.group(2), loop_body))
+            stack.append(("for", loop_body, None))
+        elif keyword == "block":
+            block_body = []
+            body.append(("block", argument, block_body))
+            stack.append(("block", block_body, argument))
+        elif keyword in ("endif", "endfor", "endblock"):
+            if stack[-1][0] != keyword[3:]:
+                raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: unexpected {keyword}")
+            stack.pop()
+        else:
+            raise TemplateSyntaxError(f"{path}:{line_of(source, position)}: unknown tag '{keyword}'")
+    if len(stack) > 1:
+        raise TemplateSyntaxError(f"{path}: unclosed {stack[-1][0]}")
+    return root, parent
+
+
+def line_of(source, position):
+    return source.count("\n", 0, position) + 1
+
+
+def collect_blocks(ops, blocks):
+    for op in ops:
+        if op.__class__ is str:
+            continue
+        if op[0] == "block":
+            blocks.setdefault(op[1], op[2])
+            collect_blocks(op[2], blocks)
+        elif op[0] == "if":
+            for _, body in op[1]:
+                collect_blocks(body, blocks)
+        elif op[0] == "for":
+            collect_blocks(op[3], blocks)
+    return blocks
+
+
+def apply_blocks(ops, blocks):
+    resolved = []
+    for op in ops:
+        if op.__class__ is str:
+            resolved.append(op)
+        elif op[0] == "block":
+            resolved.append(("block", op[1], apply_blocks(blocks.get(op[1], op[2]), blocks)))
+        elif op[0] == "if":
+            resolved.append(("if", [(expression, apply_blocks(body, blocks)) for expression, body in op[1]]))
+        elif op[0] == "for":
+            resolved.append(("for", op[1], op[2], apply_blocks(op[3], blocks)))
+        else:
+            resolved.append(op)
+    return resolved
+
+
+def optimize(ops, urls, references=None):
+    # Merge adjacent static chunks and rewrite their URLs once, at
+    # compile time, so rendering never rescans template markup. The source
+    # URLs are appended to references when given.
+    optimized = []
+    for op in ops:
+        if op.__class__ is str:
+            if optimized and optimized[-1].__class__ is str:
+                optimized[-1] += op
+            else:
+                optimized.append(op)
+        elif op[0] == "if":
+            optimized.append(("if", [(expression, optimize(body, urls, references)) for expression, body in op[1]]))
+        elif op[0] == "for":
+            optimized.append(("for", op[1], op[2], optimize(op[3], urls, references)))
+        elif op[0] == "block":
+            optimized.append(("block", op[1], optimize(op[2], urls, references)))
+        else:
+            optimized.append(op)
+    if references is not None:
+        for op in optimized:
+            if op.__class__ is str:
+                references.extend(html_references(op))
+    return [urls.rewrite_html(op) if op.__class__ is str else op for op in optimized]
+
+
+def expand_includes(ops, template_path, dependencies, including):
+    # Partials are inlined at compile time, relative to the template that
+    # includes them, and recorded as dependencies of the compiled template.
+    expanded = []
+    for op in ops:
+        if op.__class__ is str:
+            expanded.append(op)
+        elif op[0] == "include":
+            expanded.extend(load_partial(os.path.join(os.path.dirname(template_path), op[1]), dependencies, including))
+        elif op[0] == "if":
+            expanded.append(("if", [(expression, expand_includes(body, template_path, dependencies, including)) for expression, body in op[1]]))
+        elif op[0] == "for":
+            expanded.append(("for", op[1], op[2], expand_includes(op[3], template_path, dependencies, including)))
+        elif op[0] == "block":
+            expanded.append(("block", op[1], expand_includes(op[2], template_path, dependencies, including)))
+        else:
+            expanded.append(op)
+    return expanded
+
+
+def load_partial(partial_path, dependencies, including):
+    if partial_path in including:
+        raise TemplateSyntaxError(f"{partial_path}: circular include")
+    if partial_path not in dependencies:
+        dependencies.append(partial_path)
+    with open(partial_path, "r") as partial_file:
+        source = partial_file.read()
+    ops, parent = parse(source, partial_path)
+    if parent is not None:
+        raise TemplateSyntaxError(f"{partial_path}: an included template can't use extends")
+    return expand_includes(ops, partial_path, dependencies, including + [partial_path])
+
+
+def load_ops(template_path, dependencies, blocks=None):
+    if template_path in dependencies:
+        raise TemplateSyntaxError(f"{template_path}: circular template inheritance")
+    dependencies.append(template_path)
+    with open(template_path, "r") as template_file:
+        source = template_file.read()
+    ops, parent = parse(source, template_path)
+    ops = expand_includes(ops, template_path, dependencies, [template_path])
+    child_blocks = collect_blocks(ops, {})
+    if blocks is not None:
+        child_blocks.update(blocks)
+    if parent is None:
+        return apply_blocks(ops, child_blocks)
+    parent_path = os.path.join(os.path.dirname(template_path), parent)
+    return load_ops(parent_path, dependencies, child_blocks)
+
+
+def compile_template(template_path, basepath='/', urls=None):
+    if urls is None:
+        urls = url_rewriter(basepath)
+    dependencies = []
+    ops = load_ops(template_path, dependencies)
+    references = []
+    ops = optimize(ops, urls, references)
+    return Template(ops, dependencies, basepath, tuple(references))
+
+
+_template_cache = {}
+
+
+def load_template(template_path, basepath='/', urls=None):
+    if urls is None:
+        urls = url_rewriter(basepath)
+    key = (os.path.abspath(template_path), urls.key)
+    template = _template_cache.get(key)
+    if template is None:
+        template = compile_template(template_path, basepath, urls)
+        _template_cache[key] = template
+    return template
+
+
+def clear_template_cache():
+    _template_cache.clear()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from assets import fingerprint_assets, hashed_name, immutable_headers, ASSET_MANIFEST_NAME
+from sync import sync_tree
+from urls import UrlRewriter
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.cache = os.path.join(self.tmp.name, ".cache")
+        os.makedirs(os.path.join(self.src, "images"))
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png-bytes")
+        sync_tree(self.src, self.dst)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_hashed_name(self):
+        self.assertEqual(hashed_name("images/a.png", "0123456789abcdef"), "images/a.0123456789.png")
+
+    def test_publishes_hashed_copies(self):
+        assets, stats = fingerprint_assets(self.src, self.dst, self.cache)
+        self.assertEqual(stats, {"hashed": 2, "reused": 0, "removed": 0})
+        published = assets["/images/a.png"]
+        self.assertRegex(published, r"^/images/a\.[0-9a-f]{10}\.png$")
+        self.assertEqual(self.read(os.path.join(self.dst, published[1:])), "png-bytes")
+        self.assertTrue(os.path.isfile(os.path.join(self.cache, ASSET_MANIFEST_NAME)))
+
+    def test_unchanged_files_reuse_hashes(self):
+        first, _ = fingerprint_assets(self.src, self.dst, self.cache)
+        second, stats = fingerprint_assets(self.src, self.dst, self.cache)
+        self.assertEqual(first, second)
+        self.assertEqual(stats, {"hashed": 0, "reused": 2, "removed": 0})
+
+    def test_hashes_survive_a_wiped_output_folder(self):
+        first, _ = fingerprint_assets(self.src, self.dst, self.cache)
+        shutil.rmtree(self.dst)
+        sync_tree(self.src, self.dst)
+        second, stats = fingerprint_assets(self.src, self.dst, self.cache)
+        self.assertEqual(first, second)
+        self.assertEqual(stats, {"hashed": 0, "reused": 2, "removed": 0})
+        self.assertEqual(self.read(os.path.join(self.dst, second["/images/a.png"][1:])), "png-bytes")
+
+    def test_changed_file_replaces_old_hash(self):
+        first, _ = fingerprint_assets(self.src, self.dst, self.cache)
+        self.write(os.path.join(self.src, "index.css"), "body { color: red }")
+        sync_tree(self.src, self.dst)
+        second, stats = fingerprint_assets(self.src, self.dst, self.cache)
+        self.assertNotEqual(first["/index.css"], second["/index.css"])
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, first["/index.css"][1:])))
+        self.assertEqual(self.read(os.path.join(self.dst, second["/index.css"][1:])), "body { color: red }")
+
+    def test_rewriter_uses_hashed_names(self):
+        assets, _ = fingerprint_assets(self.src, self.dst, self.cache)
+        urls = UrlRewriter("/site/", assets)
+        self.assertEqual(urls.rewrite("/images/a.png?v=1"), "/site" + assets["/images/a.png"] + "?v=1")
+        self.assertEqual(urls.rewrite("/blog/"), "/site/blog/")
+        self.assertNotEqual(urls.key, UrlRewriter("/site/").key)
+
+    def test_immutable_headers(self):
+        headers = immutable_headers({"/a.css": "/a.0123456789.css"}, "/site/")
+        self.assertEqual(headers, "/site/a.0123456789.css\n  Cache-Control: public, max-age=31536000, immutable\n")
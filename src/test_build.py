@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from build import BuildError, batch_pages, generate_pages_parallel
+from utils import generate_pages_recursive
+
+TEMPLATE = '<title>{{ Title }}</title><a href="/">home</a>{{ Content }}'
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as f:
+            f.write(TEMPLATE)
+        for i in range(6):
+            page_dir = os.path.join(self.content, "posts", f"post{i}")
+            os.makedirs(page_dir)
+            with open(os.path.join(page_dir, "index.md"), "w") as f:
+                f.write(f"# Post {i}\n\nSome **bold** text and a [link](/posts/post{i})")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, dest):
+        files = {}
+        for root, _, names in os.walk(dest):
+            for name in names:
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, dest)] = f.read()
+        return files
+
+    def test_batch_pages_covers_every_page(self):
+        pages = [(f"{i}.md", f"{i}.html") for i in range(10)]
+        batches = batch_pages(pages, 2)
+        self.assertEqual(len(batches), 5)
+        self.assertEqual([page for batch in batches for page in batch], pages)
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/base/")
+        self.assertEqual(generate_pages_parallel(self.content, self.template, parallel, "/base/", 3), 6)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_serial_build_leaves_no_empty_folders(self):
+        for name, front_matter in (("draft", "draft: true"), ("moved", "slug: elsewhere")):
+            os.makedirs(os.path.join(self.content, name))
+            with open(os.path.join(self.content, name, "index.md"), "w") as f:
+                f.write(f"---\n{front_matter}\n---\n# {name}\n\ntext")
+        dest = os.path.join(self.root, "serial")
+        generate_pages_recursive(self.content, self.template, dest, "/")
+        self.assertFalse(os.path.exists(os.path.join(dest, "draft")))
+        self.assertFalse(os.path.exists(os.path.join(dest, "moved")))
+        self.assertTrue(os.path.isfile(os.path.join(dest, "elsewhere", "index.html")))
+
+    def test_parallel_reports_failing_pages(self):
+        bad = os.path.join(self.content, "posts", "post3", "index.md")
+        with open(bad, "w") as f:
+            f.write("no title here")
+        with self.assertRaises(BuildError) as context:
+            generate_pages_parallel(self.content, self.template, os.path.join(self.root, "out"), "/", 2)
+        self.assertEqual(context.exception.failures, [(bad, "ValueError: Markdown doesn't have a valid title")])
+        self.assertIn(bad, str(context.exception))
@@ -0,0 +1,70 @@
+import gzip
+import os
+import tempfile
+import unittest
+import compress
+from compress import precompress_tree, savings_by_type, COMPRESS_MANIFEST_NAME
+
+PAGE = "<html><body>" + "<p>hello compression</p>" * 100 + "</body></html>"
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.cache = os.path.join(self.tmp.name, ".cache")
+        os.makedirs(os.path.join(self.dst, "blog"))
+        self.write("index.html", PAGE)
+        self.write(os.path.join("blog", "post.html"), PAGE)
+        self.write("index.css", "body { color: red }" * 50)
+        self.write("tiny.css", "a{}")
+        self.write("image.png", "png" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(os.path.join(self.dst, relative_path), "w") as f:
+            f.write(text)
+
+    def test_writes_gzip_next_to_compressible_files(self):
+        stats, _ = precompress_tree(self.dst, manifest_dir=self.cache, workers=2)
+        self.assertEqual(stats, {"compressed": 3, "skipped": 0, "removed": 0})
+        with gzip.open(os.path.join(self.dst, "index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), PAGE)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "tiny.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "image.png.gz")))
+        self.assertTrue(os.path.isfile(os.path.join(self.cache, COMPRESS_MANIFEST_NAME)))
+
+    def test_unchanged_files_are_skipped(self):
+        precompress_tree(self.dst, manifest_dir=self.cache)
+        os.utime(os.path.join(self.dst, "index.html"), ns=(0, 0))
+        stats, _ = precompress_tree(self.dst, manifest_dir=self.cache)
+        self.assertEqual(stats, {"compressed": 0, "skipped": 3, "removed": 0})
+
+    def test_manifest_is_not_published(self):
+        precompress_tree(self.dst, manifest_dir=self.cache)
+        self.assertEqual([name for name in os.listdir(self.dst) if name.startswith(".")], [])
+
+    def test_level_change_recompresses(self):
+        precompress_tree(self.dst, manifest_dir=self.cache, gzip_level=9)
+        stats, _ = precompress_tree(self.dst, manifest_dir=self.cache, gzip_level=1)
+        self.assertEqual(stats["compressed"], 3)
+
+    def test_removed_outputs_drop_compressed_files(self):
+        precompress_tree(self.dst, manifest_dir=self.cache)
+        os.remove(os.path.join(self.dst, "blog", "post.html"))
+        stats, _ = precompress_tree(self.dst, manifest_dir=self.cache)
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "blog")))
+
+    def test_savings_by_type(self):
+        _, report = precompress_tree(self.dst, manifest_dir=self.cache)
+        self.assertEqual(report[".html"]["files"], 2)
+        self.assertEqual(report[".html"]["original"], 2 * len(PAGE))
+        self.assertLess(report[".html"]["gzip"], report[".html"]["original"])
+        self.assertEqual(savings_by_type({}), {})
+
+    @unittest.skipIf(compress.brotli is None, "brotli is not installed")
+    def test_writes_brotli(self):
+        precompress_tree(self.dst, manifest_dir=self.cache)
+        self.assertTrue(os.path.isfile(os.path.join(self.dst, "index.html.br")))
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+import css
+from css import (
+    Stylesheet,
+    bundle_stylesheets,
+    critical_rules,
+    empty_used,
+    minify_css,
+    parse_rules,
+    selector_matches,
+    serialize_rules,
+    write_bundle,
+)
+from leafnode import LeafNode
+from parentnode import ParentNode
+from template import Template, parse
+
+STYLES = """
+/* base */
+body {
+    color: #111;
+    font-family: "Open  Sans", serif;
+}
+a:hover, .button > span { color: red; }
+#main pre code { padding: 0; }
+table td { border: 1px solid; }
+@media (max-width: 600px) {
+    p { margin: 0; }
+    table { width: 100%; }
+}
+@font-face { font-family: x; src: url(x.woff); }
+"""
+
+MINIFIED = (
+    'body{color:#111;font-family:"Open  Sans",serif}a:hover,.button>span{color:red}'
+    "#main pre code{padding:0}table td{border:1px solid}"
+    "@media (max-width: 600px){p{margin:0}table{width:100%}}"
+    "@font-face{font-family:x;src:url(x.woff)}"
+)
+
+TEMPLATE = (
+    "<html><head>{% if Styles.critical %}<style>{{ Styles.critical }}</style>"
+    '<link href="{{ Styles.href }}" rel="stylesheet" media="print" />{% elif Styles %}'
+    '<link href="{{ Styles.href }}" rel="stylesheet" />{% else %}<link href="/index.css" rel="stylesheet" />{% endif %}'
+    "</head><body>{{ Content }}</body></html>"
+)
+
+
+def used(tags=(), classes=(), ids=()):
+    selectors = empty_used()
+    selectors["tags"].update(tags)
+    selectors["classes"].update(classes)
+    selectors["ids"].update(ids)
+    return selectors
+
+
+def page(*children):
+    return ParentNode("div", list(children))
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_minify_keeps_strings(self):
+        self.assertEqual(minify_css(STYLES), MINIFIED)
+
+    def test_parse_and_serialize_round_trip(self):
+        rules = parse_rules(MINIFIED)
+        self.assertEqual(rules[0], ("body", 'color:#111;font-family:"Open  Sans",serif'))
+        self.assertEqual(rules[4], ("@media (max-width: 600px)", [("p", "margin:0"), ("table", "width:100%")]))
+        self.assertEqual(serialize_rules(rules), MINIFIED)
+
+    def test_statement_at_rules_and_braces_in_strings(self):
+        text = '@import url(a.css);a::after{content:"}"}'
+        self.assertEqual(parse_rules(text), [("@import url(a.css)", None), ("a::after", 'content:"}"')])
+
+    def test_unbalanced_braces(self):
+        with self.assertRaises(ValueError):
+            parse_rules("a{color:red")
+
+
+class TestCriticalRules(unittest.TestCase):
+    def test_selector_matches(self):
+        selectors = used(tags=["a", "span", "pre", "code"], classes=["button"])
+        self.assertTrue(selector_matches("a:hover", selectors))
+        self.assertTrue(selector_matches(".button>span", selectors))
+        self.assertTrue(selector_matches("a[href^=http]", selectors))
+        self.assertFalse(selector_matches("#main pre code", selectors))
+        self.assertFalse(selector_matches("table td", selectors))
+
+    def test_critical_rules_filters_selectors_and_groups(self):
+        rules = parse_rules(MINIFIED)
+        critical = serialize_rules(critical_rules(rules, used(tags=["body", "p", "a"])))
+        self.assertEqual(
+            critical,
+            'body{color:#111;font-family:"Open  Sans",serif}a:hover{color:red}'
+            "@media (max-width: 600px){p{margin:0}}@font-face{font-family:x;src:url(x.woff)}",
+        )
+
+
+class TestStylesheet(unittest.TestCase):
+    def setUp(self):
+        self.template = Template(parse(TEMPLATE, "template.html")[0], [], "/")
+
+    def tearDown(self):
+        css.disable()
+
+    def test_page_styles_use_template_and_node_selectors(self):
+        stylesheet = Stylesheet(MINIFIED, "/bundle.css")
+        node = page(LeafNode("span", "x"), ParentNode("table", [LeafNode("td", "y")], {"class": "button wide"}))
+        styles = stylesheet.page_styles(self.template, node)
+        self.assertEqual(styles["href"], "/bundle.css")
+        self.assertIn("body{", styles["critical"])
+        self.assertIn(".button>span{", styles["critical"])
+        self.assertIn("table td{", styles["critical"])
+        self.assertNotIn("#main", styles["critical"])
+        self.assertNotIn("p{", styles["critical"])
+
+    def test_pages_with_the_same_selectors_share_a_subset(self):
+        stylesheet = Stylesheet(MINIFIED, "/bundle.css")
+        first = stylesheet.page_styles(self.template, page(LeafNode("p", "one")))
+        second = stylesheet.page_styles(self.template, page(LeafNode("p", "two")))
+        self.assertIs(first["critical"], second["critical"])
+        self.assertEqual(len(stylesheet.subsets), 1)
+
+    def test_without_critical_css(self):
+        stylesheet = Stylesheet(MINIFIED, "/bundle.css", critical=False)
+        self.assertEqual(stylesheet.page_styles(self.template, page()), {"href": "/bundle.css", "critical": None})
+
+    def test_template_renders_inline_styles_or_links(self):
+        content = page(LeafNode("p", "text"))
+        self.assertIsNone(css.page_styles(self.template, content))
+        html = self.template.render({"Content": content})
+        self.assertIn('<link href="/index.css" rel="stylesheet" />', html)
+        css.configure(MINIFIED, "/bundle.css")
+        html = self.template.render({"Content": content, "Styles": css.page_styles(self.template, content)})
+        self.assertIn("<style>body{", html)
+        self.assertIn('<link href="/bundle.css" rel="stylesheet" media="print" />', html)
+        css.configure(MINIFIED, "/bundle.css", critical=False)
+        html = self.template.render({"Content": content, "Styles": css.page_styles(self.template, content)})
+        self.assertNotIn("<style>", html)
+        self.assertIn('<link href="/bundle.css" rel="stylesheet" />', html)
+
+    def test_config_key_changes_with_settings(self):
+        self.assertIsNone(css.config_key())
+        key = css.configure(MINIFIED, "/bundle.css").key
+        self.assertNotEqual(key, css.configure(MINIFIED, "/bundle.css", critical=False).key)
+        self.assertEqual(css.current_config(), (MINIFIED, "/bundle.css", False))
+
+
+class TestBundle(unittest.TestCase):
+    def test_bundle_and_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            static_path = os.path.join(tmp, "static")
+            dest_path = os.path.join(tmp, "docs")
+            os.makedirs(os.path.join(static_path, "theme"))
+            os.makedirs(dest_path)
+            with open(os.path.join(static_path, "index.css"), "w") as css_file:
+                css_file.write("body {\n  color: red;\n}\n")
+            with open(os.path.join(static_path, "theme", "dark.css"), "w") as css_file:
+                css_file.write("p { color: white; }")
+            with open(os.path.join(static_path, "notes.txt"), "w") as other_file:
+                other_file.write("p { }")
+            bundle = bundle_stylesheets(static_path)
+            self.assertEqual(bundle, "body{color:red}p{color:white}")
+            self.assertEqual(write_bundle(bundle, dest_path), "/bundle.css")
+            first = write_bundle(bundle, dest_path, fingerprint=True)
+            self.assertRegex(first, r"^/bundle\.[0-9a-f]{10}\.css$")
+            second = write_bundle(bundle + "a{}", dest_path, fingerprint=True)
+            self.assertEqual(sorted(os.listdir(dest_path)), sorted(["bundle.css", second[1:]]))
+            with open(os.path.join(dest_path, second[1:])) as bundle_file:
+                self.assertEqual(bundle_file.read(), bundle + "a{}")
+
+
+if __name__ == "__main__":
+    unittest.main()
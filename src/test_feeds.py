@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from feeds import write_feed, write_listings, write_sitemap, write_tag_pages
+from site_index import SiteIndex, page_metadata
+from page_index import PageIndex
+from template import clear_template_cache
+from urls import UrlRewriter
+
+DAY = 86400 * 10**9
+
+class TestFeeds(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.index = SiteIndex(self.dest)
+        self.index.add(page_metadata("index.md", os.path.join(self.dest, "index.html"), "Home", "Welcome", DAY))
+        for day in range(1, 4):
+            output = os.path.join(self.dest, "blog", f"post{day}", "index.html")
+            self.index.add(page_metadata(f"post{day}.md", output, f"Post {day} & more", f"Summary <{day}>", day * DAY))
+        clear_template_cache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        clear_template_cache()
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, *parts)) as f:
+            return f.read()
+
+    def test_sitemap(self):
+        write_sitemap(self.index, self.dest, "https://example.com/", "/site/")
+        sitemap = self.read("sitemap.xml")
+        self.assertIn("<url><loc>https://example.com/site/</loc><lastmod>1970-01-02</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/site/blog/post3/</loc>", sitemap)
+        self.assertEqual(sitemap.count("<url>"), 4)
+
+    def test_sitemap_includes_generated_pages(self):
+        urls = UrlRewriter("/")
+        generated = write_listings(self.index, self.dest, "blog", self.template, "/", urls, 2)
+        self.assertEqual(generated, [("/blog/", 3 * DAY), ("/blog/page/2/", DAY)])
+        write_sitemap(self.index, self.dest, "https://example.com", "/", generated + [("/tags/", None)])
+        sitemap = self.read("sitemap.xml")
+        self.assertIn("<url><loc>https://example.com/blog/page/2/</loc><lastmod>1970-01-02</lastmod></url>", sitemap)
+        self.assertIn("<url><loc>https://example.com/tags/</loc></url>", sitemap)
+        self.assertEqual(sitemap.count("<url>"), 7)
+
+    def test_feed_lists_section_newest_first(self):
+        path = write_feed(self.index, self.dest, "blog", "https://example.com", "/", size=2)
+        self.assertEqual(path, os.path.join(self.dest, "blog", "feed.xml"))
+        feed = self.read("blog", "feed.xml")
+        self.assertEqual(feed.count("<item>"), 2)
+        self.assertLess(feed.index("Post 3 &amp; more"), feed.index("Post 2 &amp; more"))
+        self.assertIn("<description>Summary &lt;3&gt;</description>", feed)
+        self.assertIn("<pubDate>Sun, 04 Jan 1970 00:00:00 GMT</pubDate>", feed)
+
+    def test_listings_paginate_and_drop_stale_pages(self):
+        urls = UrlRewriter("/site/")
+        self.assertEqual(len(write_listings(self.index, self.dest, "blog", self.template, "/site/", urls, 1)), 3)
+        first = self.read("blog", "index.html")
+        self.assertIn('<a href="/site/blog/post3/">Post 3 & more</a>', first)
+        self.assertIn('<a href="/site/blog/page/2/" rel="next">Older</a>', first)
+        second = self.read("blog", "page", "2", "index.html")
+        self.assertIn("<title>Blog (page 2)</title>", second)
+        self.assertIn('<a href="/site/blog/" rel="prev">Newer</a>', second)
+        self.assertEqual(len(write_listings(self.index, self.dest, "blog", self.template, "/site/", urls, 2)), 2)
+        self.assertEqual(os.listdir(os.path.join(self.dest, "blog", "page")), ["2"])
+
+    def test_listing_moves_aside_for_a_section_index_page(self):
+        self.index.add(page_metadata("blog.md", os.path.join(self.dest, "blog", "index.html"), "Blog", "", 0))
+        write_listings(self.index, self.dest, "blog", self.template, "/", UrlRewriter("/"), 10)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "index.html")))
+        self.assertIn("Post 1 &", self.read("blog", "page", "1", "index.html"))
+
+    def test_tag_pages_list_rendered_pages_per_tag(self):
+        content = os.path.join(self.tmp.name, "content")
+        os.makedirs(content)
+        for day, tags in ((1, "[python, web]"), (2, "[python]"), (3, "[Old News]")):
+            with open(os.path.join(content, f"post{day}.md"), "w") as f:
+                f.write(f"---\ntags: {tags}\n---\n# Post {day}\n")
+        pages = PageIndex(":memory:")
+        pages.refresh(content)
+        # Post 3 was not rendered, so its tag gets no page.
+        index = SiteIndex(self.dest)
+        for day in (1, 2):
+            index.add(dict(self.index.pages[f"post{day}.md"], source=os.path.join(content, f"post{day}.md")))
+        os.makedirs(os.path.join(self.dest, "tags", "stale"))
+        written = write_tag_pages(index, pages, self.dest, self.template, "/", UrlRewriter("/"))
+        self.assertEqual([url for url, _ in written], ["/tags/python/", "/tags/web/", "/tags/"])
+        self.assertIn('<a href="/tags/python/">python</a> (2)', self.read("tags", "index.html"))
+        self.assertIn("Post 2 &", self.read("tags", "python", "index.html"))
+        self.assertIn("Post 1 &", self.read("tags", "web", "index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "tags", "old-news")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "tags", "stale")))
+        pages.close()
+
+    def test_colliding_tag_slugs_get_numbered(self):
+        content = os.path.join(self.tmp.name, "content")
+        os.makedirs(content)
+        for day, tags in ((1, "[C++]"), (2, "[C]")):
+            with open(os.path.join(content, f"post{day}.md"), "w") as f:
+                f.write(f"---\ntags: {tags}\n---\n# Post {day}\n")
+        pages = PageIndex(":memory:")
+        pages.refresh(content)
+        index = SiteIndex(self.dest)
+        for day in (1, 2):
+            index.add(dict(self.index.pages[f"post{day}.md"], source=os.path.join(content, f"post{day}.md")))
+        written = write_tag_pages(index, pages, self.dest, self.template, "/", UrlRewriter("/"))
+        self.assertEqual([url for url, _ in written], ["/tags/c/", "/tags/c-2/", "/tags/"])
+        self.assertIn("Post 2 &", self.read("tags", "c", "index.html"))
+        self.assertIn("Post 1 &", self.read("tags", "c-2", "index.html"))
+        self.assertIn('<a href="/tags/c-2/">C++</a> (1)', self.read("tags", "index.html"))
+        pages.close()
@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+import unittest
+from frontmatter import page_fields, page_layout_from_line, read_page_header, skip_page_header, split_page_header
+
+PAGE = """---
+date: 2024-03-01
+tags: [elves, "first age"]
+draft: false
+slug: glorfindel
+extra:
+  - one
+  - 2
+# a comment, not a title
+---
+# Glorfindel
+
+Body text.
+"""
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split_front_matter(self):
+        meta, body = split_page_header(PAGE)
+        self.assertEqual(meta, {"date": "2024-03-01", "tags": ["elves", "first age"], "draft": False, "slug": "glorfindel", "extra": ["one", 2]})
+        self.assertEqual(body, "# Glorfindel\n\nBody text.\n")
+
+    def test_layout_comment(self):
+        self.assertEqual(page_layout_from_line("<!-- layout: post.html -->\n"), "post.html")
+        self.assertIsNone(page_layout_from_line("# Title\n"))
+        self.assertEqual(split_page_header("<!-- layout: post.html -->\n# Title"), ({"layout": "post.html"}, "# Title"))
+        self.assertEqual(split_page_header("# Title\n<!-- layout: post.html -->"), ({}, "# Title\n<!-- layout: post.html -->"))
+
+    def test_skip_page_header_streams_the_body(self):
+        meta = {}
+        lines = list(skip_page_header(io.StringIO(PAGE), "page.md", meta))
+        self.assertEqual(lines[0], "# Glorfindel\n")
+        self.assertEqual(meta["slug"], "glorfindel")
+        self.assertEqual(list(skip_page_header(io.StringIO("# T\nx"))), ["# T\n", "x"])
+
+    def test_invalid_front_matter(self):
+        with self.assertRaises(ValueError) as context:
+            split_page_header("---\ndate 2024\n---\n# T", "page.md")
+        self.assertIn("page.md:2:", str(context.exception))
+        with self.assertRaises(ValueError):
+            split_page_header("---\ndate: 2024\n# T", "page.md")
+
+    def test_read_page_header_stops_at_title(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "w") as f:
+                f.write(PAGE)
+            meta, title = read_page_header(path)
+        self.assertEqual(title, "Glorfindel")
+        self.assertEqual(meta["tags"], ["elves", "first age"])
+
+    def test_page_fields(self):
+        self.assertEqual(
+            page_fields({"tags": "b, a, b", "draft": True, "slug": "/x/", "date": 2024, "layout": "post.html"}),
+            {"date": "2024", "tags": ["a", "b"], "draft": True, "layout": "post.html", "slug": "x"},
+        )
+        self.assertEqual(page_fields({}), {"date": None, "tags": [], "draft": False, "layout": None, "slug": None})
@@ -1,6 +1,7 @@
+import pickle
 import unittest
 
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, shared_props
 
 class TestHTMLNode(unittest.TestCase):
     def test_to_html_a(self):
@@ -30,4 +31,29 @@ class TestHTMLNode(unittest.TestCase):
         node = HTMLNode(tag="bold", value="carlos", props=props)
         to_props = node.props_to_html()
         props_str = ' class="bg-light"'
-        self.assertEqual(to_props, props_str)
\ No newline at end of file
+        self.assertEqual(to_props, props_str)
+
+
+class TestSharedProps(unittest.TestCase):
+    def test_shared_props_are_reused(self):
+        first = shared_props(("href", "/a"))
+        self.assertIs(first, shared_props(("href", "/a")))
+        node = HTMLNode("a", "x", None, first)
+        self.assertEqual(node.props_to_html(), ' href="/a"')
+
+    def test_shared_props_are_read_only(self):
+        props = shared_props(("src", "/img.png"), ("alt", "img"))
+        with self.assertRaises(TypeError):
+            props["src"] = "/other.png"
+        self.assertEqual(pickle.loads(pickle.dumps(props)), {"src": "/img.png", "alt": "img"})
+
+    def test_shared_props_render_on_first_use(self):
+        props = shared_props(("href", "/lazy"))
+        self.assertIsNone(props._html)
+        self.assertEqual(HTMLNode("a", "x", None, props).props_to_html(), ' href="/lazy"')
+        self.assertEqual(props._html, ' href="/lazy"')
+
+    def test_nodes_have_no_instance_dict(self):
+        self.assertFalse(hasattr(HTMLNode("p"), "__dict__"))
+        with self.assertRaises(AttributeError):
+            HTMLNode("p").extra = 1
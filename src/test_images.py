@@ -0,0 +1,88 @@
+import os
+import struct
+import tempfile
+import unittest
+from build import generate_pages_incremental
+from images import read_image_size, ImageSizeCache, scan_image_sizes
+from transformers import markdown_to_html_node
+from urls import UrlRewriter
+
+PNG = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480) + b"\x08\x06\x00\x00\x00"
+GIF = b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 16
+WEBP_VP8X = b"RIFF" + struct.pack("<I", 30) + b"WEBPVP8X" + struct.pack("<I", 10) + b"\x00" * 4 + (799).to_bytes(3, "little") + (599).to_bytes(3, "little")
+WEBP_VP8L = b"RIFF" + struct.pack("<I", 30) + b"WEBPVP8L" + struct.pack("<I", 10) + b"\x2f" + struct.pack("<I", (99) | (49 << 14)) + b"\x00" * 8
+JPEG = (
+    b"\xff\xd8"
+    + b"\xff\xe1" + struct.pack(">H", 8) + b"Exif\x00\x00"
+    + b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 300, 400) + b"\x00" * 10
+)
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        os.makedirs(os.path.join(self.static, "images"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.static, "images", name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_read_image_size(self):
+        self.assertEqual(tuple(read_image_size(self.write("a.png", PNG))), (640, 480))
+        self.assertEqual(tuple(read_image_size(self.write("a.gif", GIF))), (32, 16))
+        self.assertEqual(tuple(read_image_size(self.write("a.webp", WEBP_VP8X))), (800, 600))
+        self.assertEqual(tuple(read_image_size(self.write("b.webp", WEBP_VP8L))), (100, 50))
+        self.assertEqual(tuple(read_image_size(self.write("a.jpg", JPEG))), (400, 300))
+        self.assertIsNone(read_image_size(self.write("bad.png", b"not an image")))
+
+    def test_cache_skips_unchanged_files(self):
+        self.write("a.png", PNG)
+        cache_path = os.path.join(self.tmp.name, "sizes.json")
+        self.assertEqual(scan_image_sizes(self.static, cache_path), {"/images/a.png": (640, 480)})
+        cache = ImageSizeCache(cache_path)
+        cache.scan(self.static)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_deleted_images_are_forgotten(self):
+        path = self.write("a.png", PNG)
+        cache = ImageSizeCache(os.path.join(self.tmp.name, "sizes.json"))
+        cache.scan(self.static)
+        os.remove(path)
+        self.assertEqual(cache.scan(self.static), {})
+        self.assertEqual(cache.entries, {})
+
+    def test_image_attributes_in_markdown(self):
+        urls = UrlRewriter("/site/", None, {"/images/a.png": (640, 480)})
+        html = markdown_to_html_node("![a](/images/a.png) ![b](https://x.org/b.png)", urls).to_html()
+        self.assertEqual(
+            html,
+            '<div><p><img src="/site/images/a.png" alt="a" width="640" height="480" loading="lazy" decoding="async"></img>'
+            ' <img src="https://x.org/b.png" alt="b" loading="lazy" decoding="async"></img></p></div>',
+        )
+        self.assertNotEqual(urls.key, UrlRewriter("/site/", None, {"/images/a.png": (1, 1)}).key)
+
+    def test_incremental_build_renders_pages_using_a_changed_image(self):
+        content = os.path.join(self.tmp.name, "content")
+        dest = os.path.join(self.tmp.name, "docs")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as f:
+            f.write("# Home\n\n![a](/images/a.png)")
+        with open(os.path.join(content, "other.md"), "w") as f:
+            f.write("# Other\n\nno images")
+
+        def build(sizes):
+            return generate_pages_incremental(content, template, dest, "/", urls=UrlRewriter("/", None, sizes))
+
+        build({"/images/a.png": (640, 480)})
+        self.assertEqual(build({"/images/a.png": (640, 480), "/images/unused.png": (1, 1)})["skipped"], 2)
+        self.assertEqual(build({"/images/a.png": (320, 240)}), {"rendered": 1, "skipped": 1, "removed": 0})
+        with open(os.path.join(dest, "index.html")) as f:
+            self.assertIn('width="320" height="240"', f.read())
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from layouts import LAYOUT_FILE, LayoutResolver, page_templates
+from build import generate_pages_parallel
+from utils import generate_pages_recursive
+
+class TestLayouts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "drafts"))
+        os.makedirs(os.path.join(self.root, "layouts", "partials"))
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.write(os.path.join(self.root, "layouts", "post.html"), '<article>{% include "partials/byline.html" %}{{ Content }}</article>')
+        self.write(os.path.join(self.root, "layouts", "wide.html"), "<section>{{ Content }}</section>")
+        self.write(os.path.join(self.root, "layouts", "partials", "byline.html"), "<p>{{ Title }}</p>")
+        self.write(os.path.join(self.content, "blog", LAYOUT_FILE), "layouts/post.html\n")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nworld")
+        self.write(os.path.join(self.content, "blog", "wide.md"), "<!-- layout: layouts/wide.html -->\n# Wide\n\nwide")
+        self.write(os.path.join(self.content, "blog", "drafts", "draft.md"), "# Draft\n\ndraft")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_resolver_prefers_page_then_nearest_directory(self):
+        resolver = LayoutResolver(self.content, self.template)
+        pages = page_templates([(os.path.join(self.content, path), None) for path in ("index.md", "blog/post.md", "blog/wide.md", "blog/drafts/draft.md")], resolver)
+        self.assertEqual([os.path.relpath(template, self.root) for _, _, template in pages], [
+            "template.html",
+            os.path.join("layouts", "post.html"),
+            os.path.join("layouts", "wide.html"),
+            os.path.join("layouts", "post.html"),
+        ])
+
+    def test_empty_layout_file_resets_to_default(self):
+        self.write(os.path.join(self.content, "blog", "drafts", LAYOUT_FILE), "")
+        resolver = LayoutResolver(self.content, self.template)
+        self.assertEqual(resolver.template_for(os.path.join(self.content, "blog", "drafts", "draft.md")), self.template)
+
+    def test_builds_render_each_page_with_its_layout(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/")
+        generate_pages_parallel(self.content, self.template, parallel, "/", 2)
+        for dest in (serial, parallel):
+            self.assertEqual(self.read(os.path.join(dest, "index.html")), "<main><div><h1>Home</h1><p>hello</p></div></main>")
+            self.assertEqual(self.read(os.path.join(dest, "blog", "post.html")), "<article><p>Post</p><div><h1>Post</h1><p>world</p></div></article>")
+            self.assertEqual(self.read(os.path.join(dest, "blog", "wide.html")), "<section><div><h1>Wide</h1><p>wide</p></div></section>")
+
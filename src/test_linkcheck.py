@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import linkcheck
+from linkcheck import LinkRecorder, check_links, is_internal, page_links, site_path
+from site_index import SiteIndex
+from transformers import markdown_to_html_node, lines_to_html_node
+from build import generate_pages_incremental
+from urls import UrlRewriter
+from utils import generate_pages_recursive
+
+MARKDOWN = "# Links\n\nSee [home](/) and [home](/), [about](about) or [_docs_](https://example.com).\n\n![cover](/images/cover.png)"
+
+class TestLinkCollection(unittest.TestCase):
+    def test_page_links_in_order_without_repeats(self):
+        expected = [("link", "/site/"), ("link", "about"), ("link", "https://example.com"), ("image", "/site/images/cover.png")]
+        self.assertEqual(page_links(markdown_to_html_node(MARKDOWN, UrlRewriter("/site/")).children), expected)
+        node = lines_to_html_node(MARKDOWN.split("\n"), UrlRewriter("/site/"))
+        recorder = LinkRecorder()
+        node.children = recorder.watch(node.children)
+        node.to_html()
+        self.assertEqual(recorder.links, expected)
+
+    def test_internal_urls(self):
+        self.assertTrue(is_internal("/blog/"))
+        self.assertTrue(is_internal("../a.png"))
+        for url in ("https://example.com", "mailto:me@example.com", "//cdn.example.com/a.js", "#top", ""):
+            self.assertFalse(is_internal(url))
+
+    def test_site_paths(self):
+        self.assertEqual(site_path("/site/blog/a%20b/?x=1#top", "/", "/site/"), "blog/a b/")
+        self.assertEqual(site_path("/site/", "/", "/site/"), "")
+        self.assertEqual(site_path("../img.png", "/blog/post/", "/site/"), "blog/img.png")
+        self.assertIsNone(site_path("/elsewhere/", "/", "/site/"))
+
+
+class TestCheckLinks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "first"))
+        os.makedirs(os.path.join(self.dest, "images"))
+        with open(os.path.join(self.dest, "images", "a.png"), "wb") as f:
+            f.write(b"png")
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[first](/blog/first) [second](/blog/second.html) [gone](/blog/gone) ![a](/images/a.png)")
+        self.write(os.path.join(self.content, "blog", "first", "index.md"), "# First\n\n[up](../second.html) [home](/) ![b](/images/b.png) [out](https://example.com)")
+        self.write(os.path.join(self.content, "blog", "second.md"), "# Second\n\n[first](first/) [first](first)")
+        linkcheck.configure()
+
+    def tearDown(self):
+        linkcheck.disable()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_reports_broken_references_with_their_source(self):
+        index = SiteIndex(self.dest)
+        generate_pages_recursive(self.content, self.template, self.dest, "/site/", index=index)
+        checked, broken = check_links(index, self.dest, "/site/")
+        self.assertEqual(checked, 9)
+        self.assertEqual(sorted(broken), [
+            (os.path.join(self.content, "blog", "first", "index.md"), "image", "/site/images/b.png"),
+            (os.path.join(self.content, "index.md"), "link", "/site/blog/gone"),
+        ])
+
+    def test_incremental_builds_check_skipped_pages(self):
+        linkcheck.disable()
+        generate_pages_incremental(self.content, self.template, self.dest, "/")
+        linkcheck.configure()
+        # Rendered again to collect links the first build didn't record.
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.dest, "/")["rendered"], 3)
+        index = SiteIndex(self.dest)
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.dest, "/", index=index)["skipped"], 3)
+        self.assertEqual(len(check_links(index, self.dest)[1]), 2)
+        os.remove(os.path.join(self.dest, "images", "a.png"))
+        self.assertEqual(len(check_links(index, self.dest)[1]), 3)
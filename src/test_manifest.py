@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from manifest import load_manifest, save_manifest, load_json_manifest, save_json_manifest, file_fingerprint, page_is_fresh, page_entry, remove_output, MANIFEST_NAME, MANIFEST_VERSION
+from build import generate_pages_incremental
+
+TEMPLATE = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nworld")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, basepath="/"):
+        return generate_pages_incremental(self.content, self.template, self.dest, basepath)
+
+    def test_missing_manifest_is_empty(self):
+        manifest = load_manifest(self.dest)
+        self.assertEqual(manifest["pages"], {})
+
+    def test_save_and_load(self):
+        save_manifest(self.dest, {"version": MANIFEST_VERSION, "templates": {}, "pages": {"a.md": {"output": "a.html"}}})
+        self.assertTrue(os.path.isfile(os.path.join(self.dest, MANIFEST_NAME)))
+        self.assertEqual(load_manifest(self.dest)["pages"], {"a.md": {"output": "a.html"}})
+
+    def test_json_manifest_round_trip(self):
+        cache = os.path.join(self.root, ".cache")
+        self.assertEqual(load_json_manifest(cache, "files.json"), {})
+        save_json_manifest(cache, "files.json", {"a.css": {"hash": "x"}})
+        self.assertEqual(load_json_manifest(cache, "files.json"), {"a.css": {"hash": "x"}})
+        self.write(os.path.join(cache, "files.json"), "{broken")
+        self.assertEqual(load_json_manifest(cache, "files.json"), {})
+
+    def test_fingerprint_reuses_hash_when_stat_matches(self):
+        path = os.path.join(self.content, "index.md")
+        first = file_fingerprint(path, None)
+        reused = file_fingerprint(path, {"signature": first["signature"], "hash": "cached"})
+        self.assertEqual(reused["hash"], "cached")
+
+    def test_page_is_fresh(self):
+        dest_path = os.path.join(self.root, "out.html")
+        self.write(dest_path, "x")
+        fingerprint = {"signature": [1, 1], "hash": "abc"}
+        entry = page_entry(fingerprint, "tpl", "/", dest_path)
+        self.assertTrue(page_is_fresh(entry, fingerprint, "tpl", "/", dest_path))
+        self.assertFalse(page_is_fresh(entry, fingerprint, "other", "/", dest_path))
+        self.assertFalse(page_is_fresh(entry, fingerprint, "tpl", "/base/", dest_path))
+        self.assertFalse(page_is_fresh(None, fingerprint, "tpl", "/", dest_path))
+
+    def test_incremental_build_skips_unchanged(self):
+        self.assertEqual(self.build(), {"rendered": 2, "skipped": 0, "removed": 0})
+        self.assertEqual(self.build(), {"rendered": 0, "skipped": 2, "removed": 0})
+
+    def test_incremental_build_renders_changed_content(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged")
+        self.assertEqual(self.build(), {"rendered": 1, "skipped": 1, "removed": 0})
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertIn("changed", f.read())
+
+    def test_incremental_build_renders_all_on_template_change(self):
+        self.build()
+        self.write(self.template, TEMPLATE + "\n")
+        self.assertEqual(self.build()["rendered"], 2)
+
+    def test_incremental_build_renders_pages_whose_urls_change(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)")
+        self.build()
+        self.assertEqual(self.build("/site/"), {"rendered": 1, "skipped": 1, "removed": 0})
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertIn('<a href="/site/blog/post">', f.read())
+        self.write(self.template, '<link href="/style.css">' + TEMPLATE)
+        self.build("/site/")
+        self.assertEqual(self.build("/")["rendered"], 2)
+
+    def test_incremental_build_renders_only_pages_using_a_changed_partial(self):
+        os.makedirs(os.path.join(self.root, "partials"))
+        self.write(os.path.join(self.root, "partials", "byline.html"), "<p>by me</p>")
+        self.write(os.path.join(self.root, "post.html"), '{% include "partials/byline.html" %}' + TEMPLATE)
+        self.write(os.path.join(self.content, "blog", ".layout"), "post.html")
+        self.assertEqual(self.build()["rendered"], 2)
+        entry = load_manifest(self.dest)["pages"][os.path.join(self.content, "blog", "post.md")]
+        self.assertEqual(entry["templates"], [os.path.join(self.root, "post.html"), os.path.join(self.root, "partials", "byline.html")])
+        self.write(os.path.join(self.root, "partials", "byline.html"), "<p>by you</p>")
+        self.assertEqual(self.build(), {"rendered": 1, "skipped": 1, "removed": 0})
+        with open(os.path.join(self.dest, "blog", "post.html")) as f:
+            self.assertIn("by you", f.read())
+        self.write(os.path.join(self.content, "index.md"), "<!-- layout: post.html -->\n# Home\n\nhello")
+        self.assertEqual(self.build(), {"rendered": 1, "skipped": 1, "removed": 0})
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertEqual(f.read(), "<p>by you</p><title>Home</title><main><div><h1>Home</h1><p>hello</p></div></main>")
+
+    def test_incremental_build_removes_stale_outputs(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(), {"rendered": 0, "skipped": 1, "removed": 1})
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+    def test_remove_output_keeps_root(self):
+        dest_path = os.path.join(self.dest, "only.html")
+        os.makedirs(self.dest)
+        self.write(dest_path, "x")
+        remove_output(dest_path, self.dest)
+        self.assertTrue(os.path.isdir(self.dest))
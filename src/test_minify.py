@@ -0,0 +1,79 @@
+import unittest
+import minify
+from minify import HtmlMinifier, page_writer
+from serializer import BufferedWriter
+
+PAGE = """<!DOCTYPE html>
+<html>
+	<head>
+		<title>A  title</title>
+		<!-- analytics -->
+		<!--[if IE]><p>old</p><![endif]-->
+	</head>
+	<body>
+		<p>one   two
+		three</p> <b>x</b> <i>y</i>
+		<pre><code>def f():
+    return  1
+</code></pre>
+		<p><code>a   b</code></p>
+	</body>
+</html>
+"""
+
+EXPECTED = (
+    "<!DOCTYPE html><html><head><title>A title</title><!-- analytics --><!--[if IE]><p>old</p><![endif]-->"
+    "</head><body><p>one two three</p> <b>x</b> <i>y</i>"
+    "<pre><code>def f():\n    return  1\n</code></pre><p><code>a   b</code></p></body></html>"
+)
+
+
+def minify_chunks(chunks, remove_comments=False, window_size=1 << 16):
+    output = []
+    minifier = HtmlMinifier(output.append, remove_comments, window_size)
+    for chunk in chunks:
+        minifier.write(chunk)
+    minifier.flush()
+    return "".join(output)
+
+
+class TestHtmlMinifier(unittest.TestCase):
+    def tearDown(self):
+        minify.disable()
+
+    def test_collapses_whitespace_and_keeps_pre(self):
+        self.assertEqual(minify_chunks([PAGE]), EXPECTED)
+
+    def test_result_does_not_depend_on_windows(self):
+        for split in range(1, len(PAGE)):
+            self.assertEqual(minify_chunks([PAGE[:split], PAGE[split:]], window_size=1), EXPECTED, split)
+        for window_size in (1, 7, 64):
+            self.assertEqual(minify_chunks(list(PAGE), window_size=window_size), EXPECTED, window_size)
+
+    def test_keeps_non_breaking_spaces_and_attributes(self):
+        html = '<img alt="a  b" />\u00a0\u00a0x  <a\n  href="/">y</a>'
+        self.assertEqual(minify_chunks([html]), '<img alt="a  b" />\u00a0\u00a0x <a\n  href="/">y</a>')
+
+    def test_long_text_between_tags(self):
+        words = "word \n\t" * 50000
+        html = minify_chunks([f'<p title="a > b  c">{words}</p>'], window_size=1 << 20)
+        self.assertEqual(html, '<p title="a > b  c">' + "word " * 50000 + "</p>")
+
+    def test_remove_comments_keeps_conditional_comments(self):
+        html = minify_chunks([PAGE], remove_comments=True)
+        self.assertNotIn("analytics", html)
+        self.assertIn("<!--[if IE]>", html)
+
+    def test_raw_elements_are_case_insensitive(self):
+        self.assertEqual(minify_chunks(["<PRE>a  \n b</PRE>\n<p>c  d</p>"]), "<PRE>a  \n b</PRE><p>c d</p>")
+
+    def test_page_writer_only_wraps_when_enabled(self):
+        output = []
+        writer = BufferedWriter(output.append)
+        self.assertIs(page_writer(writer), writer)
+        minify.configure()
+        stage = page_writer(writer)
+        stage.write("<p>\n  </p>")
+        stage.flush()
+        writer.flush()
+        self.assertEqual(output, ["<p></p>"])
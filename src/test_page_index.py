@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import page_index
+from page_index import PageIndex, page_context, page_destination
+from build import generate_pages_incremental
+from template import clear_template_cache
+from urls import UrlRewriter
+
+class TestPageIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.template = os.path.join(self.root, "template.html")
+        self.write(self.template, "{{ Content }}{% for page in Related %}<a href=\"{{ page.url }}\">{{ page.title }}</a>{% endfor %}")
+        self.write(os.path.join(self.content, "index.md"), "---\nslug: home\n---\n# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "one.md"), "---\ndate: 2024-01-01\ntags: [python, web]\n---\n# One\n\none")
+        self.write(os.path.join(self.content, "blog", "two.md"), "---\ndate: 2024-02-01\ntags:\n  - python\nslug: second\n---\n# Two\n\ntwo")
+        self.write(os.path.join(self.content, "blog", "draft.md"), "---\ndraft: true\ntags: [python]\n---\n# Draft\n\ndraft")
+        self.index = page_index.configure(os.path.join(self.root, "pages.sqlite"))
+        clear_template_cache()
+
+    def tearDown(self):
+        page_index.disable()
+        clear_template_cache()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_refresh_reuses_unchanged_pages(self):
+        self.assertEqual(self.index.refresh(self.content), {"read": 4, "reused": 0, "removed": 0})
+        os.remove(os.path.join(self.content, "blog", "draft.md"))
+        self.write(os.path.join(self.content, "blog", "one.md"), "---\ntags: [web]\n---\n# One again\n")
+        self.assertEqual(self.index.refresh(self.content), {"read": 1, "reused": 2, "removed": 1})
+        self.assertEqual(self.index.page(os.path.join(self.content, "blog", "one.md"))["title"], "One again")
+        reopened = PageIndex(self.index.path)
+        self.assertEqual(reopened.refresh(self.content), {"read": 0, "reused": 3, "removed": 0})
+        reopened.close()
+
+    def test_drafts_and_slugs_decide_destinations(self):
+        self.index.refresh(self.content)
+        self.assertIsNone(page_destination(os.path.join(self.content, "blog", "draft.md"), self.content, self.dest))
+        self.assertEqual(page_destination(os.path.join(self.content, "blog", "two.md"), self.content, self.dest), os.path.join(self.dest, "blog", "second.html"))
+        self.assertEqual(page_destination(os.path.join(self.content, "index.md"), self.content, self.dest), os.path.join(self.dest, "index.html"))
+        page_index.configure(self.index.path, include_drafts=True)
+        self.assertEqual(page_destination(os.path.join(self.content, "blog", "draft.md"), self.content, self.dest), os.path.join(self.dest, "blog", "draft.html"))
+
+    def test_tags_and_related_pages(self):
+        self.index.refresh(self.content)
+        one = os.path.join(self.content, "blog", "one.md")
+        two = os.path.join(self.content, "blog", "two.md")
+        self.assertEqual(self.index.tags(), [("python", 2), ("web", 1)])
+        self.assertEqual(self.index.sources_with_tag("python"), [two, one])
+        context = page_context(one, self.content, self.dest, UrlRewriter("/site/"))
+        self.assertEqual(context["Page"], {"date": "2024-01-01", "tags": ["python", "web"], "slug": None})
+        self.assertEqual(context["Related"], [{"title": "Two", "url": "/site/blog/second.html"}])
+
+    def test_incremental_build_rerenders_when_related_pages_change(self):
+        self.index.refresh(self.content)
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.dest, "/")["rendered"], 3)
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.dest, "/")["rendered"], 0)
+        self.write(os.path.join(self.content, "blog", "two.md"), "---\ndate: 2024-02-01\ntags: [python]\nslug: second\n---\n# Two, renamed\n\ntwo")
+        self.index.refresh(self.content)
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.dest, "/")["rendered"], 2)
+        with open(os.path.join(self.dest, "blog", "one.html")) as f:
+            self.assertIn("Two, renamed", f.read())
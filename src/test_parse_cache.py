@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+import parse_cache
+from parse_cache import ParseCache, dumps, loads
+from transformers import markdown_to_html_node
+from utils import generate_page
+from urls import url_rewriter
+
+MARKDOWN = "# Title\n\nSome **bold** and a [link](/a) with ![img](/b.png)\n\n- one\n- two"
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(os.path.join(self.tmp.name, "cache"), 1024 * 1024)
+
+    def tearDown(self):
+        parse_cache.disable()
+        self.tmp.cleanup()
+
+    def test_round_trip_keeps_html(self):
+        node = markdown_to_html_node(MARKDOWN)
+        title, loaded = loads(dumps("Title", node))
+        self.assertEqual(title, "Title")
+        self.assertEqual(loaded.to_html(), node.to_html())
+        self.assertEqual(loaded.__class__, node.__class__)
+
+    def test_get_and_put(self):
+        key = self.cache.key_for(MARKDOWN)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "Title", markdown_to_html_node(MARKDOWN))
+        title, node = self.cache.get(key)
+        self.assertEqual(title, "Title")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key_depends_on_content(self):
+        self.assertNotEqual(self.cache.key_for("a"), self.cache.key_for("b"))
+
+
+    def test_corrupt_entry_is_a_miss(self):
+        key = self.cache.key_for(MARKDOWN)
+        os.makedirs(os.path.dirname(self.cache.entry_path(key)))
+        with open(self.cache.entry_path(key), "wb") as f:
+            f.write(b"garbage")
+        self.assertIsNone(self.cache.get(key))
+
+    def test_prune_evicts_least_recently_used(self):
+        node = markdown_to_html_node(MARKDOWN)
+        keys = [self.cache.key_for(f"{MARKDOWN}{i}") for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, "Title", node)
+            os.utime(self.cache.entry_path(key), ns=(i, i))
+        self.cache.get(keys[0])
+        size = os.path.getsize(self.cache.entry_path(keys[0]))
+        self.cache.max_bytes = size * 2
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertFalse(os.path.exists(self.cache.entry_path(keys[1])))
+        self.assertTrue(os.path.exists(self.cache.entry_path(keys[0])))
+
+    def test_clean(self):
+        key = self.cache.key_for(MARKDOWN)
+        self.cache.put(key, "Title", markdown_to_html_node(MARKDOWN))
+        self.cache.clean()
+        self.assertFalse(os.path.exists(self.cache.path))
+
+    def test_generate_page_uses_cache(self):
+        source = os.path.join(self.tmp.name, "index.md")
+        template = os.path.join(self.tmp.name, "template.html")
+        with open(source, "w") as f:
+            f.write(MARKDOWN)
+        with open(template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        cache = parse_cache.configure(self.cache.path)
+        first = os.path.join(self.tmp.name, "first.html")
+        second = os.path.join(self.tmp.name, "second.html")
+        generate_page(source, template, first, "/")
+        generate_page(source, template, second, "/")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        with open(first) as a, open(second) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_cached_tree_serves_every_basepath(self):
+        source = os.path.join(self.tmp.name, "index.md")
+        template = os.path.join(self.tmp.name, "template.html")
+        with open(source, "w") as f:
+            f.write(MARKDOWN)
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        cache = parse_cache.configure(self.cache.path)
+        for basepath in ("/", "/site/"):
+            generate_page(source, template, os.path.join(self.tmp.name, f"{len(basepath)}.html"), basepath)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        with open(os.path.join(self.tmp.name, "6.html")) as f:
+            html = f.read()
+        self.assertIn('<a href="/site/a">', html)
+        self.assertIn('<img src="/site/b.png"', html)
+        self.assertEqual(html, markdown_to_html_node(MARKDOWN, url_rewriter("/site/")).to_html())
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+import parse_cache
+import pipeline
+from build import BuildError, generate_pages_parallel, render_pages
+from site_index import SiteIndex
+from utils import generate_pages_recursive
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        # Sources are only read ahead for the parse cache; see Pipeline.
+        parse_cache.configure(os.path.join(self.root, "cache"))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Blog](/blog/post0)")
+        for number in range(12):
+            self.write(os.path.join(self.content, "blog", f"post{number}.md"), f"---\ndate: 2024-01-{number + 1:02}\n---\n# Post {number}\n\nSome **bold** text.\n\n```\ncode {number}\n```")
+
+    def tearDown(self):
+        pipeline.disable()
+        parse_cache.disable()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def outputs(self, dest):
+        found = {}
+        for root, _, names in os.walk(dest):
+            for name in names:
+                with open(os.path.join(root, name)) as f:
+                    found[os.path.relpath(os.path.join(root, name), dest)] = f.read()
+        return found
+
+    def test_pipelined_build_matches_serial_build(self):
+        serial = os.path.join(self.root, "serial")
+        generate_pages_recursive(self.content, self.template, serial, "/site/")
+        engine = pipeline.configure(readers=3, queue_size=1, write_batch=4)
+        piped = os.path.join(self.root, "piped")
+        index = SiteIndex(piped)
+        self.assertEqual(generate_pages_parallel(self.content, self.template, piped, "/site/", 1, index=index), 13)
+        self.assertEqual(self.outputs(piped), self.outputs(serial))
+        self.assertEqual(index.pages[os.path.join(self.content, "blog", "post3.md")]["date"], "2024-01-04")
+        for name in pipeline.STAGES:
+            self.assertEqual(engine.stats[name]["pages"], 13)
+            self.assertGreater(engine.stats[name]["work"] + engine.stats[name]["wait"], 0)
+
+    def test_big_sources_are_streamed_by_the_render_stage(self):
+        limit = parse_cache.MAX_SOURCE_BYTES
+        parse_cache.MAX_SOURCE_BYTES = 30
+        try:
+            pipeline.configure()
+            dest = os.path.join(self.root, "docs")
+            generate_pages_parallel(self.content, self.template, dest, "/", 1)
+        finally:
+            parse_cache.MAX_SOURCE_BYTES = limit
+        self.assertIn("<pre><code>code 5\n</code></pre>", self.outputs(dest)[os.path.join("blog", "post5.html")])
+        # Without the cache every page is streamed, whatever its size.
+        parse_cache.disable()
+        engine = pipeline.configure()
+        streamed = os.path.join(self.root, "streamed")
+        generate_pages_parallel(self.content, self.template, streamed, "/", 1)
+        self.assertEqual(self.outputs(streamed), self.outputs(dest))
+        self.assertEqual(engine.stats["write"]["pages"], 0)
+        self.assertEqual(engine.stats["render"]["pages"], 13)
+
+    def test_failures_are_reported_and_other_pages_written(self):
+        self.write(os.path.join(self.content, "blog", "post4.md"), "# Broken\n\nan `unclosed code span")
+        os.makedirs(os.path.join(self.root, "docs", "blog", "post5.html"))
+        engine = pipeline.configure(readers=2, queue_size=2)
+        pages = [
+            (os.path.join(self.content, "blog", f"post{number}.md"), os.path.join(self.root, "docs", "blog", f"post{number}.html"), self.template, None)
+            for number in range(12)
+        ] + [(os.path.join(self.content, "missing.md"), os.path.join(self.root, "docs", "missing.html"), self.template, None)]
+        index = SiteIndex(os.path.join(self.root, "docs"))
+        with self.assertRaises(BuildError) as raised:
+            render_pages(pages, "/", 1, index=index)
+        failed = sorted(os.path.basename(from_path) for from_path, _ in raised.exception.failures)
+        self.assertEqual(failed, ["missing.md", "post4.md", "post5.md"])
+        self.assertEqual(len(index.pages), 10)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, "docs", "blog", "post11.html")))
+        self.assertEqual(engine.stats["write"]["pages"], 10)
+
+    def test_worker_processes_report_their_stage_times(self):
+        engine = pipeline.configure(readers=2)
+        dest = os.path.join(self.root, "docs")
+        generate_pages_parallel(self.content, self.template, dest, "/", 2)
+        self.assertEqual(len(self.outputs(dest)), 13)
+        self.assertEqual(engine.stats["render"]["pages"], 13)
+
+    def test_rejects_empty_queues(self):
+        with self.assertRaises(ValueError):
+            pipeline.configure(queue_size=0)
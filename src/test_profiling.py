@@ -0,0 +1,41 @@
+import io
+import unittest
+import profiling
+from transformers import markdown_to_html_node
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable_profiling()
+
+    def test_disabled_scopes_are_shared_no_ops(self):
+        self.assertIsNone(profiling.profiler)
+        self.assertIs(profiling.stage("a"), profiling.stage("b"))
+        self.assertIs(profiling.page("x.md"), profiling.stage("a"))
+
+    def test_records_nested_stages_per_page(self):
+        profiler = profiling.enable_profiling()
+        with profiling.page("index.md"):
+            with profiling.stage("parse"):
+                markdown_to_html_node("# Title\n\nSome **bold** text")
+            with profiling.stage("parse"):
+                pass
+        self.assertEqual(len(profiler.pages), 1)
+        record = profiler.pages[0]
+        self.assertEqual(record["path"], "index.md")
+        self.assertEqual(record["stages"]["parse"]["calls"], 2)
+        self.assertIn("parse/iter_blocks", record["stages"])
+        self.assertIn("parse/type_block_to_html_node", record["stages"])
+        self.assertGreaterEqual(record["wall_ns"], record["stages"]["parse"]["wall_ns"])
+
+    def test_report_totals_and_summary(self):
+        profiler = profiling.enable_profiling(trace_memory=False)
+        for path in ("a.md", "b.md"):
+            with profiling.page(path):
+                with profiling.stage("render"):
+                    "".join(str(i) for i in range(1000))
+        report = profiler.report()
+        self.assertEqual(report["stages"]["render"]["calls"], 2)
+        out = io.StringIO()
+        profiling.print_summary(report, top=1, file=out)
+        self.assertIn("Slowest 1 of 2 pages", out.getvalue())
+        self.assertIn("render", out.getvalue())
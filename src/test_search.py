@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+import search
+from search import TermRecorder, assign_ids, decode_postings, encode_postings, page_terms, shard_of, tokenize, write_search_index
+from site_index import SiteIndex, page_metadata
+from transformers import markdown_to_html_node, lines_to_html_node
+from build import generate_pages_incremental
+from urls import UrlRewriter
+
+MARKDOWN = "# Fast Builds\n\nBuilds are **fast**, _really_ fast.\n\n```\nmake docs\n```\n\nSee [the docs](/docs)."
+
+class TestTerms(unittest.TestCase):
+    def test_tokenize_lowercases_and_drops_short_terms(self):
+        self.assertEqual(list(tokenize("A Static-Site gen, v2!")), ["static", "site", "gen", "v2"])
+
+    def test_page_terms_count_text_leaves(self):
+        terms = page_terms(markdown_to_html_node(MARKDOWN).children)
+        self.assertEqual(terms["fast"], 3)
+        self.assertEqual(terms["builds"], 2)
+        self.assertEqual(terms["docs"], 2)
+        self.assertNotIn("the docs", terms)
+        node = lines_to_html_node(MARKDOWN.split("\n"))
+        recorder = TermRecorder()
+        node.children = recorder.watch(node.children)
+        node.to_html()
+        self.assertEqual(recorder.terms(), terms)
+
+    def test_postings_round_trip(self):
+        postings = [(7, 1), (2, 3), (40, 2)]
+        self.assertEqual(encode_postings(postings), [2, 3, 5, 1, 33, 2])
+        self.assertEqual(decode_postings(encode_postings(postings)), sorted(postings))
+
+    def test_shard_names_are_ascii(self):
+        self.assertEqual(shard_of("python"), "py")
+        self.assertEqual(shard_of("é"), "_")
+        self.assertEqual(shard_of("_x"), "_")
+
+    def test_ids_survive_removals_and_fill_gaps(self):
+        previous = {"pages": [["/a/", "A"], ["/b/", "B"], ["/c/", "C"]]}
+        self.assertEqual(assign_ids(previous, ["/c/", "/d/", "/a/"]), {"/a/": 0, "/c/": 2, "/d/": 1})
+        self.assertEqual(assign_ids(None, ["/x/", "/y/"]), {"/x/": 0, "/y/": 1})
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.urls = UrlRewriter("/site/")
+
+    def tearDown(self):
+        search.disable()
+        self.tmp.cleanup()
+
+    def read(self, name):
+        with open(os.path.join(self.dest, "search", name)) as f:
+            return json.load(f)
+
+    def site(self, pages):
+        index = SiteIndex(self.dest)
+        for name, terms in pages.items():
+            index.add(page_metadata(f"{name}.md", os.path.join(self.dest, name, "index.html"), name.title(), "", 0, terms=terms))
+        return index
+
+    def test_writes_shards_and_keeps_unchanged_ones(self):
+        stats = write_search_index(self.site({"one": {"python": 2, "web": 1}, "two": {"python": 1, "rust": 4}}), self.dest, self.urls)
+        self.assertEqual(stats, {"written": 3, "unchanged": 0, "removed": 0})
+        index = self.read("index.json")
+        self.assertEqual(index["shards"], ["py", "ru", "we"])
+        self.assertEqual(index["pages"], [["/site/one/", "One"], ["/site/two/", "Two"]])
+        self.assertEqual(self.read("py.json"), {"python": [0, 2, 1, 1]})
+        stats = write_search_index(self.site({"two": {"python": 1, "rust": 4}, "three": {"python": 5}}), self.dest, self.urls)
+        self.assertEqual(stats, {"written": 1, "unchanged": 1, "removed": 1})
+        self.assertEqual(self.read("index.json")["pages"], [["/site/three/", "Three"], ["/site/two/", "Two"]])
+        self.assertEqual(decode_postings(self.read("py.json")["python"]), [(0, 5), (1, 1)])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "we.json")))
+
+    def test_pages_without_terms_are_an_error(self):
+        with self.assertRaises(ValueError):
+            write_search_index(self.site({"one": None}), self.dest, self.urls)
+
+    def test_incremental_build_reuses_stored_terms(self):
+        content = os.path.join(self.tmp.name, "content")
+        os.makedirs(content)
+        template = os.path.join(self.tmp.name, "template.html")
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as f:
+            f.write(MARKDOWN)
+        self.assertEqual(generate_pages_incremental(content, template, self.dest, "/")["rendered"], 1)
+        search.configure()
+        # Rendered again because the first build stored no terms.
+        self.assertEqual(generate_pages_incremental(content, template, self.dest, "/")["rendered"], 1)
+        index = SiteIndex(self.dest)
+        self.assertEqual(generate_pages_incremental(content, template, self.dest, "/", index=index)["skipped"], 1)
+        write_search_index(index, self.dest, UrlRewriter("/"))
+        self.assertEqual(self.read("fa.json"), {"fast": [0, 3]})
@@ -0,0 +1,63 @@
+import io
+import sys
+import unittest
+from htmlnode import HTMLNode
+from leafnode import LeafNode
+from parentnode import ParentNode
+from serializer import iter_html, write_html, BufferedWriter
+
+class FakeSocket():
+    def __init__(self):
+        self.sent = b""
+
+    def sendall(self, data):
+        self.sent += data
+
+class TestSerializer(unittest.TestCase):
+    def setUp(self):
+        self.tree = ParentNode("div", [
+            LeafNode("a", "link", {"href": "/x"}),
+            HTMLNode("p", None, [LeafNode(None, "text "), LeafNode("b", "bold")]),
+        ])
+        self.expected = '<div><a href="/x">link</a><p>text <b>bold</b></p></div>'
+
+    def test_iter_html_matches_to_html(self):
+        self.assertEqual("".join(iter_html(self.tree)), self.expected)
+        self.assertEqual(self.tree.to_html(), self.expected)
+
+    def test_write_to_text_sink(self):
+        sink = io.StringIO()
+        write_html(self.tree, sink)
+        self.assertEqual(sink.getvalue(), self.expected)
+
+    def test_write_to_bytes_sink(self):
+        sink = io.BytesIO()
+        write_html(LeafNode("p", "café"), sink)
+        self.assertEqual(sink.getvalue(), "<p>café</p>".encode("utf-8"))
+
+    def test_write_to_socket(self):
+        sink = FakeSocket()
+        write_html(self.tree, sink)
+        self.assertEqual(sink.sent, self.expected.encode())
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = sys.getrecursionlimit() * 2
+        node = LeafNode(None, "deep")
+        for _ in range(depth):
+            node = ParentNode("blockquote", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<blockquote>" * 3))
+        self.assertEqual(len(html), depth * len("<blockquote></blockquote>") + len("deep"))
+
+    def test_errors_are_raised_while_streaming(self):
+        tree = ParentNode("div", [LeafNode("p")])
+        with self.assertRaises(ValueError):
+            write_html(tree, io.StringIO())
+
+    def test_buffered_writer_batches_chunks(self):
+        writes = []
+        writer = BufferedWriter(writes.append, buffer_size=4)
+        for chunk in ["ab", "c", "de", "f"]:
+            writer.write(chunk)
+        writer.flush()
+        self.assertEqual(writes, ["abcde", "f"])
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from site_index import SiteIndex, SummaryRecorder, page_metadata, summary_of
+from transformers import markdown_to_html_node, lines_to_html_node
+from build import generate_pages_incremental, generate_pages_parallel
+from utils import generate_pages_recursive
+
+MARKDOWN = "# Title\n\n[< Back](/)\n\n![cover](/a.png)\n\nFirst **real**\nparagraph.\n\nSecond paragraph."
+
+class TestSummary(unittest.TestCase):
+    def test_summary_skips_link_and_image_paragraphs(self):
+        node = markdown_to_html_node(MARKDOWN)
+        self.assertEqual(summary_of(node.children), "First real paragraph.")
+        self.assertEqual(summary_of(markdown_to_html_node("# Only a title").children), "")
+
+    def test_recorder_reads_streamed_blocks(self):
+        node = lines_to_html_node(MARKDOWN.split("\n"))
+        recorder = SummaryRecorder()
+        node.children = recorder.watch(node.children)
+        self.assertEqual(recorder.summary, "")
+        html = node.to_html()
+        self.assertIn("Second paragraph.", html)
+        self.assertEqual(recorder.summary, "First real paragraph.")
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "first"))
+        with open(self.template, "w") as f:
+            f.write("{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome home.", 3)
+        self.write(os.path.join(self.content, "blog", "first", "index.md"), "# First\n\nThe first post.", 1)
+        self.write(os.path.join(self.content, "blog", "second.md"), "# Second\n\nThe second post.", 2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text, mtime):
+        with open(path, "w") as f:
+            f.write(text)
+        os.utime(path, ns=(mtime, mtime))
+
+    def collect(self, build):
+        dest = os.path.join(self.root, "docs")
+        index = SiteIndex(dest)
+        build(dest, index)
+        return index
+
+    def test_urls_and_sections(self):
+        index = SiteIndex("docs")
+        index.add(page_metadata("a.md", os.path.join("docs", "index.html"), "A", "", 1))
+        index.add(page_metadata("b.md", os.path.join("docs", "blog", "b", "index.html"), "B", "", 1))
+        index.add(page_metadata("c.md", os.path.join("docs", "blog", "c.html"), "C", "", 2))
+        self.assertEqual([url for url, _ in index.entries()], ["/", "/blog/b/", "/blog/c.html"])
+        self.assertEqual([url for url, _ in index.section("/blog/")], ["/blog/c.html", "/blog/b/"])
+
+    def test_every_build_mode_collects_the_same_metadata(self):
+        expected = {
+            os.path.join(self.content, "index.md"): ("Home", "Welcome home.", 3),
+            os.path.join(self.content, "blog", "first", "index.md"): ("First", "The first post.", 1),
+            os.path.join(self.content, "blog", "second.md"): ("Second", "The second post.", 2),
+        }
+        builds = [
+            lambda dest, index: generate_pages_recursive(self.content, self.template, dest, "/", index=index),
+            lambda dest, index: generate_pages_parallel(self.content, self.template, dest, "/", 2, index=index),
+            lambda dest, index: generate_pages_incremental(self.content, self.template, dest, "/", index=index),
+            # The second incremental build skips every page and reads the
+            # metadata back from the manifest.
+            lambda dest, index: generate_pages_incremental(self.content, self.template, dest, "/", index=index),
+        ]
+        for build in builds:
+            index = self.collect(build)
+            self.assertEqual({source: (page["title"], page["summary"], page["mtime"]) for source, page in index.pages.items()}, expected)
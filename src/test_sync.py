@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from sync import sync_tree, copy_file, SYNC_MANIFEST_NAME
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.src, "images"))
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png-bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_first_sync_copies_everything(self):
+        self.assertEqual(sync_tree(self.src, self.dst), {"copied": 2, "skipped": 0, "removed": 0})
+        self.assertEqual(self.read(os.path.join(self.dst, "images", "a.png")), "png-bytes")
+        self.assertTrue(os.path.isfile(os.path.join(self.dst, SYNC_MANIFEST_NAME)))
+
+    def test_unchanged_files_are_skipped_and_mtime_kept(self):
+        sync_tree(self.src, self.dst)
+        before = os.stat(os.path.join(self.dst, "index.css")).st_mtime_ns
+        self.assertEqual(sync_tree(self.src, self.dst), {"copied": 0, "skipped": 2, "removed": 0})
+        self.assertEqual(os.stat(os.path.join(self.dst, "index.css")).st_mtime_ns, before)
+
+    def test_changed_files_are_copied(self):
+        sync_tree(self.src, self.dst)
+        self.write(os.path.join(self.src, "index.css"), "body { color: red }")
+        self.assertEqual(sync_tree(self.src, self.dst)["copied"], 1)
+        self.assertEqual(self.read(os.path.join(self.dst, "index.css")), "body { color: red }")
+
+    def test_checksum_skips_touched_files(self):
+        sync_tree(self.src, self.dst)
+        path = os.path.join(self.src, "index.css")
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(sync_tree(self.src, self.dst, checksum=True)["copied"], 0)
+        self.assertEqual(os.stat(os.path.join(self.dst, "index.css")).st_mtime_ns, 1)
+
+    def test_stale_files_removed_but_other_outputs_kept(self):
+        sync_tree(self.src, self.dst)
+        self.write(os.path.join(self.dst, "index.html"), "page")
+        os.remove(os.path.join(self.src, "images", "a.png"))
+        self.assertEqual(sync_tree(self.src, self.dst)["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "index.html")))
+
+    def test_hardlink(self):
+        sync_tree(self.src, self.dst, hardlink=True)
+        src_stat = os.stat(os.path.join(self.src, "index.css"))
+        dst_stat = os.stat(os.path.join(self.dst, "index.css"))
+        self.assertEqual(src_stat.st_ino, dst_stat.st_ino)
+
+    def test_parallel_copy(self):
+        for i in range(20):
+            self.write(os.path.join(self.src, f"file{i}.txt"), str(i) * 1000)
+        self.assertEqual(sync_tree(self.src, self.dst, workers=4)["copied"], 22)
+        self.assertEqual(self.read(os.path.join(self.dst, "file7.txt")), "7" * 1000)
+
+    def test_copy_file_large(self):
+        path = os.path.join(self.src, "big.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(3 << 20))
+        copy_file(path, os.path.join(self.dst, "big.bin"))
+        with open(path, "rb") as a, open(os.path.join(self.dst, "big.bin"), "rb") as b:
+            self.assertEqual(a.read(), b.read())
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from template import compile_template, load_template, clear_template_cache, TemplateSyntaxError
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        clear_template_cache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        clear_template_cache()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_variables(self):
+        path = self.write("t.html", "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        html = compile_template(path).render({"Title": "Hi", "Content": "<p>body</p>"})
+        self.assertEqual(html, "<title>Hi</title><article><p>body</p></article>")
+
+    def test_static_chunks_are_merged(self):
+        path = self.write("t.html", "<a>{% if x %}{% endif %}</a>")
+        self.assertEqual(compile_template(path).ops[0], "<a>")
+
+    def test_basepath_applied_to_template_not_slots(self):
+        path = self.write("t.html", '<link href="/index.css" /><a href="//cdn/x">{{ Content }}')
+        html = compile_template(path, "/site/").render({"Content": '<code>src="/a.png"</code>'})
+        self.assertEqual(html, '<link href="/site/index.css" /><a href="//cdn/x"><code>src="/a.png"</code>')
+
+    def test_conditionals(self):
+        path = self.write("t.html", "{% if a %}A{% elif not b %}notB{% else %}B{% endif %}")
+        template = compile_template(path)
+        self.assertEqual(template.render({"a": True}), "A")
+        self.assertEqual(template.render({"a": False, "b": False}), "notB")
+        self.assertEqual(template.render({"b": True}), "B")
+
+    def test_loops(self):
+        path = self.write("t.html", "<ul>{% for post in posts %}<li>{{ loop.index }}:{{ post.title }}</li>{% endfor %}</ul>")
+        html = compile_template(path).render({"posts": [{"title": "one"}, {"title": "two"}]})
+        self.assertEqual(html, "<ul><li>1:one</li><li>2:two</li></ul>")
+
+    def test_inheritance(self):
+        self.write("base.html", "<head>{% block head %}default{% endblock %}</head><body>{% block body %}{% endblock %}</body>")
+        path = self.write("page.html", '{% extends "base.html" %}ignored{% block body %}{{ Content }}{% endblock %}')
+        template = compile_template(path)
+        self.assertEqual(template.render({"Content": "hello"}), "<head>default</head><body>hello</body>")
+        self.assertEqual([os.path.basename(p) for p in template.dependencies], ["page.html", "base.html"])
+
+    def test_load_template_is_cached(self):
+        path = self.write("t.html", "{{ Title }}")
+        first = load_template(path)
+        self.write("t.html", "changed")
+        self.assertIs(load_template(path), first)
+        clear_template_cache()
+        self.assertEqual(load_template(path).render({}), "changed")
+
+    def test_syntax_errors(self):
+        path = self.write("t.html", "line\n{% for x %}")
+        with self.assertRaises(TemplateSyntaxError) as context:
+            compile_template(path)
+        self.assertIn(":2:", str(context.exception))
+        path = self.write("u.html", "{% if x %}")
+        with self.assertRaises(TemplateSyntaxError):
+            compile_template(path)
+
+    def test_include_partials(self):
+        os.makedirs(os.path.join(self.tmp.name, "partials"))
+        self.write("partials/nav.html", '<nav><a href="/">{{ Title }}</a>{% include "links.html" %}</nav>')
+        self.write("partials/links.html", "<a href=\"/blog\">blog</a>")
+        path = self.write("t.html", '{% if Title %}{% include "partials/nav.html" %}{% endif %}{{ Content }}')
+        template = compile_template(path, "/site/")
+        self.assertEqual(template.render({"Title": "Hi", "Content": "x"}), '<nav><a href="/site/">Hi</a><a href="/site/blog">blog</a></nav>x')
+        self.assertEqual([os.path.relpath(p, self.tmp.name) for p in template.dependencies], ["t.html", os.path.join("partials", "nav.html"), os.path.join("partials", "links.html")])
+
+    def test_circular_include(self):
+        self.write("a.html", '{% include "b.html" %}')
+        self.write("b.html", '{% include "a.html" %}')
+        path = self.write("t.html", '{% include "a.html" %}')
+        with self.assertRaises(TemplateSyntaxError):
+            compile_template(path)
@@ -1,6 +1,7 @@
 import unittest
 from textnode import TextNode, TextType
-from transformers import text_node_to_html_node, split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes, markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node
+from transformers import text_node_to_html_node, split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes, markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node, InvalidMarkdownError, iter_blocks, lines_to_html_node, BlockCache, block_tree
+from urls import url_rewriter
 
 
 class TestTransformersFn(unittest.TestCase):
@@ -260,6 +261,72 @@ class TestTextToNodes(unittest.TestCase):
             TextNode("second link", TextType.LINK, "https://www.google.com"),
         ])
 
+    def test_link_url_is_not_split_on_delimiters(self):
+        nodes = text_to_textnodes("see [docs](/a_b_c/**x**) now")
+        self.assertListEqual(nodes, [
+            TextNode("see ", TextType.NORMAL),
+            TextNode("docs", TextType.LINK, "/a_b_c/**x**"),
+            TextNode(" now", TextType.NORMAL),
+        ])
+
+    def test_code_span_is_literal(self):
+        nodes = text_to_textnodes("run `a_b **c**` _now_")
+        self.assertListEqual(nodes, [
+            TextNode("run ", TextType.NORMAL),
+            TextNode("a_b **c**", TextType.CODE),
+            TextNode(" ", TextType.NORMAL),
+            TextNode("now", TextType.ITALIC),
+        ])
+
+    def test_nested_emphasis(self):
+        nodes = text_to_textnodes("a **b _c_ d** e")
+        self.assertListEqual(nodes, [
+            TextNode("a ", TextType.NORMAL),
+            TextNode("b _c_ d", TextType.BOLD),
+            TextNode(" e", TextType.NORMAL),
+        ])
+        html = markdown_to_html_node("_it **b** x_ and **b _i_**").to_html()
+        self.assertEqual(html, "<div><p><i>it <b>b</b> x</i> and <b>b <i>i</i></b></p></div>")
+
+    def test_underscores_inside_bold(self):
+        for name in ("my_var", "file_name"):
+            nodes = text_to_textnodes(f"**{name}** is set")
+            self.assertListEqual(nodes, [TextNode(name, TextType.BOLD), TextNode(" is set", TextType.NORMAL)])
+        html = markdown_to_html_node("_see **snake_case** here_").to_html()
+        self.assertEqual(html, "<div><p><i>see <b>snake_case</b> here</i></p></div>")
+
+    def test_image_inside_link_brackets(self):
+        nodes = text_to_textnodes("a [![i](/p.png)](/u) b")
+        self.assertListEqual(nodes, [
+            TextNode("a [", TextType.NORMAL),
+            TextNode("i", TextType.IMAGE, "/p.png"),
+            TextNode("](/u) b", TextType.NORMAL),
+        ])
+        nodes = text_to_textnodes("[see ![i](/p)](/u)")
+        self.assertListEqual(nodes, [
+            TextNode("[see ", TextType.NORMAL),
+            TextNode("i", TextType.IMAGE, "/p"),
+            TextNode("](/u)", TextType.NORMAL),
+        ])
+        nodes = text_to_textnodes("[](![i](/p)) and [`x`](/u)")
+        self.assertListEqual(nodes, [
+            TextNode("[](", TextType.NORMAL),
+            TextNode("i", TextType.IMAGE, "/p"),
+            TextNode(") and [", TextType.NORMAL),
+            TextNode("x", TextType.CODE),
+            TextNode("](/u)", TextType.NORMAL),
+        ])
+
+    def test_unbalanced_delimiter(self):
+        with self.assertRaises(InvalidMarkdownError) as context:
+            text_to_textnodes("This is **broken text")
+        self.assertEqual(context.exception.delimiter, "**")
+        self.assertEqual(context.exception.position, 8)
+
+    def test_unbalanced_delimiter_not_strict(self):
+        nodes = text_to_textnodes("a **b and `c", strict=False)
+        self.assertListEqual(nodes, [TextNode("a **b and `c", TextType.NORMAL)])
+
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_markdown_to_block(self):
         md = """
@@ -302,6 +369,32 @@ This is the same paragraph on a new line
             "- This is a list\n- with items",
         ])
 
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "intro\n\n```\nfirst\n\nsecond\n```\n\noutro"
+        self.assertListEqual(markdown_to_blocks(md), ["intro", "```\nfirst\n\nsecond\n```", "outro"])
+
+class TestIterBlocks(unittest.TestCase):
+    def test_yields_blocks_with_types(self):
+        lines = iter(["# Title\n", "\n", "- a\n", "- b\n", "\n", "\n", "``` one line ```\n", "text\n"])
+        self.assertListEqual(list(iter_blocks(lines)), [
+            ("# Title", BlockType.HEADING),
+            ("- a\n- b", BlockType.UNORDERED),
+            ("``` one line ```", BlockType.CODE),
+            ("text", BlockType.PARAGRAPH),
+        ])
+
+    def test_fence_ends_block_without_blank_line(self):
+        blocks = list(iter_blocks(["```", "code", "", "```", "after"]))
+        self.assertListEqual(blocks, [("```\ncode\n\n```", BlockType.CODE), ("after", BlockType.PARAGRAPH)])
+
+    def test_unterminated_fence_is_a_paragraph(self):
+        self.assertListEqual(list(iter_blocks(["```", "code"])), [("```\ncode", BlockType.PARAGRAPH)])
+
+    def test_lines_to_html_node_streams_blocks(self):
+        lines = iter(["Some **bold**\n", "\n", "```\n", "x\n", "\n", "y\n", "```\n"])
+        node = lines_to_html_node(lines)
+        self.assertEqual(node.to_html(), "<div><p>Some <b>bold</b></p><pre><code>x\n\ny\n</code></pre></div>")
+
 class TestBlockToBlockType(unittest.TestCase):
     def test_block_to_block_heading(self):
         block = "##### This is a h5"
@@ -354,6 +447,14 @@ class TestBlockToBlockType(unittest.TestCase):
         self.assertEqual(block_type, BlockType.PARAGRAPH)
 
 class TestMarkdownToHtmlNode(unittest.TestCase):
+    def test_urls_rewritten_in_links_and_images_only(self):
+        md = "[home](/index.html) ![pic](/a.png) [ext](https://x.org/)\n\n```\n<a href=\"/raw\">\n```"
+        html = markdown_to_html_node(md, url_rewriter("/site/")).to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/index.html">home</a> <img src="/site/a.png" alt="pic"></img> <a href="https://x.org/">ext</a></p><pre><code><a href="/raw">\n</code></pre></div>',
+        )
+
     def test_paragraphs(self):
         md = """
 This is **bolded** paragraph
@@ -476,4 +577,40 @@ this is paragraph text
         self.assertEqual(
             html,
             "<div><ul><li>This is a list</li><li>with items</li><li>and <i>more</i> items</li></ul><ol><li>This is an <code>ordered</code> list</li><li>with items</li><li>and more items</li></ol></div>",
-        )
\ No newline at end of file
+        )
+
+class TestBlockCache(unittest.TestCase):
+    def test_repeated_block_hits(self):
+        cache = BlockCache(maxsize=4)
+        first = cache.render(BlockType.PARAGRAPH, "shared **footer**")
+        second = cache.render(BlockType.PARAGRAPH, "shared **footer**")
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+        self.assertEqual(second.to_html(), "<p>shared <b>footer</b></p>")
+
+    def test_block_tree_unwraps_memoized_blocks(self):
+        block = BlockCache(maxsize=4).render(BlockType.PARAGRAPH, "a [link](/u)")
+        self.assertEqual(block_tree(block).tag, "p")
+        self.assertIs(block_tree(block_tree(block)), block_tree(block))
+
+    def test_lru_bound(self):
+        cache = BlockCache(maxsize=2)
+        cache.render(BlockType.PARAGRAPH, "a")
+        cache.render(BlockType.PARAGRAPH, "b")
+        cache.render(BlockType.PARAGRAPH, "a")
+        cache.render(BlockType.PARAGRAPH, "c")
+        self.assertEqual(list(cache.entries), ["a", "c"])
+
+    def test_disabled(self):
+        cache = BlockCache(maxsize=0)
+        cache.render(BlockType.PARAGRAPH, "a")
+        cache.render(BlockType.PARAGRAPH, "a")
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "size": 0})
+
+    def test_output_matches_uncached(self):
+        md = "# Title\n\n```\ncode\n```\n\n> quote\n\n- item\n\n# Title"
+        cache = BlockCache()
+        blocks = list(iter_blocks(md.split("\n")))
+        cached = "".join(cache.render(block_type, block).to_html() for block, block_type in blocks)
+        self.assertEqual(markdown_to_html_node(md).to_html(), f"<div>{cached}</div>")
+        self.assertEqual(cache.stats()["hits"], 1)
@@ -0,0 +1,26 @@
+import unittest
+from urls import UrlRewriter, url_rewriter
+
+
+class TestUrlRewriter(unittest.TestCase):
+    def test_root_basepath_is_noop(self):
+        self.assertEqual(UrlRewriter().rewrite("/a.png"), "/a.png")
+
+    def test_rewrites_site_absolute_urls(self):
+        urls = UrlRewriter("/site/")
+        self.assertEqual(urls.rewrite("/blog/tom"), "/site/blog/tom")
+        self.assertEqual(urls.rewrite("relative.png"), "relative.png")
+        self.assertEqual(urls.rewrite("//cdn.example.com/x.js"), "//cdn.example.com/x.js")
+        self.assertEqual(urls.rewrite("https://example.com/"), "https://example.com/")
+
+    def test_rewrite_html_touches_href_and_src_only(self):
+        urls = UrlRewriter("/site/")
+        html = '<a href="/a">/a</a><img src="/b.png" alt="/c" />'
+        self.assertEqual(urls.rewrite_html(html), '<a href="/site/a">/a</a><img src="/site/b.png" alt="/c" />')
+
+    def test_url_rewriter_is_shared(self):
+        self.assertIs(url_rewriter("/site/"), url_rewriter("/site/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from utils import extract_title
+import io
+from utils import extract_title, extract_title_from_lines
 
 class TestExtractTitle(unittest.TestCase):
     def test_extract_title(self):
@@ -31,3 +32,8 @@ that's all
             title = extract_title(md)
         self.assertEqual(str(context.exception), "Markdown doesn't have a valid title")
 
+
+    def test_extract_title_from_lines_stops_at_heading(self):
+        source = io.StringIO("intro\n# Title\nrest\n")
+        self.assertEqual(extract_title_from_lines(source), "Title")
+        self.assertEqual(source.readline(), "rest\n")
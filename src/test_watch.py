@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+import page_index
+from watch import SiteState, RELOAD_SCRIPT, diff_signatures
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "<html><body><h1>{{ Title }}</h1>{{ Content }}</body></html>")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nworld")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.state = SiteState(self.content, self.template, self.static)
+        self.state.build()
+
+    def tearDown(self):
+        page_index.disable()
+        self.tmp.cleanup()
+
+    def write(self, path, text, mtime=None):
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def page(self, url):
+        body, _ = self.state.lookup(url)
+        return body.decode("utf-8") if body is not None else None
+
+    def test_pages_served_from_memory_with_reload_script(self):
+        html = self.page("/")
+        self.assertIn("<h1>Home</h1>", html)
+        self.assertIn(RELOAD_SCRIPT + "</body>", html)
+        self.assertIn("world", self.page("/blog/post"))
+
+    def test_static_files_served_from_disk(self):
+        body, content_type = self.state.lookup("/index.css")
+        self.assertEqual(body, b"body {}")
+        self.assertEqual(content_type, "text/css")
+        self.assertEqual(self.state.lookup("/../template.html"), (None, None))
+        os.makedirs(os.path.join(self.tmp.name, "staticX"))
+        self.write(os.path.join(self.tmp.name, "staticX", "secret.txt"), "secret")
+        self.assertEqual(self.state.lookup("/../staticX/secret.txt"), (None, None))
+
+    def test_refresh_only_rerenders_changed_pages(self):
+        self.assertFalse(self.state.refresh())
+        post_tree = self.state.pages[os.path.join(self.content, "blog", "post.md")]["node"]
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged", mtime=1)
+        version = self.state.version
+        self.assertTrue(self.state.refresh())
+        self.assertEqual(self.state.version, version + 1)
+        self.assertIn("changed", self.page("/"))
+        self.assertIs(self.state.pages[os.path.join(self.content, "blog", "post.md")]["node"], post_tree)
+
+    def test_template_change_rerenders_without_reparsing(self):
+        tree = self.state.pages[os.path.join(self.content, "index.md")]["node"]
+        self.write(self.template, "<html><body><h2>{{ Title }}</h2>{{ Content }}</body></html>", mtime=1)
+        self.state.refresh()
+        self.assertIn("<h2>Home</h2>", self.page("/"))
+        self.assertIs(self.state.pages[os.path.join(self.content, "index.md")]["node"], tree)
+
+    def test_partial_change_rerenders_only_its_layout(self):
+        root = self.tmp.name
+        self.write(os.path.join(root, "nav.html"), "<nav>one</nav>")
+        self.write(os.path.join(root, "post.html"), '<html><body>{% include "nav.html" %}{{ Content }}</body></html>')
+        self.write(os.path.join(self.content, "blog", ".layout"), "post.html", mtime=1)
+        self.assertTrue(self.state.refresh())
+        self.assertIn("<nav>one</nav>", self.page("/blog/post"))
+        home = self.page("/")
+        home_output = self.state.outputs["/index.html"]
+        self.write(os.path.join(root, "nav.html"), "<nav>two</nav>", mtime=1)
+        self.assertTrue(self.state.refresh())
+        self.assertIn("<nav>two</nav>", self.page("/blog/post"))
+        self.assertEqual(self.page("/"), home)
+        self.assertIs(self.state.outputs["/index.html"], home_output)
+
+    def test_removed_page_is_dropped(self):
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.state.refresh()
+        self.assertIsNone(self.page("/blog/post"))
+
+    def test_pages_follow_slugs_and_drafts_on_refresh(self):
+        self.write(os.path.join(self.content, "blog", "post.md"), "---\nslug: renamed\n---\n# Post\n\nworld", mtime=1)
+        self.state.refresh()
+        self.assertIsNone(self.page("/blog/post"))
+        self.assertIn("world", self.page("/blog/renamed"))
+        self.write(os.path.join(self.content, "blog", "post.md"), "---\nslug: renamed\ndraft: true\n---\n# Post\n\nworld", mtime=2)
+        self.state.refresh()
+        self.assertIsNone(self.page("/blog/renamed"))
+        self.write(os.path.join(self.content, "draft.md"), "---\ndraft: true\n---\n# Draft\n\nsecret", mtime=1)
+        self.state.refresh()
+        self.assertIsNone(self.page("/draft.html"))
+
+    def test_pages_render_with_header_variables(self):
+        page_index.configure(":memory:")
+        self.write(self.template, "<html><body>{{ Page.date }}{% for page in Related %}<a href=\"{{ page.url }}\">{{ page.title }}</a>{% endfor %}{{ Content }}</body></html>", mtime=1)
+        self.write(os.path.join(self.content, "index.md"), "---\ntags: [a]\n---\n# Home\n\nhello", mtime=1)
+        self.write(os.path.join(self.content, "blog", "post.md"), "---\ndate: 2024-05-01\n---\n# Post\n\nworld", mtime=1)
+        self.state.refresh()
+        self.assertIn("2024-05-01", self.page("/blog/post"))
+        self.assertNotIn("<a href", self.page("/"))
+        # Tagging the post relates it to the home page, which is rendered
+        # again though its own source didn't change.
+        self.write(os.path.join(self.content, "blog", "post.md"), "---\ndate: 2024-05-01\ntags: [a]\n---\n# Post\n\nworld", mtime=2)
+        self.state.refresh()
+        self.assertIn('<a href="/blog/post.html">Post</a>', self.page("/"))
+
+    def test_diff_signatures(self):
+        changed, removed = diff_signatures({"a": (1, 1), "b": (1, 1)}, {"a": (1, 2), "c": (1, 1)})
+        self.assertEqual(sorted(changed), ["a", "c"])
+        self.assertEqual(removed, ["b"])
@@ -1,9 +1,23 @@
 import re
+from collections import OrderedDict
 from leafnode import LeafNode
 from textnode import TextType, TextNode
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, shared_props
 from enum import Enum
 from parentnode import ParentNode
+from profiling import stage
+
+# Bump whenever parsing output changes, so cached node trees are rebuilt.
+PARSER_VERSION = 3
+
+INLINE_MARKUP = re.compile(r"\*\*|!\[|[`_\[]")
+EMPHASIS_TYPES = {"**": TextType.BOLD, "_": TextType.ITALIC}
+
+class InvalidMarkdownError(ValueError):
+    def __init__(self, message, delimiter=None, position=None):
+        super().__init__(message)
+        self.delimiter = delimiter
+        self.position = position
 
 class BlockType(Enum):
     PARAGRAPH = 'paragraph'
@@ -14,7 +28,7 @@ class BlockType(Enum):
     ORDERED = 'ordered_list'
 
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, urls=None):
     if text_node.text_type not in TextType:
         raise Exception("Text type not allowed")
     match text_node.text_type:
@@ -22,16 +36,30 @@ def text_node_to_html_node(text_node):
             clean_text = text_node.text.replace("\n", " ")
             return LeafNode(None, clean_text)
         case TextType.BOLD:
-            return LeafNode("b", text_node.text)
+            return inline_html_node("b", text_node.text, None, urls)
         case TextType.ITALIC:
-            return LeafNode("i", text_node.text)
+            return inline_html_node("i", text_node.text, None, urls)
         case TextType.CODE:
             return LeafNode("code", text_node.text)
         case TextType.LINK:
-            return LeafNode("a", text_node.text, {"href": text_node.url})
+            url = urls.rewrite(text_node.url) if urls is not None else text_node.url
+            return inline_html_node("a", text_node.text, shared_props(("href", url)), urls)
         case TextType.IMAGE:
-            return LeafNode("img", "", {"src":text_node.url, "alt":text_node.text})
-        
+            if urls is None:
+                return LeafNode("img", "", shared_props(("src", text_node.url), ("alt", text_node.text)))
+            props = (("src", urls.rewrite(text_node.url)), ("alt", text_node.text)) + urls.image_attributes(text_node.url)
+            return LeafNode("img", "", shared_props(*props))
+
+def inline_html_node(tag, text, props=None, urls=None):
+    # Emphasis and link text keep their raw markdown, so nested markup such
+    # as **bold _and italic_** is expanded here into child nodes.
+    if INLINE_MARKUP.search(text) is None:
+        return LeafNode(tag, text, props)
+    text_nodes = text_to_textnodes(text, strict=False)
+    if len(text_nodes) == 1 and text_nodes[0].text_type == TextType.NORMAL:
+        return LeafNode(tag, text, props)
+    return ParentNode(tag, [text_node_to_html_node(node, urls) for node in text_nodes], props)
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for node in old_nodes:
@@ -41,7 +69,7 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
         split_list = []
         splitted_node = node.text.split(delimiter)
         if len(splitted_node) % 2 == 0:
-            raise Exception(f"Is not valid markdown syntax")
+            raise InvalidMarkdownError("Is not valid markdown syntax", delimiter)
         for i in range(len(splitted_node)):
             if splitted_node[i] == '':
                 continue
@@ -110,23 +138,187 @@ def split_nodes_link(old_nodes):
         new_nodes.extend(node_list)
     return new_nodes
 
-def text_to_textnodes(text):
-    initial_node = TextNode(text,TextType.NORMAL)
-    bold_text = split_nodes_delimiter([initial_node], "**", TextType.BOLD)
-    italic_text = split_nodes_delimiter(bold_text, "_", TextType.ITALIC)
-    code_text = split_nodes_delimiter(italic_text, "`", TextType.CODE)
-    images_extract = split_nodes_image(code_text)
-    links_extract = split_nodes_link(images_extract)
-    return links_extract
+class TextFinder():
+    # Memoizes str.find per needle: once the next occurrence after some
+    # position is known, any later search starting before it has the same
+    # answer, which keeps failed bracket and delimiter lookups linear.
+    def __init__(self, text):
+        self.text = text
+        self.found = {}
 
-def markdown_to_blocks(markdown):
-    blocks = markdown.split("\n\n")
-    new_blocks = []
-    for item in blocks:
-        if item in "":
+    def find(self, needle, start):
+        cached = self.found.get(needle)
+        if cached is not None and cached[0] <= start and (cached[1] == -1 or cached[1] >= start):
+            return cached[1]
+        index = self.text.find(needle, start)
+        self.found[needle] = (start, index)
+        return index
+
+def match_bracket(finder, start):
+    # Mirrors the link regex: [text](url) on a single line, where the text
+    # ends at the first "](" and the url at the next ")".
+    text = finder.text
+    line_end = finder.find("\n", start)
+    if line_end == -1:
+        line_end = len(text)
+    close = finder.find("](", start + 1)
+    if close == -1 or close > line_end:
+        return None
+    end = finder.find(")", close + 2)
+    if end == -1 or end > line_end:
+        return None
+    return text[start + 1:close], text[close + 2:end], end + 1
+
+def overlaps_span(finder, token, start, end):
+    # Code spans are matched before images and links, and images before
+    # the links around them, so [![alt](src)](url) keeps its image and a
+    # backtick inside brackets starts a code span instead.
+    tick = finder.find("`", start)
+    if tick != -1 and tick < end:
+        return True
+    if token == "![":
+        return False
+    image = finder.find("![", start + 1)
+    return image != -1 and image < end and match_bracket(finder, image + 1) is not None
+
+def holds_last_closer(finder, stack, start, end):
+    # Inside emphasis, a code span or link that holds the only remaining
+    # closer of an open span is read as text, so the span still closes, as
+    # in **[a**]( ).
+    for delimiter, _ in stack:
+        closer = finder.find(delimiter, start)
+        if closer != -1 and closer < end and finder.find(delimiter, end) == -1:
+            return True
+    return False
+
+def scan_inline(text, literal):
+    nodes = []
+    stack = []
+    finder = TextFinder(text)
+    pending = 0
+    position = 0
+    while True:
+        match = INLINE_MARKUP.search(text, position)
+        if match is None:
+            break
+        start = match.start()
+        token = match.group()
+        if token == "`":
+            if start in literal:
+                position = start + 1
+                continue
+            end = finder.find("`", start + 1)
+            if stack and (end == -1 or holds_last_closer(finder, stack, start + 1, end + 1)):
+                # Emphasis text is parsed again leniently, so only an
+                # unbalanced delimiter outside any span is an error.
+                position = start + 1
+                continue
+            if end == -1:
+                raise InvalidMarkdownError(f"Unbalanced '`' delimiter at position {start}", "`", start)
+            if not stack:
+                if start > pending:
+                    nodes.append(TextNode(text[pending:start], TextType.NORMAL))
+                if end > start + 1:
+                    nodes.append(TextNode(text[start + 1:end], TextType.CODE))
+                pending = end + 1
+            position = end + 1
+            continue
+        if token == "![" or token == "[":
+            bracket = match_bracket(finder, start + len(token) - 1)
+            if bracket is None or overlaps_span(finder, token, start, bracket[2]) or (stack and holds_last_closer(finder, stack, start, bracket[2])):
+                position = start + len(token)
+                continue
+            label, url, end = bracket
+            if not stack:
+                if start > pending:
+                    nodes.append(TextNode(text[pending:start], TextType.NORMAL))
+                text_type = TextType.IMAGE if token == "![" else TextType.LINK
+                nodes.append(TextNode(label, text_type, url))
+                pending = end
+            position = end
+            continue
+        position = start + len(token)
+        if start in literal:
+            continue
+        if stack and stack[-1][0] != token and any(delimiter == token for delimiter, _ in stack):
+            inner = stack[-1][0]
+            inner_close = finder.find(inner, position)
+            if inner_close != -1 and finder.find(token, inner_close + len(inner)) != -1:
+                # The innermost span closes later and this span after it,
+                # so this is part of the inner text, as in
+                # _see **snake_case** here_.
+                continue
+            # Inner openers that never close are plain text of the span
+            # being closed, as in **my_var**.
+            while stack[-1][0] != token:
+                stack.pop()
+        if stack and stack[-1][0] == token:
+            _, content_start = stack.pop()
+            if not stack:
+                if start > content_start:
+                    nodes.append(TextNode(text[content_start:start], EMPHASIS_TYPES[token]))
+                pending = position
+        else:
+            if not stack and start > pending:
+                nodes.append(TextNode(text[pending:start], TextType.NORMAL))
+                pending = start
+            stack.append((token, position))
+    if stack:
+        delimiter, content_start = stack[0]
+        opener_position = content_start - len(delimiter)
+        raise InvalidMarkdownError(f"Unbalanced '{delimiter}' delimiter at position {opener_position}", delimiter, opener_position)
+    if len(text) > pending:
+        nodes.append(TextNode(text[pending:], TextType.NORMAL))
+    return nodes
+
+def text_to_textnodes(text, strict=True):
+    # Single left-to-right scan: code spans, images and links are matched
+    # as they are met and emphasis is tracked on a stack, so nested
+    # delimiters work and link urls never get split on "_" or "**".
+    literal = set()
+    while True:
+        try:
+            return scan_inline(text, literal)
+        except InvalidMarkdownError as error:
+            if strict or error.position in literal:
+                raise
+            literal.add(error.position)
+
+def iter_blocks(lines):
+    # Line-at-a-time state machine: blocks are separated by blank lines,
+    # except inside a ``` fence, which runs until its closing line. Each
+    # block is yielded with its BlockType as soon as it ends, so a file
+    # iterator can be rendered without holding the whole document.
+    block_lines = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if in_fence:
+            block_lines.append(line)
+            if line.rstrip().endswith("```"):
+                yield "\n".join(block_lines).strip(), BlockType.CODE
+                block_lines = []
+                in_fence = False
             continue
-        new_blocks.append(item.strip())
-    return new_blocks
+        if not line.strip():
+            if block_lines:
+                block = "\n".join(block_lines).strip()
+                yield block, block_to_block_type(block)
+                block_lines = []
+            continue
+        if not block_lines and line.lstrip().startswith("```"):
+            stripped = line.strip()
+            if len(stripped) >= 6 and stripped.endswith("```"):
+                yield stripped, BlockType.CODE
+                continue
+            in_fence = True
+        block_lines.append(line)
+    if block_lines:
+        block = "\n".join(block_lines).strip()
+        yield block, BlockType.PARAGRAPH if in_fence else block_to_block_type(block)
+
+def markdown_to_blocks(markdown):
+    return [block for block, _ in iter_blocks(markdown.split("\n"))]
 
 def block_to_block_type(block):
     if block[0] == ">":
@@ -147,11 +339,11 @@ def block_to_block_type(block):
         return BlockType.ORDERED
     return BlockType.PARAGRAPH
 
-def text_to_children(text):
+def text_to_children(text, urls=None):
     text_nodes = text_to_textnodes(text)
     html_nodes = []
     for node in text_nodes:
-        html_node = text_node_to_html_node(node)
+        html_node = text_node_to_html_node(node, urls)
         html_nodes.append(html_node)
     return html_nodes
 
@@ -164,7 +356,7 @@ def count_leading_hashes(s):
             break
     return count
 
-def type_block_to_html_node(block_type, block):
+def type_block_to_html_node(block_type, block, urls=None):
     match block_type:
         case BlockType.QUOTE:
             lines = block.split("\n")
@@ -176,7 +368,7 @@ def type_block_to_html_node(block_type, block):
                 else:
                     cleaned_lines.append(line)
             cleaned_block = "\n".join(cleaned_lines)
-            children = text_to_children(cleaned_block)
+            children = text_to_children(cleaned_block, urls)
 
             quote_node = HTMLNode("blockquote", None, children)
             return quote_node
@@ -184,7 +376,7 @@ def type_block_to_html_node(block_type, block):
             lines = block.split("\n")
             ul_children = []
             for line in lines:
-                li_children = text_to_children(line[2:].lstrip())
+                li_children = text_to_children(line[2:].lstrip(), urls)
                 li_node = HTMLNode("li", None, li_children)
                 ul_children.append(li_node)
             ul_node = HTMLNode("ul", None, ul_children)
@@ -198,30 +390,157 @@ def type_block_to_html_node(block_type, block):
             return pre_node
         case BlockType.HEADING:
             heading_number = count_leading_hashes(block)
-            children = text_to_children(block[heading_number+1:].lstrip())
+            children = text_to_children(block[heading_number+1:].lstrip(), urls)
             heading_node = HTMLNode(f"h{heading_number}", None, children)
             return heading_node
         case BlockType.ORDERED:
             lines = block.split("\n")
             ol_children = []
             for line in lines:
-                li_children = text_to_children(line[2:].lstrip())
+                li_children = text_to_children(line[2:].lstrip(), urls)
                 li_node = HTMLNode("li", None, li_children)
                 ol_children.append(li_node)
             ol_node = HTMLNode("ol", None, ol_children)
             return ol_node
         case BlockType.PARAGRAPH:
-            children = text_to_children(block)
+            children = text_to_children(block, urls)
             paragraph_node = HTMLNode("p", None, children)
             return paragraph_node
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for item in blocks:
-        block_type = block_to_block_type(item)
-        node = type_block_to_html_node(block_type, item)
-        children.append(node)
+# Props holding the URL of link and image nodes.
+URL_ATTRIBUTES = {"a": "href", "img": "src"}
+REFERENCE_KINDS = {"a": "link", "img": "image"}
+
+def add_references(node, references):
+    # Appends the (kind, url) of every link and image under node.
+    tag = node.tag
+    if tag in URL_ATTRIBUTES and node.props:
+        url = node.props.get(URL_ATTRIBUTES[tag])
+        if url:
+            references.append((REFERENCE_KINDS[tag], url))
+    if node.children:
+        for child in node.children:
+            add_references(child, references)
+
+def bound_props(tag, props, urls):
+    attribute = URL_ATTRIBUTES[tag]
+    pairs = [(name, urls.rewrite(value) if name == attribute else value) for name, value in props.items()]
+    if tag == "img":
+        pairs.extend(urls.image_attributes(props[attribute]))
+    return shared_props(*pairs)
+
+def bind_node(node, urls, references=None):
+    # Parsed trees keep their source URLs so they can be cached for any
+    # basepath, asset map or image set; this publishes them through urls
+    # for one page. Nodes without a link or image below them are shared
+    # with the parsed tree, not copied. The source URLs are appended to
+    # references when given.
+    if node.__class__ is RenderedBlock:
+        if references is not None:
+            references.extend(node.references)
+        return node.bind(urls)
+    props = node.props
+    if node.tag in URL_ATTRIBUTES and props and URL_ATTRIBUTES[node.tag] in props:
+        if references is not None:
+            references.append((REFERENCE_KINDS[node.tag], props[URL_ATTRIBUTES[node.tag]]))
+        if urls is not None:
+            props = bound_props(node.tag, props, urls)
+    children = node.children
+    if children:
+        bound_children = [bind_node(child, urls, references) for child in children]
+        if any(bound is not child for bound, child in zip(bound_children, children)):
+            children = bound_children
+    if props is node.props and children is node.children:
+        return node
+    bound = node.__class__.__new__(node.__class__)
+    HTMLNode.__init__(bound, node.tag, node.value, children, props)
+    return bound
+
+class RenderedBlock(LeafNode):
+    # A memoized block: rendered once to an HTML fragment and shared by every
+    # page containing the same block text. The original tree stays reachable
+    # through source for code that needs the structure. Cached blocks hold
+    # source URLs; bind() gives the published form, rendered once per URL
+    # rewriter and shared in turn.
+    __slots__ = ("source", "references", "bound")
+
+    def __init__(self, source, references=None):
+        super().__init__(None, source.to_html())
+        self.source = source
+        if references is None:
+            references = []
+            add_references(source, references)
+        self.references = tuple(references)
+        self.bound = None
+
+    def bind(self, urls):
+        if urls is None or not self.references:
+            return self
+        if self.bound is None or self.bound[0] != urls.key:
+            self.bound = (urls.key, RenderedBlock(bind_node(self.source, urls), self.references))
+        return self.bound[1]
+
+def block_tree(node):
+    # The node tree behind a memoized block, or the node itself.
+    if node.__class__ is RenderedBlock:
+        return node.source
+    return node
+
+DEFAULT_BLOCK_CACHE_SIZE = 2048
+
+class BlockCache():
+    # Keyed on the block text alone: the cached blocks are independent of
+    # the URL rewriter, so one entry serves every basepath.
+    def __init__(self, maxsize=DEFAULT_BLOCK_CACHE_SIZE, max_block_chars=64 * 1024):
+        self.maxsize = maxsize
+        self.max_block_chars = max_block_chars
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, block_type, block, urls=None, references=None):
+        if self.maxsize <= 0 or len(block) > self.max_block_chars:
+            return bind_node(type_block_to_html_node(block_type, block), urls, references)
+        node = self.entries.get(block)
+        if node is not None:
+            self.entries.move_to_end(block)
+            self.hits += 1
+        else:
+            self.misses += 1
+            node = RenderedBlock(type_block_to_html_node(block_type, block))
+            self.entries[block] = node
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        if references is not None:
+            references.extend(node.references)
+        return node.bind(urls)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+block_cache = BlockCache()
+
+def configure_block_cache(maxsize):
+    global block_cache
+    block_cache = BlockCache(maxsize)
+    return block_cache
+
+def markdown_to_html_node(markdown, urls=None, references=None):
+    # Without urls the tree keeps the source URLs; see bind_node.
+    with stage("iter_blocks"):
+        blocks = list(iter_blocks(markdown.split("\n")))
+    with stage("type_block_to_html_node"):
+        children = [block_cache.render(block_type, block, urls, references) for block, block_type in blocks]
     parent_node = ParentNode("div", children)
     return parent_node
-        
+
+def iter_block_nodes(lines, urls=None, references=None):
+    for block, block_type in iter_blocks(lines):
+        with stage("type_block_to_html_node"):
+            node = block_cache.render(block_type, block, urls, references)
+        yield node
+
+def lines_to_html_node(lines, urls=None, references=None):
+    # The children are produced lazily while the page is serialized, so the
+    # returned node can only be rendered once.
+    return ParentNode("div", iter_block_nodes(lines, urls, references))
@@ -0,0 +1,77 @@
+import hashlib
+import re
+from functools import lru_cache
+
+URL_ATTRIBUTE = re.compile(r'\b(href|src)="(/[^"]*)"')
+
+
+class UrlRewriter():
+    # Maps site-absolute URLs to their published form: fingerprinted asset
+    # names first, then the basepath. Parsed trees keep their source URLs
+    # and are bound through rewrite() per page (transformers.bind_node),
+    # and templates call rewrite_html() on their static markup at compile
+    # time, so rendered pages are never rescanned. Known image dimensions
+    # ride along for image_attributes(). key identifies the whole mapping
+    # for in-memory caches; references_key() covers only the URLs a page
+    # or template uses, for the build manifest.
+    def __init__(self, basepath='/', assets=None, image_sizes=None):
+        self.basepath = basepath
+        self.assets = assets or {}
+        self.image_sizes = image_sizes
+        self.key = basepath
+        if self.assets or self.image_sizes is not None:
+            digest = hashlib.sha256()
+            for path, published in sorted(self.assets.items()):
+                digest.update(f"{path}\0{published}\0".encode())
+            if self.image_sizes is not None:
+                digest.update(b"images\0")
+                for path, (width, height) in sorted(self.image_sizes.items()):
+                    digest.update(f"{path}\0{width}x{height}\0".encode())
+            self.key = f"{basepath}@{digest.hexdigest()[:16]}"
+
+    def rewrite(self, url):
+        if url[:1] != '/' or url[:2] == '//':
+            return url
+        if self.assets:
+            path = url.split("?", 1)[0].split("#", 1)[0]
+            published = self.assets.get(path)
+            if published is not None:
+                url = published + url[len(path):]
+        if self.basepath == '/':
+            return url
+        return self.basepath + url[1:]
+
+    def image_attributes(self, url):
+        if self.image_sizes is None:
+            return ()
+        size = self.image_sizes.get(url.split("?", 1)[0].split("#", 1)[0])
+        lazy = (("loading", "lazy"), ("decoding", "async"))
+        if size is None:
+            return lazy
+        return (("width", str(size[0])), ("height", str(size[1]))) + lazy
+
+    def references_key(self, references):
+        # What the (kind, url) references publish as, so adding an unused
+        # image or asset leaves the key alone.
+        digest = hashlib.sha256()
+        for kind, url in references:
+            digest.update(f"{self.rewrite(url)}\0".encode())
+            if kind == "image":
+                digest.update(f"{self.image_attributes(url)!r}\0".encode())
+        return digest.hexdigest()[:16]
+
+    def rewrite_html(self, html):
+        return URL_ATTRIBUTE.sub(lambda match: f'{match.group(1)}="{self.rewrite(match.group(2))}"', html)
+
+    def __repr__(self):
+        return f"UrlRewriter({self.key})"
+
+
+def html_references(html):
+    # The site-absolute URLs rewrite_html() would rewrite, as references.
+    return [("link", url) for _, url in URL_ATTRIBUTE.findall(html)]
+
+
+@lru_cache(maxsize=None)
+def url_rewriter(basepath='/'):
+    return UrlRewriter(basepath)
@@ -1,6 +1,19 @@
 import os
 import shutil
-from transformers import markdown_to_html_node
+import profiling
+import parse_cache
+import minify
+import css
+import search
+import linkcheck
+from transformers import bind_node, lines_to_html_node, markdown_to_html_node
+from template import load_template
+from serializer import BufferedWriter
+from urls import url_rewriter
+from layouts import LayoutResolver, read_page_layout
+from frontmatter import skip_page_header, split_page_header
+from page_index import page_context as header_context, page_destination
+from site_index import SummaryRecorder, page_metadata, summary_of
 
 def copy_files_and_folders(src_path, dst_path):
     if os.path.isfile(src_path):
@@ -28,34 +41,174 @@ def copy_contents_to_folder(src_path, dst_path):
     copy_files_and_folders(src_path, dst_path)
 
 def extract_title(markdown):
-    lines = markdown.split("\n")
+    # Finds the first "# " line without splitting the whole document.
+    if markdown[:2] == "# ":
+        start = 0
+    else:
+        start = markdown.find("\n# ") + 1
+        if start == 0:
+            raise ValueError("Markdown doesn't have a valid title")
+    end = markdown.find("\n", start)
+    return markdown[start + 2:end if end != -1 else len(markdown)]
+
+def extract_title_from_lines(lines):
+    # Stops at the first "# " line, so on a file only the header is read.
     heading_line = next((line for line in lines if line[:2] == "# "), None)
     if heading_line == None:
         raise ValueError("Markdown doesn't have a valid title")
-    return heading_line[2:]
+    return heading_line[2:].rstrip("\n")
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r") as markdown:
-        content = markdown.read()
-    with open(template_path, "r") as template:
-        html_template = template.read()
-    html_node = markdown_to_html_node(content)
-    html_string = html_node.to_html()
-    title = extract_title(content)
-    html_template = html_template.replace('{{ Title }}', title)
-    html_template = html_template.replace('{{ Content }}', html_string)
-    html_template = html_template.replace('href="/', f'href="{basepath}')
-    html_template = html_template.replace('src="/', f'src="{basepath}')
+def page_context(title, html_node, styles=None, extra=None):
+    context = {"Title": title, "Content": html_node}
+    if styles is not None:
+        context["Styles"] = styles
+    if extra:
+        context.update(extra)
+    return context
+
+def render_page_to(write, template, title, html_node, extra=None):
+    writer = BufferedWriter(write)
+    page_writer = minify.page_writer(writer)
+    styles = css.page_styles(template, html_node)
+    template.render_to(page_writer.write, page_context(title, html_node, styles, extra))
+    page_writer.flush()
+    writer.flush()
+
+def write_page(template, title, html_node, dest_path, extra=None):
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, "w") as dest_file:
-        dest_file.write(html_template)
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        with open(tmp_path, "w") as dest_file:
+            render_page_to(dest_file.write, template, title, html_node, extra)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dest_path)
+
+def load_parsed_page(from_path, cache, urls):
+    with profiling.stage("read"):
+        with open(from_path, "r") as markdown:
+            text = markdown.read()
+    return parse_page(text, from_path, cache, urls)
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
+def parse_page(text, from_path, cache, urls):
+    # (title, node tree, references) for a page's whole source text, the
+    # references being the source URLs of its links and images. The cache
+    # holds trees with source URLs, published through urls per page.
+    content = split_page_header(text, from_path)[1]
+    references = []
+    if cache is None:
+        with profiling.stage("markdown_to_html_node"):
+            return extract_title(content), markdown_to_html_node(content, urls, references), references
+    key = cache.key_for(content)
+    with profiling.stage("parse_cache"):
+        cached = cache.get(key)
+    if cached is not None:
+        title, parsed = cached
+    else:
+        with profiling.stage("markdown_to_html_node"):
+            parsed = markdown_to_html_node(content)
+        title = extract_title(content)
+        cache.put(key, title, parsed)
+    with profiling.stage("bind_urls"):
+        html_node = bind_node(parsed, urls, references)
+    return title, html_node, references
+
+def generate_page(from_path, template_path, dest_path, basepath, urls=None, context=None):
+    # Returns the page's metadata for the site index. context holds extra
+    # template variables from the page's header.
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    with profiling.page(from_path):
+        with profiling.stage("load_template"):
+            template = load_template(template_path, basepath, urls)
+        if urls is None:
+            urls = url_rewriter(basepath)
+        stat = os.stat(from_path)
+        cache = parse_cache.cache
+        if cache is not None and stat.st_size <= parse_cache.MAX_SOURCE_BYTES:
+            title, html_node, references = load_parsed_page(from_path, cache, urls)
+            with profiling.stage("render_write"):
+                write_page(template, title, html_node, dest_path, context)
+            return parsed_page_metadata(from_path, dest_path, title, html_node, stat.st_mtime_ns, context, references)
+        with open(from_path, "r") as markdown:
+            with profiling.stage("extract_title"):
+                title = extract_title_from_lines(skip_page_header(markdown, from_path))
+                markdown.seek(0)
+            references = []
+            html_node = lines_to_html_node(skip_page_header(markdown, from_path), urls, references)
+            summary = SummaryRecorder()
+            html_node.children = summary.watch(html_node.children)
+            terms = None
+            if search.recording:
+                terms = search.TermRecorder()
+                html_node.children = terms.watch(html_node.children)
+            links = None
+            if linkcheck.recording:
+                links = linkcheck.LinkRecorder()
+                html_node.children = links.watch(html_node.children)
+            if css.stylesheet is not None and css.stylesheet.critical:
+                # The critical subset needs the whole tree before the head
+                # is written.
+                html_node.children = list(html_node.children)
+            with profiling.stage("render_write"):
+                write_page(template, title, html_node, dest_path, context)
+        return page_metadata(from_path, dest_path, title, summary.summary, stat.st_mtime_ns, page_date(context), terms.terms() if terms is not None else None, links.links if links is not None else None, references)
+
+def parsed_page_metadata(from_path, dest_path, title, html_node, mtime_ns, context=None, references=()):
+    terms = None
+    if search.recording:
+        with profiling.stage("search_terms"):
+            terms = search.page_terms(html_node.children)
+    links = None
+    if linkcheck.recording:
+        with profiling.stage("collect_links"):
+            links = linkcheck.page_links(html_node.children)
+    return page_metadata(from_path, dest_path, title, summary_of(html_node.children), mtime_ns, page_date(context), terms, links, references)
+
+def render_page(text, mtime_ns, from_path, template_path, dest_path, basepath, urls=None, context=None):
+    # generate_page for a source already read, returning the page's HTML
+    # instead of writing it, along with its metadata.
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    with profiling.page(from_path):
+        with profiling.stage("load_template"):
+            template = load_template(template_path, basepath, urls)
+        if urls is None:
+            urls = url_rewriter(basepath)
+        title, html_node, references = parse_page(text, from_path, parse_cache.cache, urls)
+        parts = []
+        with profiling.stage("render"):
+            render_page_to(parts.append, template, title, html_node, context)
+        return "".join(parts), parsed_page_metadata(from_path, dest_path, title, html_node, mtime_ns, context, references)
+
+def page_date(context):
+    return context["Page"]["date"] if context and "Page" in context else None
+
+def generate_content_page(from_path, roots, layouts, basepath, urls, index):
+    # Drafts are skipped; slug, layout and header variables come from the
+    # page's header.
+    content_root, dest_root = roots
+    dest_path = page_destination(from_path, content_root, dest_root)
+    if dest_path is None:
+        return
+    page_template = layouts.template_for(from_path, read_page_layout(from_path))
+    context = header_context(from_path, content_root, dest_root, urls)
+    metadata = generate_page(from_path, page_template, dest_path, basepath, urls, context)
+    if index is not None:
+        index.add(metadata)
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, urls=None, layouts=None, index=None, roots=None):
     if not os.path.exists(dir_path_content):
         raise ValueError('Cannot found the content folder')
+    if layouts is None:
+        layouts = LayoutResolver(dir_path_content, template_path)
+    if urls is None:
+        urls = url_rewriter(basepath)
     if os.path.isfile(dir_path_content) and dir_path_content[-3:] == '.md':
-        generate_page(dir_path_content, template_path, f"{dest_dir_path[:-3]}.html", basepath)
+        roots = (os.path.dirname(dir_path_content), os.path.dirname(dest_dir_path))
+        generate_content_page(dir_path_content, roots, layouts, basepath, urls, index)
+        return
+    if roots is None:
+        roots = (dir_path_content, dest_dir_path)
     entries = os.listdir(dir_path_content)
     if len(entries) == 0:
         return
@@ -63,8 +216,23 @@ def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, bas
         new_path = os.path.join(dest_dir_path, item)
         old_path = os.path.join(dir_path_content, item)
         if os.path.isfile(old_path) and old_path[-3:] == '.md':
-            generate_page(old_path, template_path, f"{new_path[:-3]}.html", basepath)
+            generate_content_page(old_path, roots, layouts, basepath, urls, index)
         elif os.path.isdir(old_path):
-            if not os.path.exists(new_path):
-                os.makedirs(new_path, exist_ok=True)
-            generate_pages_recursive(old_path, template_path, new_path, basepath)
\ No newline at end of file
+            # write_page creates the folders pages land in, so drafts and
+            # slugged pages leave no empty folder behind.
+            generate_pages_recursive(old_path, template_path, new_path, basepath, urls, layouts, index, roots)
+
+def discover_pages(dir_path_content, dest_dir_path):
+    if not os.path.exists(dir_path_content):
+        raise ValueError('Cannot found the content folder')
+    pages = []
+    for root, dirs, files in os.walk(dir_path_content):
+        dirs.sort()
+        for item in sorted(files):
+            if item[-3:] != '.md':
+                continue
+            from_path = os.path.join(root, item)
+            dest_path = page_destination(from_path, dir_path_content, dest_dir_path)
+            if dest_path is not None:
+                pages.append((from_path, dest_path))
+    return pages
@@ -0,0 +1,314 @@
+import mimetypes
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from transformers import markdown_to_html_node
+from template import load_template, clear_template_cache
+from utils import extract_title, page_context, discover_pages
+from urls import UrlRewriter
+from images import IMAGE_EXTENSIONS, scan_image_sizes
+from layouts import LAYOUT_FILE, LayoutResolver
+from frontmatter import page_fields, split_page_header
+import page_index
+from page_index import page_context as header_context, page_destination
+
+RELOAD_PATH = "/__livereload"
+# Loopback only unless asked: the server reads files from static/.
+DEFAULT_HOST = "127.0.0.1"
+RELOAD_SCRIPT = (
+    "<script>new EventSource(\"" + RELOAD_PATH + "\")"
+    ".onmessage = function () { location.reload(); };</script>"
+)
+
+
+def scan_tree(root):
+    # One stat per file: {path: (size, mtime_ns)}.
+    signatures = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    signatures[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def scan_file(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    return {path: (stat.st_size, stat.st_mtime_ns)}
+
+
+def diff_signatures(previous, current):
+    changed = [path for path, signature in current.items() if previous.get(path) != signature]
+    removed = [path for path in previous if path not in current]
+    return changed, removed
+
+
+class SiteState():
+    # Long-lived build state for watch mode: the compiled templates and every
+    # page's parsed node tree stay in memory, so an edit re-parses only the
+    # pages it touched and a template or partial edit only re-runs templating
+    # for the pages whose layout depends on it. Pages get their slug, draft
+    # status and header variables the way the build gives them, through
+    # the page index when one is configured.
+    def __init__(self, content_path, template_path, static_path, basepath='/'):
+        self.content_path = content_path
+        self.template_path = template_path
+        self.static_path = static_path
+        self.basepath = basepath
+        self.lock = threading.Condition()
+        self.version = 0
+        self.pages = {}
+        self.outputs = {}
+        self.errors = {}
+        self.templates = {}
+        self.layouts = LayoutResolver(content_path, template_path)
+        self.signatures = {}
+        self.urls = UrlRewriter(basepath)
+
+    def parse_page(self, from_path):
+        with open(from_path, "r") as markdown:
+            content = markdown.read()
+        meta, content = split_page_header(content, from_path)
+        layout = page_fields(meta)["layout"]
+        return {
+            "title": extract_title(content),
+            "node": markdown_to_html_node(content, self.urls),
+            "layout": layout,
+            "template": self.layouts.template_for(from_path, layout),
+        }
+
+    def template_for(self, template_path):
+        template = self.templates.get(template_path)
+        if template is None:
+            template = load_template(template_path, self.basepath, self.urls)
+            self.templates[template_path] = template
+        return template
+
+    def render_page(self, from_path):
+        page = self.pages[from_path]
+        html = self.template_for(page["template"]).render(page_context(page["title"], page["node"], None, page["context"]))
+        return html.replace("</body>", RELOAD_SCRIPT + "</body>", 1).encode("utf-8")
+
+    def update_page(self, from_path, parse=True):
+        try:
+            url = self.page_url(from_path)
+            if url is None:
+                # A draft left out of the build.
+                self.remove_page(from_path)
+                return
+            previous = self.pages.get(from_path)
+            page = self.parse_page(from_path) if parse else previous
+            page["context"] = self.page_context(from_path)
+            if previous is not None and previous.get("url") not in (None, url):
+                self.outputs.pop(previous["url"], None)
+            page["url"] = url
+            self.pages[from_path] = page
+            self.outputs[url] = self.render_page(from_path)
+            self.errors.pop(from_path, None)
+        except Exception as error:
+            self.errors[from_path] = f"{type(error).__name__}: {error}"
+            print(f"Error rendering {from_path}: {self.errors[from_path]}")
+
+    def remove_page(self, from_path):
+        page = self.pages.pop(from_path, None)
+        self.errors.pop(from_path, None)
+        if page is not None:
+            self.outputs.pop(page["url"], None)
+
+    def page_url(self, from_path):
+        # None for a draft; the slug from the header applies.
+        dest_path = page_destination(from_path, self.content_path, self.content_path)
+        if dest_path is None:
+            return None
+        return "/" + os.path.relpath(dest_path, self.content_path).replace(os.sep, "/")
+
+    def page_context(self, from_path):
+        return header_context(from_path, self.content_path, self.content_path, self.urls)
+
+    def refresh_related(self, changed):
+        # Related pages follow other pages' tags, so after a content edit
+        # every page whose header variables moved is rendered again.
+        for from_path, page in list(self.pages.items()):
+            if from_path not in changed and page["context"] != self.page_context(from_path):
+                self.update_page(from_path, parse=False)
+
+    def reset_templates(self):
+        clear_template_cache()
+        self.templates = {}
+
+    def load_image_sizes(self):
+        self.urls = UrlRewriter(self.basepath, None, scan_image_sizes(self.static_path))
+
+    def scan(self):
+        signatures = scan_tree(self.content_path)
+        signatures.update(scan_tree(self.static_path))
+        for path in self.template_paths():
+            signatures.update(scan_file(path))
+        return signatures
+
+    def template_paths(self):
+        # Every template and partial a page renders with, plus layouts that
+        # failed to load so that fixing them triggers a rebuild.
+        paths = {self.template_path}
+        paths.update(page["template"] for page in self.pages.values())
+        for template in self.templates.values():
+            paths.update(template.dependencies)
+        return paths
+
+    def build(self):
+        started = time.perf_counter()
+        if page_index.index is not None:
+            page_index.index.refresh(self.content_path)
+        self.load_image_sizes()
+        self.reset_templates()
+        for from_path, _ in discover_pages(self.content_path, self.content_path):
+            self.update_page(from_path)
+        self.signatures = self.scan()
+        print(f"Built {len(self.pages)} pages in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def refresh(self):
+        signatures = self.scan()
+        changed, removed = diff_signatures(self.signatures, signatures)
+        self.signatures = signatures
+        if not changed and not removed:
+            return False
+        started = time.perf_counter()
+        with self.lock:
+            images = [path for path in changed + removed if path.startswith(self.static_path) and path.lower().endswith(IMAGE_EXTENSIONS)]
+            if images:
+                # Dimensions are baked into the node trees, so every page
+                # is re-parsed against the new sizes.
+                self.load_image_sizes()
+                self.reset_templates()
+                changed = changed + [path for path in self.pages if path not in changed]
+            touched = self.template_paths().intersection(changed + removed)
+            layouts_changed = any(os.path.basename(path) == LAYOUT_FILE for path in changed + removed)
+            if layouts_changed:
+                self.layouts = LayoutResolver(self.content_path, self.template_path)
+            if touched or layouts_changed:
+                # Drop only the layouts built from a touched file; pages on
+                # other layouts keep their output.
+                clear_template_cache()
+                stale = set(touched)
+                for template_path, template in list(self.templates.items()):
+                    if touched.intersection(template.dependencies):
+                        stale.add(template_path)
+                        del self.templates[template_path]
+                for from_path, page in self.pages.items():
+                    if from_path in changed:
+                        continue
+                    template_path = self.layouts.template_for(from_path, page["layout"])
+                    if template_path != page["template"] or template_path in stale or from_path in self.errors:
+                        page["template"] = template_path
+                        self.update_page(from_path, parse=False)
+            pages_changed = [path for path in changed + removed if path.endswith(".md") and path.startswith(self.content_path)]
+            if pages_changed and page_index.index is not None:
+                page_index.index.refresh(self.content_path)
+            for path in removed:
+                if path.endswith(".md"):
+                    self.remove_page(path)
+            for path in changed:
+                if path.endswith(".md") and path.startswith(self.content_path):
+                    self.update_page(path)
+            if pages_changed and page_index.index is not None:
+                self.refresh_related(changed)
+            self.version += 1
+            self.lock.notify_all()
+        print(f"Rebuilt {len(changed) + len(removed)} changed file(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+
+    def lookup(self, url):
+        path = url.split("?", 1)[0].split("#", 1)[0]
+        if self.basepath != '/' and path.startswith(self.basepath):
+            path = "/" + path[len(self.basepath):]
+        if path.endswith("/"):
+            path += "index.html"
+        candidates = [path] if os.path.splitext(path)[1] else [path + ".html", path + "/index.html"]
+        for candidate in candidates:
+            page = self.outputs.get(candidate)
+            if page is not None:
+                return page, "text/html; charset=utf-8"
+        static_root = os.path.abspath(self.static_path)
+        for candidate in candidates:
+            file_path = os.path.abspath(os.path.join(static_root, candidate.lstrip("/")))
+            # Compared by path components, so ../staticX doesn't pass for static.
+            if os.path.commonpath([static_root, file_path]) != static_root or not os.path.isfile(file_path):
+                continue
+            with open(file_path, "rb") as static_file:
+                body = static_file.read()
+            return body, mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        return None, None
+
+    def wait_for_change(self, version, timeout):
+        with self.lock:
+            self.lock.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+def make_handler(state):
+    class WatchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == RELOAD_PATH:
+                self.stream_reloads()
+                return
+            body, content_type = state.lookup(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def stream_reloads(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            version = state.version
+            try:
+                while True:
+                    current = state.wait_for_change(version, 15)
+                    if current == version:
+                        self.wfile.write(b": keep-alive\n\n")
+                    else:
+                        version = current
+                        self.wfile.write(b"data: reload\n\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def log_message(self, format, *args):
+            pass
+
+    return WatchHandler
+
+
+def watch(content_path, template_path, static_path, port=8888, interval=0.05, basepath='/', host=DEFAULT_HOST):
+    state = SiteState(content_path, template_path, static_path, basepath)
+    state.build()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving on http://{host or 'localhost'}:{port}/ and watching for changes")
+    try:
+        while True:
+            time.sleep(interval)
+            state.refresh()
+    except KeyboardInterrupt:
+        server.shutdown()